@@ -0,0 +1,128 @@
+"""
+Benchmark of staging lists with many staged jobs
+ - insert: stage N jobs
+ - renew: renew_jobs_priority of the list
+ - select: pick and remove the most urgent job that fits, K times
+
+Usage (in repo root):
+    python benchmarks/staging_list.py --jobs 100000 --selects 100
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scheduler"))
+
+# pylint: disable=C0413
+from loguru import logger
+
+from config import DATE_FORMAT
+from connector.msg_queue.msg_info import MsgInfo
+from operators.job_consumer.resources.base_job import Job
+from operators.job_consumer.resources.base_queue import (
+    BisectStagingList,
+    HeapStagingList,
+)
+from operators.job_consumer.plugins.job_selector.main import BasicJobSelector
+
+
+def make_jobs(job_num: int, seed: int = 0):
+    """ jobs with random deadline and resources, most of them need more cpu than free
+    """
+    rand = random.Random(seed)
+    now = datetime.utcnow()
+    jobs = []
+    for i in range(job_num):
+        request_time = now - timedelta(seconds=rand.randint(0, 600))
+        deadline = now + timedelta(seconds=rand.randint(60, 7200))
+        job = Job(
+            MsgInfo(
+                "new_job",
+                f"job-{i}",
+                {
+                    "job_type": "spark",
+                    "job_config": {
+                        "deadline": deadline.strftime(DATE_FORMAT),
+                        "request_time": request_time.strftime(DATE_FORMAT),
+                    },
+                    "job_parameters": {},
+                },
+                None,
+            )
+        )
+        job.job_resources = {
+            "executors": 1,
+            "cpu": rand.choice((1, 2, 4, 8)),
+            "mem": rand.choice((1, 2, 4, 8, 16)),
+            "computing_time": rand.randint(10, 300),
+        }
+        job.job_times["schedule_time"] -= job.job_resources["computing_time"]
+        jobs.append(job)
+
+    return jobs
+
+
+def bench(name, staging_list_cls, jobs, select_num, system_resources):
+    """ time insert, renew and select of a staging list
+    """
+    staging_list = staging_list_cls(0)
+
+    start = time.perf_counter()
+    for job in jobs:
+        staging_list.insert(job)
+    insert_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    staging_list.renew_jobs_priority()
+    renew_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(select_num):
+        select_fit = getattr(staging_list, "select_fit", None)
+        if select_fit is None:
+            job = BasicJobSelector.select_job(staging_list.tolist(), system_resources)
+        else:
+            job = select_fit(
+                system_resources["total"]["cpu"], system_resources["total"]["mem"]
+            )
+        staging_list.remove(job)
+    select_time = time.perf_counter() - start
+
+    print(
+        f"{name:<10} insert {insert_time * 1000:9.1f} ms | "
+        + f"renew {renew_time * 1000:8.1f} ms | "
+        + f"select {select_time / select_num * 1000:8.3f} ms/job"
+    )
+
+
+def main():
+    """ compare heap, bisect and columnar staging lists
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=100000)
+    parser.add_argument("--selects", type=int, default=100)
+    args = parser.parse_args()
+
+    logger.remove()
+    system_resources = {"total": {"cpu": 1, "mem": 2}}
+
+    staging_lists = [("heap", HeapStagingList), ("bisect", BisectStagingList)]
+    try:
+        from operators.job_consumer.resources.columnar_queue import ColumnarStagingList
+
+        staging_lists.append(("columnar", ColumnarStagingList))
+    except ImportError:
+        print("numpy is not installed, skip columnar")
+
+    print(f"{args.jobs} staged jobs, {args.selects} selects")
+    for name, staging_list_cls in staging_lists:
+        bench(
+            name, staging_list_cls, make_jobs(args.jobs), args.selects, system_resources
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of scheduler startup
+ - import: import a module in a fresh interpreter, the median of N runs
+ - init: create the job consumer and job monitor of main.py
+ - top: the slowest modules of `python -X importtime` (cumulative)
+
+Usage (in repo root):
+    python benchmarks/startup.py --runs 5 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+SCHEDULER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scheduler")
+
+MODULES = ["config", "operators.job_consumer.main", "main"]
+
+INIT_CODE = """
+import time
+from operators.job_consumer.main import JobConsumer
+from operators.job_monitor.main import JobMonitor
+start = time.perf_counter()
+JobConsumer(JobMonitor())
+print(time.perf_counter() - start)
+"""
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    """ run code by a fresh interpreter in the scheduler directory
+    """
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        cwd=SCHEDULER_DIR,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+
+def time_import(module: str) -> float:
+    """ seconds to import a module and its dependencies
+    """
+    code = f"import time\nstart = time.perf_counter()\nimport {module}\nprint(time.perf_counter() - start)"
+    return float(run_python(code).stdout.split()[-1])
+
+
+def time_init() -> float:
+    """ seconds to create the job consumer, with its modules imported
+    """
+    return float(run_python(INIT_CODE).stdout.split()[-1])
+
+
+def top_imports(module: str, top: int):
+    """ (cumulative microseconds, module) of the slowest imports
+    """
+    stderr = run_python(f"import {module}", "-X", "importtime").stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="list the slowest imports of main")
+    args = parser.parse_args()
+
+    for module in MODULES:
+        seconds = statistics.median(time_import(module) for _ in range(args.runs))
+        print(f"import {module:<30} {seconds * 1000:8.1f} ms")
+
+    seconds = statistics.median(time_init() for _ in range(args.runs))
+    print(f"{'init JobConsumer(JobMonitor())':<37} {seconds * 1000:8.1f} ms")
+
+    for cumulative, name in top_imports("main", args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Asyncio Entry Process of Job scheduling, an alternative of main.py
+ - kafka polling runs in an executor
+ - scheduling runs in a single task, which is the only owner of staging lists
+ - dispatching runs as concurrent tasks
+ - housekeeping (level promotion, deadline check) runs as periodic coroutines
+"""
+import asyncio
+import functools
+import json
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Set
+
+from loguru import logger
+
+from config import ASYNC_RUNTIME_CONFIG, SCHEDULER_CONFIG, ETA_CONFIG, init_config
+from operators.job_consumer.plugins import SEND_JOB, SEND_JOBS
+from operators.job_consumer.resources.base_job import Job
+from runtime import SchedulerRuntime
+
+
+class AsyncMainProcess(SchedulerRuntime):
+    """ Entry Process of Job scheduling based on asyncio event loop
+    """
+
+    def __init__(self) -> None:
+        # picked jobs are dispatched by tasks
+        super().__init__(send_job=self._dispatch_job, send_jobs=self._dispatch_jobs)
+        self.config = ASYNC_RUNTIME_CONFIG
+
+        # consumer is not thread-safe, so it owns a single thread
+        self.poll_executor = ThreadPoolExecutor(max_workers=1)
+        self.dispatch_executor = ThreadPoolExecutor(
+            max_workers=self.config["DISPATCH_WORKERS"]
+        )
+
+        # asyncio objects should be created inside the running loop
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.msg_queue: Optional[asyncio.Queue] = None
+        self.stop_event: Optional[asyncio.Event] = None
+        self.dispatch_tasks: Set[asyncio.Future] = set()
+
+    def _poll_msgs_from_queue(self) -> List:
+        # run in poll_executor, decode the whole batch out of the event loop
+        return list(self.consumer.get_info_gen_from_queue())
+
+    async def _poll_msgs(self) -> None:
+        while True:
+            msgs = await self.loop.run_in_executor(
+                self.poll_executor, self._poll_msgs_from_queue
+            )
+            for msg in msgs:
+                # wait here if scheduling falls behind
+                await self.msg_queue.put(msg)
+
+    def _run_handoff(self, handoff_func: Callable) -> Callable:
+        """ rebalance callbacks run in the poll thread, hand them to the event loop
+            and block the rebalance until staging jobs are handed over
+        """
+
+        async def run_in_loop(partitions):
+            # buffered msgs are staged before flushing
+            await self.msg_queue.join()
+            handoff_func(partitions)
+
+        def callback(partitions):
+            if self.loop is not None and self.loop.is_running():
+                asyncio.run_coroutine_threadsafe(
+                    run_in_loop(partitions), self.loop
+                ).result()
+            else:
+                # consumer is closed after the loop stopped
+                handoff_func(partitions)
+
+        return callback
+
+    async def _schedule_msgs(self) -> None:
+        while True:
+            msg = await self.msg_queue.get()
+
+            logger.info(
+                f"{'='*60}\n\n"
+                + f"Get MSG \n - Topic: {msg.topic}, \n - Key: {msg.msg_key}\n - Value: {msg.msg_value}\n"
+            )
+
+            try:
+                self.operator.consume_msg(msg)
+            except Exception:  # pylint: disable=W0703
+                # a bad msg should not stop the scheduling task
+                logger.exception(f"Schedule MSG Error - Key: {msg.msg_key}")
+            finally:
+                self.msg_queue.task_done()
+
+    def _run_dispatch(self, send_func: Callable, payload, jobs: List[Job]) -> None:
+        task = self.loop.run_in_executor(self.dispatch_executor, send_func, payload)
+        self.dispatch_tasks.add(task)
+        task.add_done_callback(functools.partial(self._on_dispatch_done, jobs))
+
+    def _dispatch_job(self, job: Job) -> None:
+        """ called by the scheduling task, send job to trigger without blocking the loop
+            the result is reported when the task is done
+        """
+        self._run_dispatch(SEND_JOB, job, [job])
+
+    def _dispatch_jobs(self, jobs: List[Job]) -> None:
+        """ called by the scheduling task, send a round of jobs by a bulk request
+        """
+        self._run_dispatch(SEND_JOBS, jobs, jobs)
+
+    def _on_dispatch_done(self, jobs: List[Job], task: asyncio.Future) -> None:
+        # done callbacks run in the loop thread, so staging lists have a single owner
+        self.dispatch_tasks.discard(task)
+        if task.cancelled():
+            return
+
+        if task.exception() is not None:
+            logger.error(f"Dispatch Error: {task.exception()}")
+            self.operator.on_dispatch_result(jobs, False)
+        else:
+            # a bool, or the failed jobs of a batch trigger
+            self.operator.on_dispatch_result(jobs, task.result())
+
+    @staticmethod
+    async def _run_periodically(interval: float, func: Callable) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                func()
+            except Exception as error:  # pylint: disable=W0703
+                logger.error(f"Housekeeping {func.__name__} Error: {error}")
+
+    def _get_health(self) -> dict:
+        return {
+            "status": "ok",
+            "buffered_msgs": self.msg_queue.qsize(),
+            "dispatching_jobs": len(self.dispatch_tasks),
+            "retrying_jobs": len(self.operator.dispatcher.retry_queue),
+            "circuit_breaker": self.operator.dispatcher.breaker.state,
+            "staging_jobs": {
+                stage_list.level: len(stage_list)
+                for stage_list in self.operator.stage_lists
+            },
+            "system_resources": self.operator.job_monitor.system_resources,
+        }
+
+    async def _handle_health(self, reader, writer) -> None:
+        await reader.readline()
+        body = json.dumps(self._get_health()).encode("utf-8")
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    def _create_tasks(self) -> List[asyncio.Task]:
+        tasks = [
+            self.loop.create_task(self._poll_msgs()),
+            self.loop.create_task(self._schedule_msgs()),
+            self.loop.create_task(
+                self._run_periodically(
+                    self.config["DEADLINE_CHECK_INTERVAL"],
+                    self.operator.check_overdue_jobs,
+                )
+            ),
+            self.loop.create_task(
+                self._run_periodically(
+                    self.config["RETRY_CHECK_INTERVAL"], self.operator.process_retries
+                )
+            ),
+        ]
+        if ETA_CONFIG["INTERVAL"]:
+            tasks.append(
+                self.loop.create_task(
+                    self._run_periodically(
+                        ETA_CONFIG["INTERVAL"], self.operator.publish_etas
+                    )
+                )
+            )
+        if SCHEDULER_CONFIG["IS_REALLOCATE"]:
+            tasks.append(
+                self.loop.create_task(
+                    self._run_periodically(
+                        self.config["REALLOCATE_INTERVAL"], self.operator.reallocate
+                    )
+                )
+            )
+        return tasks
+
+    async def _shutdown(self, tasks: List[asyncio.Task]) -> None:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self.dispatch_tasks:
+            logger.warning(f"Wait for {len(self.dispatch_tasks)} dispatching jobs")
+            await asyncio.gather(*self.dispatch_tasks, return_exceptions=True)
+
+    async def _run(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.msg_queue = asyncio.Queue(maxsize=self.config["MSG_BUFFER_SIZE"])
+        self.stop_event = asyncio.Event()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, self.stop_event.set)
+        self.loop.add_signal_handler(signal.SIGHUP, self._reload_policy)
+
+        server = None
+        if self.config["HEALTH_PORT"]:
+            server = await asyncio.start_server(
+                self._handle_health, port=self.config["HEALTH_PORT"]
+            )
+            logger.info(f"Health endpoint on port {self.config['HEALTH_PORT']}")
+
+        tasks = self._create_tasks()
+        stop_task = self.loop.create_task(self.stop_event.wait())
+        done, _ = await asyncio.wait(
+            tasks + [stop_task], return_when=asyncio.FIRST_COMPLETED
+        )
+
+        if stop_task in done:
+            logger.warning("Aborted by user")
+        else:
+            stop_task.cancel()
+            for task in done:
+                if task.exception() is not None:
+                    logger.error(f"Runtime Error: {task.exception()}")
+
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+        await self._shutdown(tasks)
+
+    def run(self) -> None:
+        """ start msg queue consumer and run the event loop until shutdown
+        """
+        try:
+            self._start_services()
+            asyncio.run(self._run())
+
+        finally:
+            # wait for the running poll before closing consumer
+            self.poll_executor.shutdown(wait=True)
+            self.dispatch_executor.shutdown(wait=True)
+            self._stop_services()
+
+
+def main():
+    """ define main function for cython usage
+    """
+    init_config()
+    logger.warning("ReStart Scheduler Process (asyncio)")
+    app = AsyncMainProcess()
+    app.run()
+
+
+if __name__ == "__main__":
+    main()
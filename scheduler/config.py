@@ -2,16 +2,13 @@
 """
 import sys
 import os
-from typing import Tuple
+from typing import Any, Dict, Optional, Tuple
 
 from loguru import logger
-from dotenv import load_dotenv
+from dotenv import dotenv_values, load_dotenv
 from mypy_extensions import TypedDict
 
 
-logger.remove()
-
-
 def formatter(record):
     """ log text formatter
         10: Debug, 20: INFO, 25: SUCCESS, 30: WARNING, 40: ERROR, 50: CRITICAL
@@ -29,46 +26,210 @@ def formatter(record):
     return time_str + formate_map[record["level"].no]
 
 
-logger.add(sys.stderr, format=formatter)
-
-
-load_dotenv()
+# values of .env and the environment, the environment wins;
+# importing config does not change the environment, see init_config
+ENV = {
+    **{key: value for key, value in dotenv_values().items() if value is not None},
+    **os.environ,
+}
 
 SYSTEM_CONFIG = {
-    "SYSTEM_CPU": int(os.environ.get("SYSTEM_CPU", 1)),
-    "SYSTEM_MEM": int(os.environ.get("SYSTEM_MEM", 1)),
+    "SYSTEM_CPU": int(ENV.get("SYSTEM_CPU", 1)),
+    "SYSTEM_MEM": int(ENV.get("SYSTEM_MEM", 1)),
 }
 
 KAFKA_TOPIC_CONFIG = {
-    "TOPIC_NEW_JOB_NOTIFY": os.environ.get("TOPIC_NEW_JOB_NOTIFY", "new_job"),
-    "TOPIC_JOB_COMPLETE_NOTIFY": os.environ.get("JOB_COMPLETE_NOTIFY", "job_finish"),
+    "TOPIC_NEW_JOB_NOTIFY": ENV.get("TOPIC_NEW_JOB_NOTIFY", "new_job"),
+    "TOPIC_JOB_COMPLETE_NOTIFY": ENV.get("JOB_COMPLETE_NOTIFY", "job_finish"),
+    "TOPIC_JOB_ADMISSION_NOTIFY": ENV.get("JOB_ADMISSION_NOTIFY", "job_admission"),
+    "TOPIC_JOB_CANCEL_NOTIFY": ENV.get("JOB_CANCEL_NOTIFY", "job_cancel"),
+    "TOPIC_JOB_ETA_NOTIFY": ENV.get("JOB_ETA_NOTIFY", "job_eta"),
 }
 
 CONFIG = {
     "consumer_kafka": {
-        "kafka_ip": os.environ.get("KAFKA_IP", "localhost:9092"),
-        "group_ip": os.environ.get("GROUP_ID", "qol"),
+        "kafka_ip": ENV.get("KAFKA_IP", "localhost:9092"),
+        "group_ip": ENV.get("GROUP_ID", "qol"),
         "session_timeout": 6000,
         "topic_names": [
             KAFKA_TOPIC_CONFIG["TOPIC_NEW_JOB_NOTIFY"],
             KAFKA_TOPIC_CONFIG["TOPIC_JOB_COMPLETE_NOTIFY"],
+            KAFKA_TOPIC_CONFIG["TOPIC_JOB_CANCEL_NOTIFY"],
         ],
-    }
+        # topics releasing resources, consumed by a separate consumer and always drained first
+        "express_topic_names": [
+            KAFKA_TOPIC_CONFIG["TOPIC_JOB_COMPLETE_NOTIFY"],
+            KAFKA_TOPIC_CONFIG["TOPIC_JOB_CANCEL_NOTIFY"],
+        ]
+        if int(ENV.get("IS_EXPRESS_LANE", 0))
+        else [],
+        # seconds to wait for other msgs, so express msgs are not held by an idle wait
+        "express_poll_timeout": 0.1,
+    },
+    "producer_kafka": {
+        # notifications are small json msgs, batched and compressed by the producer
+        "compression_type": ENV.get("KAFKA_COMPRESSION_TYPE", "lz4"),
+        "linger_ms": int(ENV.get("KAFKA_LINGER_MS", 50)),
+    },
+}
+
+ADMISSION_CONFIG = {
+    # off / flag: stage and notify / reject: notify without staging
+    # for the jobs which could not meet their deadline even scheduled by deadline
+    "MODE": ENV.get("ADMISSION_MODE", "off"),
+    # seconds a job is allowed to finish after its deadline
+    "TOLERANCE": float(ENV.get("ADMISSION_TOLERANCE", 0)),
+}
+
+SPILL_CONFIG = {
+    # SQLite file for spilling far-deadline jobs of the lowest level, empty: disable
+    "PATH": ENV.get("SPILL_PATH", ""),
+    # seconds before latest start, jobs later than this are kept on disk
+    "SLACK": float(ENV.get("SPILL_SLACK", 1800)),
+    # jobs paged in at once when all staging lists are empty
+    "PAGE_IN_BATCH": int(ENV.get("SPILL_PAGE_IN_BATCH", 16)),
+}
+
+
+def _parse_key_values(text: str) -> Dict[str, str]:
+    """ e.g. "a:1,b:2" -> {"a": "1", "b": "2"} """
+    return dict(item.split(":", 1) for item in text.split(",") if item)
+
+
+DISPATCH_LIMIT_CONFIG = {
+    # max running jobs of job types, e.g. demand_forecasting_1hr:4,real-demand:2
+    "TYPE_CAPS": {
+        job_type: int(cap)
+        for job_type, cap in _parse_key_values(
+            ENV.get("TYPE_CONCURRENCY_CAPS", "")
+        ).items()
+    },
+    # max running jobs of every user, 0: no cap
+    "USER_CAP": int(ENV.get("USER_CONCURRENCY_CAP", 0)),
+    # dispatches per second / burst of job types, e.g. real-demand:0.5/5
+    "TYPE_RATES": {
+        job_type: tuple(map(float, rate.split("/")))
+        for job_type, rate in _parse_key_values(ENV.get("TYPE_RATE_LIMITS", "")).items()
+    },
+    # dispatches per second / burst of every user, e.g. 0.2/2, empty: no limit
+    "USER_RATE": tuple(map(float, ENV["USER_RATE_LIMIT"].split("/")))
+    if ENV.get("USER_RATE_LIMIT")
+    else None,
+}
+
+DEPENDENCY_CONFIG = {
+    # recent completed job ids kept, for jobs submitted after their parents complete
+    "COMPLETED_SIZE": int(ENV.get("DEPENDENCY_COMPLETED_SIZE", 100000)),
+    # seconds a job waits for its parents before it is staged anyway, 0: wait forever
+    "MAX_WAIT": float(ENV.get("DEPENDENCY_MAX_WAIT", 3600)),
+}
+
+CANCEL_CONFIG = {
+    # cancels of unknown jobs kept for their new job msgs, which may arrive later by another consumer
+    "PENDING_SIZE": int(ENV.get("CANCEL_PENDING_SIZE", 10000))
+}
+
+SPARK_MASTER_CONFIG = {
+    # json status of the Spark standalone master, e.g. http://localhost:8080/json/, empty: disable
+    "URL": ENV.get("SPARK_MASTER_STATUS_URL", ""),
+    "POLL_INTERVAL": float(ENV.get("SPARK_POLL_INTERVAL", 5)),
+    # seconds a polled capacity is trusted
+    "MAX_STALENESS": float(ENV.get("SPARK_MAX_STALENESS", 30)),
+    # seconds a dispatched job may take to show up as used cores of the master
+    "START_GRACE": float(ENV.get("SPARK_START_GRACE", 30)),
+    "TIMEOUT": float(ENV.get("SPARK_POLL_TIMEOUT", 2)),
+}
+
+ADAPTIVE_POLL_CONFIG = {
+    # seconds a msg should wait in kafka polling and batch processing, 0: fixed batch of 500 / 1s
+    "LATENCY_SLO": float(ENV.get("POLL_LATENCY_SLO", 0)),
+    "MIN_BATCH": int(ENV.get("POLL_MIN_BATCH", 1)),
+    "MAX_BATCH": int(ENV.get("POLL_MAX_BATCH", 5000)),
+    "MIN_TIMEOUT": float(ENV.get("POLL_MIN_TIMEOUT", 0.01)),
+    "MAX_TIMEOUT": float(ENV.get("POLL_MAX_TIMEOUT", 1.0)),
+    # weight of the latest poll in the decayed arrival rate and processing time
+    "DECAY": float(ENV.get("POLL_DECAY", 0.2)),
+    # seconds between logging the polling decisions, 0: disable
+    "METRICS_INTERVAL": float(ENV.get("POLL_METRICS_INTERVAL", 60)),
+}
+
+ETA_CONFIG = {
+    # seconds between publishing estimated start times of staging jobs, 0: disable
+    "INTERVAL": float(ENV.get("ETA_INTERVAL", 0)),
+    # seconds an estimate should shift before it is published again
+    "THRESHOLD": float(ENV.get("ETA_THRESHOLD", 60)),
+}
+
+ADMIN_CONFIG = {
+    # port of the admin http server for introspection, 0: disable
+    "PORT": int(ENV.get("ADMIN_PORT", 0)),
+    # POST /policy changes scheduling, so only local clients by default
+    "HOST": ENV.get("ADMIN_HOST", "127.0.0.1"),
+    # seconds a policy update or a job lookup waits for the scheduling thread
+    "POLICY_TIMEOUT": float(ENV.get("ADMIN_POLICY_TIMEOUT", 10)),
+}
+
+HANDOFF_CONFIG = {
+    # store staging jobs of revoked partitions here, and load them when partitions are assigned
+    # the directory should be shared by scheduler instances of the same GROUP_ID, empty: disable
+    "STORE_DIR": ENV.get("STAGING_STORE_DIR", "")
+}
+
+CAPTURE_CONFIG = {
+    # record every consumed msg into this file, empty: disable
+    "PATH": ENV.get("CAPTURE_PATH", ""),
+    # msgs per compressed block
+    "BLOCK_SIZE": int(ENV.get("CAPTURE_BLOCK_SIZE", 500)),
 }
 
 AIRFLOW_CONFIG = {
-    "URL": os.environ.get(
+    "URL": ENV.get(
         "AIRFLOW_URL",
         "http://localhost:8080/api/experimental/dags/basic_test_job/dag_runs",
     )
 }
 
+REQUEST_CONFIG = {
+    # seconds to connect to and to wait for a response of the job trigger or airflow,
+    # a dispatch timing out is failed and retried
+    "CONNECT_TIMEOUT": float(ENV.get("REQUEST_CONNECT_TIMEOUT", 3.05)),
+    "READ_TIMEOUT": float(ENV.get("REQUEST_READ_TIMEOUT", 30)),
+}
+
 JOB_TRIGGER_CONFIG = {
-    "URL": os.environ.get("JOB_TRIGGER_URL", "http://localhost:5000/trigger/spark"),
-    "METHOD": os.environ.get("JOB_TRIGGER_METHOD", "api"),
+    "URL": ENV.get("JOB_TRIGGER_URL", "http://localhost:5000/trigger/spark"),
+    "METHOD": ENV.get("JOB_TRIGGER_METHOD", "api"),
+    # send all jobs picked in one scheduling round by a single bulk request
+    "IS_BATCH_DISPATCH": bool(int(ENV.get("IS_BATCH_DISPATCH", 0))),
+    "BATCH_URL": ENV.get(
+        "JOB_TRIGGER_BATCH_URL", "http://localhost:5000/trigger/spark/batch"
+    ),
+    "CANCEL_URL": ENV.get(
+        "JOB_TRIGGER_CANCEL_URL", "http://localhost:5000/trigger/spark/cancel"
+    ),
 }
 
-DATE_FORMAT = os.environ.get("DATE_FORMAT", "%Y-%m-%dT%H:%M:%S")
+SHARD_CONFIG = {
+    # scheduler worker processes of sharded mode
+    "WORKER_NUM": int(ENV.get("SHARD_WORKER_NUM", os.cpu_count() or 1)),
+    # msg_value field for sharding jobs: username / job_type
+    "SHARD_KEY": ENV.get("SHARD_KEY", "username"),
+    # max msgs buffered for each worker
+    "QUEUE_SIZE": int(ENV.get("SHARD_QUEUE_SIZE", 1000)),
+}
+
+DISPATCH_RETRY_CONFIG = {
+    # give up a job after failing MAX_RETRY times, and release its resources
+    "MAX_RETRY": int(ENV.get("DISPATCH_MAX_RETRY", 5)),
+    # retry delay: BACKOFF_BASE * 2^(attempts-1), at most BACKOFF_MAX seconds
+    "BACKOFF_BASE": float(ENV.get("DISPATCH_BACKOFF_BASE", 1)),
+    "BACKOFF_MAX": float(ENV.get("DISPATCH_BACKOFF_MAX", 60)),
+    # stop dispatching after continuous failures, try again after reset timeout
+    "BREAKER_THRESHOLD": int(ENV.get("BREAKER_FAILURE_THRESHOLD", 5)),
+    "BREAKER_RESET_TIMEOUT": float(ENV.get("BREAKER_RESET_TIMEOUT", 30)),
+}
+
+DATE_FORMAT = ENV.get("DATE_FORMAT", "%Y-%m-%dT%H:%M:%S")
 
 TYPE_SCHEDULER_CONFIG = TypedDict(
     "TYPE_SCHEDULER_CONFIG",
@@ -84,56 +245,131 @@ TYPE_SCHEDULER_CONFIG = TypedDict(
 
 SCHEDULER_CONFIG: TYPE_SCHEDULER_CONFIG = {
     # TOTAL_LEVEL: 3 -> there would be 3 staging queue
-    "TOTAL_LEVEL": int(os.environ.get("TOTAL_LEVEL", 3)),
-    "LEVEL_LIMIT": tuple(
-        map(int, os.environ.get("LEVEL_LIMIT", "600,1200").split(","))
-    ),
+    "TOTAL_LEVEL": int(ENV.get("TOTAL_LEVEL", 3)),
+    "LEVEL_LIMIT": tuple(map(int, ENV.get("LEVEL_LIMIT", "600,1200").split(","))),
     # Queue config
-    "IS_RENEW_BEFORE_INSERT": bool(os.environ.get("IS_RENEW_BEFORE_INSERT", 1)),
-    "IS_REALLOCATE": bool(os.environ.get("IS_REALLOCATE", 1)),
-    "JOB_SORT_KEY": os.environ.get("JOB_SORT_KEY", "schedule_time"),
+    "IS_RENEW_BEFORE_INSERT": bool(ENV.get("IS_RENEW_BEFORE_INSERT", 1)),
+    "IS_REALLOCATE": bool(ENV.get("IS_REALLOCATE", 1)),
+    "JOB_SORT_KEY": ENV.get("JOB_SORT_KEY", "schedule_time"),
 }
 
 QUEUE_SELECTION_CONFIG = {
-    "QUEUE_SELECT_METHOD": os.environ.get(
-        "QUEUE_SELECT_METHOD", "env_weight_random_select"
-    ),
+    "QUEUE_SELECT_METHOD": ENV.get("QUEUE_SELECT_METHOD", "env_weight_random_select"),
     "env_weight_random_select": {
-        "env_weights": list(
-            map(float, os.environ.get("SELECT_WEIGHT", "10,7,3").split(","))
-        )
+        "env_weights": list(map(float, ENV.get("SELECT_WEIGHT", "10,7,3").split(",")))
     },
     "env_zip_select": {
-        "env_orders": list(
-            map(float, os.environ.get("SELECT_ORDER", "3,2,1").split(","))
-        )
+        "env_orders": list(map(float, ENV.get("SELECT_ORDER", "3,2,1").split(",")))
+    },
+    "weight_random_select": {
+        # seconds for the level statistics to decay by 1/e
+        "decay_seconds": float(ENV.get("WEIGHT_DECAY_SECONDS", 60)),
+        # seconds of waiting which double the weight of a level
+        "aging_seconds": float(ENV.get("WEIGHT_AGING_SECONDS", 60)),
+        # min weight of a level, so no level is starved
+        "weight_floor": float(ENV.get("WEIGHT_FLOOR", 0.05)),
+        # seconds between logging level weights
+        "log_interval": float(ENV.get("WEIGHT_LOG_INTERVAL", 10)),
     },
 }
 
 JOB_SELECTION_CONFIG = {
-    "JOB_SELECT_METHOD": os.environ.get("JOB_SELECT_METHOD", "basic_check_resource")
+    "JOB_SELECT_METHOD": ENV.get("JOB_SELECT_METHOD", "basic_check_resource"),
+    # greedy: pick jobs of a scheduling round one by one, knapsack: pack a set of jobs
+    "ROUND_SELECT_METHOD": ENV.get("ROUND_SELECT_METHOD", "greedy"),
+    # candidates of all levels considered in a round
+    "ROUND_TOP_K": int(ENV.get("ROUND_TOP_K", 32)),
+    # seconds for solving a round, fall back to greedy when running out
+    "ROUND_TIME_BUDGET": float(ENV.get("ROUND_TIME_BUDGET", 0.005)),
+    # max (cpu + 1) * (mem + 1) of the knapsack table
+    "ROUND_MAX_CELLS": int(ENV.get("ROUND_MAX_CELLS", 20000)),
+    # pick the least laxity job of all levels instead of selecting a queue first
+    "IS_LEAST_LAXITY_FIRST": bool(int(ENV.get("IS_LEAST_LAXITY_FIRST", 0))),
+    # times the least laxity job could be bypassed by smaller jobs, negative: no limit
+    "LAXITY_STARVATION_BOUND": int(ENV.get("LAXITY_STARVATION_BOUND", 10)),
 }
 
-QUEUE_SCHEDULE_CONFIG = {"STAGE_QUEUE": os.environ.get("STAGE_QUEUE", "heap")}
+QUEUE_SCHEDULE_CONFIG = {"STAGE_QUEUE": ENV.get("STAGE_QUEUE", "heap")}
+
+ASYNC_RUNTIME_CONFIG = {
+    # max msgs buffered between kafka polling and scheduling
+    "MSG_BUFFER_SIZE": int(ENV.get("ASYNC_MSG_BUFFER_SIZE", 1000)),
+    # max concurrent requests to the job trigger
+    "DISPATCH_WORKERS": int(ENV.get("ASYNC_DISPATCH_WORKERS", 8)),
+    # housekeeping intervals (seconds)
+    "REALLOCATE_INTERVAL": float(ENV.get("REALLOCATE_INTERVAL", 30)),
+    "DEADLINE_CHECK_INTERVAL": float(ENV.get("DEADLINE_CHECK_INTERVAL", 60)),
+    "RETRY_CHECK_INTERVAL": float(ENV.get("RETRY_CHECK_INTERVAL", 1)),
+    # 0: disable health endpoint
+    "HEALTH_PORT": int(ENV.get("HEALTH_PORT", 0)),
+}
+
+PIPELINE_CONFIG = {
+    # max msgs / jobs buffered between decode and scheduling stages
+    "DECODE_QUEUE_SIZE": int(ENV.get("PIPELINE_DECODE_QUEUE_SIZE", 1000)),
+    # max dispatch requests buffered between scheduling and dispatch stages
+    "DISPATCH_QUEUE_SIZE": int(ENV.get("PIPELINE_DISPATCH_QUEUE_SIZE", 100)),
+    # threads sending requests to the job trigger
+    "DISPATCH_WORKERS": int(ENV.get("PIPELINE_DISPATCH_WORKERS", 8)),
+    # seconds between metrics reports, 0: disable
+    "METRICS_INTERVAL": float(ENV.get("PIPELINE_METRICS_INTERVAL", 60)),
+}
 
-EXP_ID = (
-    f"{os.environ.get('EXP_ID', '0.0.0')}"
-    + f"_c{SYSTEM_CONFIG['SYSTEM_CPU']}_m{SYSTEM_CONFIG['SYSTEM_MEM']}"
-    + f"_queueSelect-{QUEUE_SELECTION_CONFIG['QUEUE_SELECT_METHOD']}"
-    + f"_queue-{QUEUE_SCHEDULE_CONFIG['STAGE_QUEUE']}"
-)
 
-logger.info(EXP_ID)
+def get_exp_id(
+    queue_select_method: str = QUEUE_SELECTION_CONFIG["QUEUE_SELECT_METHOD"],
+    stage_queue: str = QUEUE_SCHEDULE_CONFIG["STAGE_QUEUE"],
+) -> str:
+    """ id of an experiment, policies could be switched at runtime """
+    return (
+        f"{ENV.get('EXP_ID', '0.0.0')}"
+        + f"_c{SYSTEM_CONFIG['SYSTEM_CPU']}_m{SYSTEM_CONFIG['SYSTEM_MEM']}"
+        + f"_queueSelect-{queue_select_method}"
+        + f"_queue-{stage_queue}"
+    )
+
 
+EXP_ID = get_exp_id()
 
-def get_exp_config():
-    """ for exp analysis table """
+
+def init_config(log_level: str = "DEBUG") -> None:
+    """ set up the process of an entry point, not done on import:
+        export .env to the environment and log by the formatter
+    """
+    load_dotenv()
+    logger.remove()
+    logger.add(sys.stderr, level=log_level, format=formatter)
+    logger.info(EXP_ID)
+
+
+def get_exp_config(policy: Optional[Dict[str, Any]] = None):
+    """ for exp analysis table, policy: options switched at runtime, None: the startup config """
+    policy = policy or {}
+    queue_select_method = policy.get(
+        "QUEUE_SELECT_METHOD", QUEUE_SELECTION_CONFIG["QUEUE_SELECT_METHOD"]
+    )
+    stage_queue = policy.get("STAGE_QUEUE", QUEUE_SCHEDULE_CONFIG["STAGE_QUEUE"])
     return {
         "method": {
-            "SCHEDULER_CONFIG": SCHEDULER_CONFIG,
-            "QUEUE_SELECT_METHOD": QUEUE_SELECTION_CONFIG["QUEUE_SELECT_METHOD"],
-            "QUEUE_SCHEDULE_CONFIG": QUEUE_SCHEDULE_CONFIG,
-            "JOB_SELECTION_CONFIG": JOB_SELECTION_CONFIG,
+            "SCHEDULER_CONFIG": {
+                **SCHEDULER_CONFIG,
+                "LEVEL_LIMIT": policy.get(
+                    "LEVEL_LIMIT", SCHEDULER_CONFIG["LEVEL_LIMIT"]
+                ),
+            },
+            "QUEUE_SELECT_METHOD": queue_select_method,
+            "QUEUE_SCHEDULE_CONFIG": {
+                **QUEUE_SCHEDULE_CONFIG,
+                "STAGE_QUEUE": stage_queue,
+            },
+            "JOB_SELECTION_CONFIG": {
+                **JOB_SELECTION_CONFIG,
+                **{
+                    key: policy[key]
+                    for key in ("JOB_SELECT_METHOD", "ROUND_SELECT_METHOD")
+                    if key in policy
+                },
+            },
         },
-        "exp_id": EXP_ID,
+        "exp_id": get_exp_id(queue_select_method, stage_queue),
     }
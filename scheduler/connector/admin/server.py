@@ -0,0 +1,114 @@
+"""
+Admin http server of the scheduler, for read-only introspection and operations
+It runs in daemon threads beside scheduling, handlers should only take short locks of scheduling state
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from loguru import logger
+
+from config import ADMIN_CONFIG
+
+# (path after the route prefix, query params and json body) -> (http status, json response)
+Handler = Callable[[str, Dict], Tuple[int, Dict]]
+
+
+class AdminServer:
+    """ json http server routing requests by (method, path prefix)
+
+    Args:
+        routes: e.g. {("GET", "/jobs/"): describe_job}
+        host: bind address
+        port: bind port, 0: pick a free port
+    """
+
+    def __init__(
+        self,
+        routes: Dict[Tuple[str, str], Handler],
+        host: str = ADMIN_CONFIG["HOST"],
+        port: int = ADMIN_CONFIG["PORT"],
+    ) -> None:
+        self.routes = routes
+        self.httpd = ThreadingHTTPServer((host, port), self._get_request_handler())
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        """ the bound port
+        """
+        return self.httpd.server_address[1]
+
+    def find_route(self, method: str, path: str) -> Tuple[Optional[Handler], str]:
+        """ the handler of a request and the path after its route prefix
+        """
+        for (route_method, prefix), handler in self.routes.items():
+            if route_method == method and path.startswith(prefix):
+                return handler, path[len(prefix) :]
+        return None, path
+
+    def _get_request_handler(self):
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            """ json request handler
+            """
+
+            def _respond(self, status: int, body: Dict) -> None:
+                data = json.dumps(body, default=str).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, method: str) -> None:
+                url = urlsplit(self.path)
+                handler, sub_path = server.find_route(method, url.path)
+                if handler is None:
+                    self._respond(404, {"error": f"no route {method} {url.path}"})
+                    return
+
+                params: Dict = dict(parse_qsl(url.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    if length:
+                        params.update(json.loads(self.rfile.read(length)))
+                    status, body = handler(sub_path, params)
+                except Exception as error:  # pylint: disable=W0703
+                    logger.error(f"Admin Error: {error}")
+                    status, body = 400, {"error": str(error)}
+                self._respond(status, body)
+
+            def do_GET(self) -> None:  # pylint: disable=C0103
+                """ GET requests """
+                self._handle("GET")
+
+            def do_POST(self) -> None:  # pylint: disable=C0103
+                """ POST requests """
+                self._handle("POST")
+
+            def log_message(self, format, *args) -> None:  # pylint: disable=W0622
+                logger.debug(f"Admin {self.address_string()} {format % args}")
+
+        return RequestHandler
+
+    def start(self) -> None:
+        """ serve in a daemon thread
+        """
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, name="admin-server", daemon=True
+        )
+        self.thread.start()
+        logger.info(f"Admin Server on port {self.port}")
+
+    def stop(self) -> None:
+        """ stop serving
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
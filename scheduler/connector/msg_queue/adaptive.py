@@ -0,0 +1,129 @@
+"""
+Module for tuning the batch size and timeout of kafka polling
+Arrival rate and processing time per msg are observed between polls,
+so a msg waits no longer than the latency SLO at low load, and batches grow under backlog
+"""
+import math
+from typing import Dict, Optional, Tuple
+
+from config import ADAPTIVE_POLL_CONFIG
+
+
+# the bounds and decayed statistics of polling are tuned together by every poll
+class AdaptivePollController:  # pylint: disable=R0902
+    """ batch size and timeout of the next poll
+
+    Args:
+        latency_slo: seconds a msg should wait in polling and processing of its batch
+        min_batch, max_batch: bounds of msgs per poll
+        min_timeout, max_timeout: bounds of seconds per poll
+        decay: weight of the latest poll in the decayed statistics
+    """
+
+    # every bound defaults to .env, a test passes its own
+    def __init__(  # pylint: disable=R0913
+        self,
+        latency_slo: float = ADAPTIVE_POLL_CONFIG["LATENCY_SLO"],
+        min_batch: int = ADAPTIVE_POLL_CONFIG["MIN_BATCH"],
+        max_batch: int = ADAPTIVE_POLL_CONFIG["MAX_BATCH"],
+        min_timeout: float = ADAPTIVE_POLL_CONFIG["MIN_TIMEOUT"],
+        max_timeout: float = ADAPTIVE_POLL_CONFIG["MAX_TIMEOUT"],
+        decay: float = ADAPTIVE_POLL_CONFIG["DECAY"],
+    ) -> None:
+        self.latency_slo = latency_slo
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.decay = decay
+
+        # decayed msgs per second, and seconds of processing a msg after polling
+        self.arrival_rate = 0.0
+        self.process_seconds = 0.0
+
+        self.num_messages = min_batch
+        self.timeout = max_timeout
+        self.polls = 0
+        self.backlog_polls = 0
+
+        # monotonic time and msgs of the last poll
+        self.last_return: Optional[float] = None
+        self.last_num = 0
+
+    def get_poll_params(self) -> Tuple[int, float]:
+        """ (num_messages, timeout) of the next poll
+        """
+        return self.num_messages, self.timeout
+
+    def _update(self, value: float, sample: float) -> float:
+        return (1 - self.decay) * value + self.decay * sample
+
+    def observe(self, num_received: int, poll_start: float, poll_end: float) -> None:
+        """ learn from a poll, then tune the next one
+
+        Args:
+            num_received: msgs returned by the poll
+            poll_start, poll_end: monotonic time around the poll, the time since
+                the last poll returned is spent on processing its msgs
+        """
+        if self.last_return is not None:
+            if self.last_num:
+                self.process_seconds = self._update(
+                    self.process_seconds,
+                    (poll_start - self.last_return) / self.last_num,
+                )
+            cycle = poll_end - self.last_return
+            if cycle > 0:
+                self.arrival_rate = self._update(
+                    self.arrival_rate, num_received / cycle
+                )
+        self.last_return, self.last_num = poll_end, num_received
+
+        self.polls += 1
+        # a full batch without waiting means msgs are queued up
+        is_backlog = (
+            num_received >= self.num_messages
+            and poll_end - poll_start < self.min_timeout
+        )
+        self.backlog_polls += is_backlog
+        self._tune(is_backlog)
+
+    def _tune(self, is_backlog: bool) -> None:
+        # msgs arriving in half of the slo, doubled while the batches come back full
+        num_messages = math.ceil(self.arrival_rate * self.latency_slo / 2)
+        if is_backlog:
+            num_messages = max(num_messages, self.num_messages * 2)
+
+        # processing a batch takes at most half of the slo
+        if self.process_seconds > 0:
+            num_messages = min(
+                num_messages, int(self.latency_slo / 2 / self.process_seconds)
+            )
+        self.num_messages = min(max(num_messages, self.min_batch), self.max_batch)
+
+        # the first msg of a batch waits for the rest, then for processing the batch;
+        # a poll of a single msg returns as soon as it arrives
+        timeout = self.max_timeout
+        if self.num_messages > 1:
+            timeout = self.latency_slo - self.num_messages * self.process_seconds
+        self.timeout = min(max(timeout, self.min_timeout), self.max_timeout)
+
+    def get_metrics(self) -> Dict[str, float]:
+        """ current decisions and statistics
+        """
+        return {
+            "num_messages": self.num_messages,
+            "timeout": round(self.timeout, 3),
+            "arrival_rate": round(self.arrival_rate, 2),
+            "process_ms": round(self.process_seconds * 1000, 3),
+            "polls": self.polls,
+            "backlog_polls": self.backlog_polls,
+        }
+
+
+def get_poll_controller() -> Optional[AdaptivePollController]:
+    """ controller of kafka polling, None if the latency SLO is not set
+    """
+    if ADAPTIVE_POLL_CONFIG["LATENCY_SLO"] <= 0:
+        return None
+    return AdaptivePollController()
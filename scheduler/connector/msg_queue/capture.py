@@ -0,0 +1,235 @@
+"""
+Record-and-replay capture of msg streams
+
+File layout:
+    header: MAGIC, VERSION
+    block*: compressed length, record num, zlib(records)
+            record: timestamp type, timestamp ms, topic len, key len, value len, topic, key, value
+    index:  (block offset, first timestamp ms, record num) of each block
+    footer: index offset, block num, INDEX_MAGIC
+
+The index is written when the writer is closed, a capture without index (e.g. the process is killed)
+is still readable by scanning the blocks. Opening an existing capture appends to it, e.g. after a restart
+"""
+import bisect
+import json
+import os
+import struct
+import zlib
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from connector.msg_queue.msg_info import MsgInfo
+
+
+MAGIC = b"SJCAP"
+INDEX_MAGIC = b"SJIDX"
+VERSION = 1
+
+_HEADER = struct.Struct(f"<{len(MAGIC)}sB")
+_BLOCK_HEADER = struct.Struct("<II")
+_RECORD_HEADER = struct.Struct("<bqHHI")
+_INDEX_ENTRY = struct.Struct("<QqI")
+_FOOTER = struct.Struct(f"<QI{len(INDEX_MAGIC)}s")
+
+# key len of a msg without key
+_NONE_KEY = 0xFFFF
+
+
+class CaptureFormatException(Exception):
+    """ The file is not a valid capture
+    """
+
+
+class MsgCaptureWriter:
+    """ append msgs to a compressed capture file block by block,
+        the blocks of an existing capture are kept
+
+    Args:
+        path: capture file path
+        block_size: msgs per compressed block
+    """
+
+    def __init__(self, path: str, block_size: int = 500) -> None:
+        self.path = path
+        self.block_size = block_size
+
+        self.records: List[bytes] = []
+        self.first_timestamp = 0
+        self.index: List[Tuple[int, int, int]] = []
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.capture_file: BinaryIO = open(path, "r+b")
+            self._reopen()
+        else:
+            self.capture_file = open(path, "wb")
+            self.capture_file.write(_HEADER.pack(MAGIC, VERSION))
+
+    def _reopen(self) -> None:
+        """ continue after the last complete block, the old index and footer
+            (or a broken last block) are dropped and the index is written again on close
+        """
+        self.index = MsgCaptureReader(self.path).index
+
+        end_offset = _HEADER.size
+        if self.index:
+            last_offset = self.index[-1][0]
+            self.capture_file.seek(last_offset)
+            block_len, _ = _BLOCK_HEADER.unpack(
+                self.capture_file.read(_BLOCK_HEADER.size)
+            )
+            end_offset = last_offset + _BLOCK_HEADER.size + block_len
+
+        self.capture_file.seek(end_offset)
+        self.capture_file.truncate()
+
+    def write(self, msg: MsgInfo) -> None:
+        """ buffer a msg, the block is flushed when it is full
+        """
+        timestamp_type, timestamp = msg.timestamp or (0, 0)
+        topic = msg.topic.encode("utf-8")
+        key = b"" if msg.msg_key is None else msg.msg_key.encode("utf-8")
+        value = json.dumps(msg.msg_value, separators=(",", ":")).encode("utf-8")
+
+        if not self.records:
+            self.first_timestamp = timestamp
+        self.records.append(
+            _RECORD_HEADER.pack(
+                timestamp_type,
+                timestamp,
+                len(topic),
+                _NONE_KEY if msg.msg_key is None else len(key),
+                len(value),
+            )
+            + topic
+            + key
+            + value
+        )
+
+        if len(self.records) >= self.block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """ compress and write the buffered msgs as a block
+        """
+        if not self.records:
+            return
+
+        block = zlib.compress(b"".join(self.records))
+        self.index.append(
+            (self.capture_file.tell(), self.first_timestamp, len(self.records))
+        )
+        self.capture_file.write(_BLOCK_HEADER.pack(len(block), len(self.records)))
+        self.capture_file.write(block)
+        self.capture_file.flush()
+        self.records = []
+
+    def close(self) -> None:
+        """ flush the last block, then write index and footer
+        """
+        self.flush()
+        index_offset = self.capture_file.tell()
+        for entry in self.index:
+            self.capture_file.write(_INDEX_ENTRY.pack(*entry))
+        self.capture_file.write(
+            _FOOTER.pack(index_offset, len(self.index), INDEX_MAGIC)
+        )
+        self.capture_file.close()
+
+
+class MsgCaptureReader:
+    """ read msgs from a capture file in the recorded order
+
+    Args:
+        path: capture file path
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+        with open(path, "rb") as capture_file:
+            magic, version = _HEADER.unpack(capture_file.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise CaptureFormatException(f"{path} is not a capture v{VERSION}")
+
+            self.index = self._read_index(capture_file)
+
+    @staticmethod
+    def _read_index(capture_file: BinaryIO) -> List[Tuple[int, int, int]]:
+        capture_file.seek(0, 2)
+        file_size = capture_file.tell()
+        if file_size >= _HEADER.size + _FOOTER.size:
+            capture_file.seek(file_size - _FOOTER.size)
+            index_offset, block_num, index_magic = _FOOTER.unpack(
+                capture_file.read(_FOOTER.size)
+            )
+            if index_magic == INDEX_MAGIC:
+                capture_file.seek(index_offset)
+                return [
+                    _INDEX_ENTRY.unpack(capture_file.read(_INDEX_ENTRY.size))
+                    for _ in range(block_num)
+                ]
+
+        # no index, scan the blocks
+        index = []
+        offset = _HEADER.size
+        while offset + _BLOCK_HEADER.size <= file_size:
+            capture_file.seek(offset)
+            block_len, record_num = _BLOCK_HEADER.unpack(
+                capture_file.read(_BLOCK_HEADER.size)
+            )
+            if offset + _BLOCK_HEADER.size + block_len > file_size:
+                # the last block is broken
+                break
+            records = zlib.decompress(capture_file.read(block_len))
+            first_timestamp = _RECORD_HEADER.unpack_from(records)[1]
+            index.append((offset, first_timestamp, record_num))
+            offset += _BLOCK_HEADER.size + block_len
+
+        return index
+
+    def __len__(self) -> int:
+        return sum(record_num for _, _, record_num in self.index)
+
+    @staticmethod
+    def _iter_block(records: bytes) -> Iterator[MsgInfo]:
+        offset = 0
+        while offset < len(records):
+            record_header = _RECORD_HEADER.unpack_from(records, offset)
+            timestamp_type, timestamp, topic_len, key_len, value_len = record_header
+            offset += _RECORD_HEADER.size
+            topic = records[offset : offset + topic_len].decode("utf-8")
+            offset += topic_len
+
+            msg_key: Optional[str] = None
+            if key_len != _NONE_KEY:
+                msg_key = records[offset : offset + key_len].decode("utf-8")
+                offset += key_len
+
+            msg_value = json.loads(records[offset : offset + value_len])
+            offset += value_len
+
+            yield MsgInfo(topic, msg_key, msg_value, (timestamp_type, timestamp))
+
+    def iter_msgs(self, start_timestamp: Optional[int] = None) -> Iterator[MsgInfo]:
+        """ iterate msgs, start from the block which may include start_timestamp (ms)
+        """
+        start_block = 0
+        if start_timestamp is not None:
+            first_timestamps = [first_timestamp for _, first_timestamp, _ in self.index]
+            start_block = max(
+                bisect.bisect_right(first_timestamps, start_timestamp) - 1, 0
+            )
+
+        with open(self.path, "rb") as capture_file:
+            for offset, _, _ in self.index[start_block:]:
+                capture_file.seek(offset)
+                block_len, _ = _BLOCK_HEADER.unpack(
+                    capture_file.read(_BLOCK_HEADER.size)
+                )
+                records = zlib.decompress(capture_file.read(block_len))
+                for msg in self._iter_block(records):
+                    if start_timestamp is None or msg.timestamp[1] >= start_timestamp:
+                        yield msg
+
+    def __iter__(self) -> Iterator[MsgInfo]:
+        return self.iter_msgs()
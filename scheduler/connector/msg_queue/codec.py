@@ -0,0 +1,145 @@
+"""
+Compact binary encoding of msg values, beside json
+
+Layout of a binary value:
+    MAGIC, schema version, msgpack(fields of the schema)
+    schema 1: [username, job_type, request_time, deadline, job_parameters, other job_config]
+              request_time / deadline are epoch seconds (utc)
+
+A json value never starts with MAGIC, so both encodings could share a topic.
+Decoders are built once per schema version; msgpack is only required by binary values
+A top level field could be peeked without decoding the whole value, e.g. for routing msgs
+"""
+import functools
+import json
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from config import DATE_FORMAT
+
+
+MAGIC = 0xB5
+SCHEMA_VERSION = 1
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class UnknownSchemaException(Exception):
+    """ The binary value is encoded by an unknown schema version
+    """
+
+
+def _decode_v1(fields) -> Dict[str, Any]:
+    username, job_type, request_time, deadline, job_parameters, job_config = fields
+    job_config["request_time"] = request_time
+    job_config["deadline"] = deadline
+    return {
+        "username": username,
+        "job_type": job_type,
+        "job_parameters": job_parameters,
+        "job_config": job_config,
+    }
+
+
+_SCHEMA_DECODERS = {1: _decode_v1}
+# schema version: {field name: index in the fields}, fields which could be peeked
+_SCHEMA_FIELD_INDEXES = {1: {"username": 0, "job_type": 1}}
+
+
+@functools.lru_cache(maxsize=None)
+def get_decoder(version: int) -> Callable[[memoryview], Dict[str, Any]]:
+    """ decoder of a schema version, from msgpack bytes to a msg value
+    """
+    if version not in _SCHEMA_DECODERS:
+        raise UnknownSchemaException(f"Unknown schema version {version}")
+
+    # pylint: disable=C0415
+    import msgpack
+
+    unpackb = functools.partial(msgpack.unpackb, raw=False)
+    decode_fields = _SCHEMA_DECODERS[version]
+    return lambda data: decode_fields(unpackb(data))
+
+
+def decode_msg_value(data: Optional[bytes]) -> Dict[str, Any]:
+    """ msg value of a binary or json encoded value,
+        an empty dict of a msg without value, e.g. a cancel msg keyed by job id
+    """
+    if not data:
+        return {}
+    if data[0] == MAGIC:
+        return get_decoder(data[1])(memoryview(data)[2:])
+    return json.loads(data)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_json_field_pattern(name: str):
+    # a string value without escapes, e.g. "username": "ncku_r"
+    return re.compile(b'"' + re.escape(name.encode("utf-8")) + rb'"\s*:\s*"([^"\\]*)"')
+
+
+def _peek_json_field(data: bytes, name: str) -> Any:
+    # the key is only trusted if it appears once, otherwise it could be a nested key or a value
+    if data.count(b'"' + name.encode("utf-8") + b'"') == 1:
+        match = _get_json_field_pattern(name).search(data)
+        if match is not None:
+            return match.group(1).decode("utf-8")
+    return decode_msg_value(data).get(name, "")
+
+
+def _peek_binary_field(data: bytes, name: str) -> Any:
+    field_index = _SCHEMA_FIELD_INDEXES.get(data[1], {}).get(name)
+    if field_index is None:
+        return decode_msg_value(data).get(name, "")
+
+    # pylint: disable=C0415
+    import msgpack
+
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(memoryview(data)[2:])
+    unpacker.read_array_header()
+    for _ in range(field_index):
+        unpacker.skip()
+    return unpacker.unpack()
+
+
+def peek_msg_field(data: Optional[bytes], name: str) -> Any:
+    """ a top level field of a binary or json encoded value without decoding the whole value,
+        the value is decoded if the field could not be found cheaply, "" if there is no such field
+    """
+    if not data:
+        return ""
+    if data[0] == MAGIC:
+        return _peek_binary_field(data, name)
+    return _peek_json_field(data, name)
+
+
+def to_epoch(value) -> int:
+    """ epoch seconds of a date string (DATE_FORMAT), datetime or epoch seconds
+    """
+    if isinstance(value, str):
+        value = datetime.strptime(value, DATE_FORMAT)
+    if isinstance(value, datetime):
+        return int((value - _EPOCH).total_seconds())
+    return int(value)
+
+
+def encode_msg_value(msg_value: Dict[str, Any]) -> bytes:
+    """ binary value of a new job msg value, for producers and replaying captures
+    """
+    # pylint: disable=C0415
+    import msgpack
+
+    job_config = dict(msg_value["job_config"])
+    request_time = to_epoch(job_config.pop("request_time"))
+    deadline = to_epoch(job_config.pop("deadline"))
+    fields = [
+        msg_value.get("username"),
+        msg_value["job_type"],
+        request_time,
+        deadline,
+        msg_value["job_parameters"],
+        job_config,
+    ]
+    return bytes((MAGIC, SCHEMA_VERSION)) + msgpack.packb(fields, use_bin_type=True)
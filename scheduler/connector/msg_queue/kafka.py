@@ -3,12 +3,16 @@ Kafka Connection Module
 Author: Po-Chun, Lu
 """
 import json
-from collections import namedtuple
+import time
 
 from loguru import logger
-from confluent_kafka import Consumer, KafkaException, KafkaError
+from confluent_kafka import Consumer, Producer, KafkaException, KafkaError
 
-from config import CONFIG
+from config import CONFIG, CAPTURE_CONFIG
+from connector.msg_queue.msg_info import MsgInfo
+from connector.msg_queue.adaptive import get_poll_controller
+from connector.msg_queue.capture import MsgCaptureWriter
+from connector.msg_queue.codec import decode_msg_value
 
 
 def _error_cb(err):
@@ -30,6 +34,10 @@ class KafkaConsumer:
     Attributes:
         topic_names (:obj:`list` of :obj:`str`): topics to subscribe e.g. ['command', 'get', 'insert']
         consumer (:obj:`instance`): a confluent_kafka Consumer instance
+        express_topic_names (:obj:`list` of :obj:`str`): topics drained before the others
+        express_consumer (:obj:`instance`): a Consumer of express topics in the same group, None if disabled
+        capture (:obj:`MsgCaptureWriter`): record consumed msgs if CAPTURE_PATH is set
+        poll_controller (:obj:`AdaptivePollController`): tune batch size and timeout if POLL_LATENCY_SLO is set
 
     """
 
@@ -45,31 +53,112 @@ class KafkaConsumer:
         }
 
         self.consumer = Consumer(kafka_config)
-        self.topic_names = config["topic_names"]
+        self.express_topic_names = config["express_topic_names"]
+        self.topic_names = [
+            topic_name
+            for topic_name in config["topic_names"]
+            if topic_name not in self.express_topic_names
+        ]
 
-    def start(self):
+        # a flood of new jobs never delays msgs of express topics in their own consumer
+        self.express_consumer = None
+        self.poll_timeout = 1.0
+        if self.express_topic_names:
+            self.express_consumer = Consumer(kafka_config)
+            self.poll_timeout = config["express_poll_timeout"]
+
+        self.capture = None
+        if CAPTURE_CONFIG["PATH"]:
+            self.capture = MsgCaptureWriter(
+                CAPTURE_CONFIG["PATH"], CAPTURE_CONFIG["BLOCK_SIZE"]
+            )
+            logger.info(f"Capture msgs into {CAPTURE_CONFIG['PATH']}")
+
+        self.poll_controller = get_poll_controller()
+
+    def start(self, on_assign=None, on_revoke=None):
         """start the kafka consumer service
+
+        Args:
+            on_assign (callable): called with [(topic, partition), ...] after partitions are assigned
+            on_revoke (callable): called with [(topic, partition), ...] before partitions are revoked
         """
-        self.consumer.subscribe(self.topic_names)
+        rebalance_callbacks = {}
+        if on_assign is not None:
+            rebalance_callbacks["on_assign"] = lambda _, partitions: on_assign(
+                [(partition.topic, partition.partition) for partition in partitions]
+            )
+        if on_revoke is not None:
+            rebalance_callbacks["on_revoke"] = lambda _, partitions: on_revoke(
+                [(partition.topic, partition.partition) for partition in partitions]
+            )
+
+        self.consumer.subscribe(self.topic_names, **rebalance_callbacks)
         logger.info(f"Monitor topics: {self.topic_names}")
 
+        if self.express_consumer is not None:
+            self.express_consumer.subscribe(self.express_topic_names)
+            logger.info(f"Monitor express topics: {self.express_topic_names}")
+
+    def commit(self):
+        """commit the offsets of consumed msgs synchronously
+        """
+        for consumer in (self.consumer, self.express_consumer):
+            if consumer is None:
+                continue
+            try:
+                consumer.commit(asynchronous=False)
+            except KafkaException as error:
+                # pylint: disable=W0212
+                # (protected-access)
+                if error.args[0].code() != KafkaError._NO_OFFSET:
+                    raise
+                # pylint: enable=W0212
+
+    def _consume(self, num_messages, timeout):
+        if self.express_consumer is None:
+            return self.consumer.consume(num_messages=num_messages, timeout=timeout)
+
+        # prefetched express msgs first, without waiting
+        records = self.express_consumer.consume(num_messages=num_messages, timeout=0)
+        if len(records) < num_messages:
+            records.extend(
+                self.consumer.consume(
+                    num_messages=num_messages - len(records),
+                    timeout=0 if records else min(timeout, self.poll_timeout),
+                )
+            )
+        return records
+
     def _get_msgs_from_queue(self):
-        records = self.consumer.consume(num_messages=500, timeout=1.0)
+        if self.poll_controller is None:
+            return self._consume(500, 1.0)
+
+        num_messages, timeout = self.poll_controller.get_poll_params()
+        poll_start = time.monotonic()
+        records = self._consume(num_messages, timeout)
+        self.poll_controller.observe(len(records), poll_start, time.monotonic())
         return records
 
+    def get_poll_metrics(self):
+        """ decisions of the adaptive polling, empty if it is disabled
+        """
+        if self.poll_controller is None:
+            return {}
+        return self.poll_controller.get_metrics()
+
     @staticmethod
-    def _get_info_gen_from_msgs(records):
+    def _get_info_gen_from_msgs(records, is_raw_value):
         def get_info_from_msg(record):
             topic = record.topic()
             timestamp = record.timestamp()
             msg_key = _decode_utf8(record.key())
-            msg_value = _decode_utf8(record.value())
-
-            MsgInfo = namedtuple(
-                "MsgInfo", ["topic", "msg_key", "msg_value", "timestamp"]
+            # json or binary value, detected by its first byte
+            msg_value = (
+                record.value() if is_raw_value else decode_msg_value(record.value())
             )
 
-            return MsgInfo(topic, msg_key, json.loads(msg_value), timestamp)
+            return MsgInfo(topic, msg_key, msg_value, timestamp, record.partition())
 
         for record in records:
             if record is None:
@@ -90,9 +179,24 @@ class KafkaConsumer:
             else:
                 yield get_info_from_msg(record)
 
-    def get_info_gen_from_queue(self):
+    def _tap_info_gen(self, validated_records, is_raw_value):
+        for msg in validated_records:
+            if is_raw_value:
+                # captures keep decoded values
+                self.capture.write(
+                    msg._replace(msg_value=decode_msg_value(msg.msg_value))
+                )
+            else:
+                self.capture.write(msg)
+            yield msg
+
+    def get_info_gen_from_queue(self, is_raw_value=False):
         """ retrieve data from msg queue, ignore blank msg
 
+        Args:
+            is_raw_value (bool): keep msg values as bytes, decoded later by the caller,
+                                 e.g. the sharded router decodes them in the workers
+
         Return:
             generator object of msg data
 
@@ -104,10 +208,53 @@ class KafkaConsumer:
             ]
         """
         records = self._get_msgs_from_queue()
-        validated_records = self._get_info_gen_from_msgs(records)
+        validated_records = self._get_info_gen_from_msgs(records, is_raw_value)
+        if self.capture is not None:
+            return self._tap_info_gen(validated_records, is_raw_value)
         return validated_records
 
     def close(self):
         """close the kafka consumer service
         """
         self.consumer.close()
+        if self.express_consumer is not None:
+            self.express_consumer.close()
+        if self.capture is not None:
+            self.capture.close()
+
+
+class KafkaProducer:
+    """ Activate a Kafka producer instance, for notifying other services
+
+    Attributes:
+        producer (:obj:`instance`): a confluent_kafka Producer instance
+    """
+
+    def __init__(self):
+        config = CONFIG["consumer_kafka"]
+        producer_config = CONFIG["producer_kafka"]
+
+        self.producer = Producer(
+            {
+                "bootstrap.servers": config["kafka_ip"],
+                "error_cb": _error_cb,
+                "compression.type": producer_config["compression_type"],
+                "linger.ms": producer_config["linger_ms"],
+            }
+        )
+
+    def produce(self, topic, msg_key, msg_value):
+        """ send a json msg without blocking, delivery reports are served by poll(0)
+
+        Args:
+            topic (str): topic of the msg
+            msg_key (str): e.g. job id
+            msg_value (dict): json serializable msg value
+        """
+        self.producer.produce(topic, key=msg_key, value=json.dumps(msg_value))
+        self.producer.poll(0)
+
+    def close(self, timeout=10.0):
+        """ wait for the buffered msgs before closing
+        """
+        self.producer.flush(timeout)
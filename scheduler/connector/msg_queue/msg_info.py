@@ -0,0 +1,13 @@
+"""
+Common msg format of msg queue connectors
+"""
+from collections import namedtuple
+
+
+# timestamp: (timestamp type, timestamp ms) as kafka record
+# partition: None if the msg is not from kafka, e.g. replay or simulation
+MsgInfo = namedtuple(
+    "MsgInfo",
+    ["topic", "msg_key", "msg_value", "timestamp", "partition"],
+    defaults=(None,),
+)
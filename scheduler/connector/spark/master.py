@@ -0,0 +1,36 @@
+"""
+Client of the Spark standalone master status, e.g. http://spark-master:8080/json/
+"""
+from typing import Dict
+
+import requests
+
+from utils.common import send_get_request
+
+
+def fetch_spark_master_status(url: str, timeout: float) -> Dict[str, float]:
+    """ capacity of the alive workers of a Spark master
+
+    Args:
+        url (str): json status url of the master
+        timeout (float): seconds of the request
+
+    Raises:
+        requests.RequestException: the master is unavailable
+
+    Returns:
+        Dict[str, float]: cpu cores and memory (G),
+                          e.g. {"cpu_total": 32, "cpu_used": 8, "mem_total": 128, "mem_used": 16}
+    """
+    res = send_get_request(url, timeout=timeout)
+    if res is None or res.status_code != 200:
+        raise requests.RequestException(f"no status from {url}")
+    status = res.json()
+
+    return {
+        "cpu_total": status["cores"],
+        "cpu_used": status["coresused"],
+        # the master reports memory in MB
+        "mem_total": status["memory"] / 1024,
+        "mem_used": status["memoryused"] / 1024,
+    }
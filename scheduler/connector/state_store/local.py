@@ -0,0 +1,57 @@
+"""
+Local file store of staging jobs, a stand-in of a shared state store
+Each (topic, partition) is stored in one json lines file, so the instance which takes over the partition
+could load exactly the jobs of it
+"""
+import json
+import os
+from typing import Dict, List
+
+from loguru import logger
+
+
+class LocalStagingStore:
+    """ store serialized staging jobs by partition
+
+    Args:
+        store_dir: directory of the store, should be shared by scheduler instances
+    """
+
+    def __init__(self, store_dir: str) -> None:
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _get_path(self, topic: str, partition: int) -> str:
+        return os.path.join(self.store_dir, f"{topic}-{partition}.jsonl")
+
+    def save(self, topic: str, partition: int, job_dicts: List[Dict]) -> None:
+        """ append jobs of a partition, the file is replaced atomically
+        """
+        path = self._get_path(topic, partition)
+        tmp_path = f"{path}.tmp"
+
+        with open(tmp_path, "w") as tmp_file:
+            if os.path.exists(path):
+                with open(path) as store_file:
+                    tmp_file.write(store_file.read())
+            for job_dict in job_dicts:
+                tmp_file.write(json.dumps(job_dict) + "\n")
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+
+        os.replace(tmp_path, path)
+        logger.info(f"Store {len(job_dicts)} jobs of {topic}-{partition}")
+
+    def load(self, topic: str, partition: int) -> List[Dict]:
+        """ take the jobs of a partition, they are removed from the store
+        """
+        path = self._get_path(topic, partition)
+        if not os.path.exists(path):
+            return []
+
+        with open(path) as store_file:
+            job_dicts = [json.loads(line) for line in store_file if line.strip()]
+        os.remove(path)
+
+        logger.info(f"Load {len(job_dicts)} jobs of {topic}-{partition}")
+        return job_dicts
@@ -0,0 +1,74 @@
+"""
+SQLite store of spilled jobs, serialized jobs are kept on disk and fetched by job_id
+The store is a spill area of one scheduler process, so it is locked exclusively and cleared when opened,
+a store locked by another process is never cleared; durability is traded for write speed
+"""
+import json
+import sqlite3
+from typing import Dict, Optional
+
+from loguru import logger
+
+
+class SQLiteJobStore:
+    """ serialized jobs keyed by job_id in a SQLite file
+
+    Args:
+        path: file of the store, ":memory:" for testing
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # created by the main thread, but used by the scheduling thread of the pipelined runtime;
+        # only one thread uses the store at a time
+        self.conn = sqlite3.connect(path, timeout=0, check_same_thread=False)
+        try:
+            # the lock is kept until the connection is closed
+            self.conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+            self.conn.execute("PRAGMA synchronous = OFF")
+            self.conn.execute("PRAGMA journal_mode = MEMORY")
+            self.conn.execute("BEGIN EXCLUSIVE")
+        except sqlite3.OperationalError as error:
+            self.conn.close()
+            logger.error(f"Job Store {path} is used by another process")
+            raise RuntimeError(f"Job Store {path} is locked: {error}") from error
+
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, job TEXT NOT NULL)"
+        )
+        # keys of the jobs left by the last process are gone
+        self.conn.execute("DELETE FROM jobs")
+        self.conn.commit()
+        logger.info(f"Open Job Store {path}")
+
+    def put(self, job_id: str, job_dict: Dict) -> None:
+        """ store a serialized job
+        """
+        self.conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, job) VALUES (?, ?)",
+            (job_id, json.dumps(job_dict)),
+        )
+        self.conn.commit()
+
+    def take(self, job_id: str) -> Optional[Dict]:
+        """ fetch a job and remove it from the store
+        """
+        row = self.conn.execute(
+            "SELECT job FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.delete(job_id)
+        return json.loads(row[0])
+
+    def delete(self, job_id: str) -> None:
+        """ remove a job without fetching it
+        """
+        self.conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        self.conn.commit()
+
+    def close(self) -> None:
+        """ close the connection
+        """
+        self.conn.close()
@@ -2,25 +2,18 @@
 
 Author: Po-Chun, Lu
 """
+import signal
+
 from loguru import logger
 
-from connector.msg_queue.kafka import KafkaConsumer
-from operators.job_consumer.main import JobConsumer
-from operators.job_monitor.main import JobMonitor
+from config import init_config
+from runtime import SchedulerRuntime
 
 
-class MainProcess:
+class MainProcess(SchedulerRuntime):
     """ Entry Process of Job scheduling
     """
 
-    def __init__(self) -> None:
-
-        # for getting msg
-        self.consumer = KafkaConsumer()
-
-        # for processing msg
-        self.operator = JobConsumer(JobMonitor())
-
     def _handle_msgs(self) -> None:
         while True:
             msgs = self.consumer.get_info_gen_from_queue()
@@ -33,22 +26,29 @@ class MainProcess:
 
                 self.operator.consume_msg(msg)
 
+            # poll timeout keeps retries going without new msgs
+            self.operator.process_retries()
+            self.operator.publish_etas()
+
     def run(self) -> None:
         """ start msg queue consumer and consume msgs
         """
+        signal.signal(signal.SIGHUP, self._reload_policy)
         try:
-            self.consumer.start()
+            # handoff callbacks run inside consume(), the same thread of scheduling
+            self._start_services()
             self._handle_msgs()
 
         except KeyboardInterrupt:
             logger.warning("Aborted by user")
         finally:
-            self.consumer.close()
+            self._stop_services()
 
 
 def main():
     """ define main function for cython usage
     """
+    init_config()
     logger.warning("ReStart Scheduler Process")
     app = MainProcess()
     app.run()
@@ -0,0 +1,113 @@
+"""
+Module for the deadline feasibility admission test of new jobs
+Queued work (cpu * computing_time) of staging jobs is kept in deadline order with prefix sums,
+so the work ahead of a new job under earliest deadline first is found in O(log n).
+If the new job could not meet its deadline even then, it is flagged or rejected before staging
+"""
+import itertools
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+from config import ADMISSION_CONFIG, DATE_FORMAT, SYSTEM_CONFIG
+from utils.clock import get_clock
+from utils.order_statistic import OrderStatisticTree
+from operators.job_consumer.resources.base_job import Job
+from operators.job_monitor.main import JobMonitor
+
+
+def get_job_work(job: Job) -> float:
+    """ cpu seconds of a job
+    """
+    return job.job_resources["cpu"] * (job.job_resources["computing_time"] or 0)
+
+
+# settings are injected, and staged work is keyed by deadline and staging order
+class AdmissionController:  # pylint: disable=R0902
+    """ admission test of new jobs, also a stage listener of JobConsumer
+
+    Args:
+        job_monitor: for the remaining work of running jobs
+        notify: send (job_id, msg_value) of the jobs failing the test, e.g. to a response topic
+        mode: flag: stage and notify, reject: notify without staging
+        tolerance: seconds a job is allowed to finish after its deadline
+        capacity: cpu of the cluster
+    """
+
+    # the settings default to .env, a simulation or test passes its own
+    def __init__(  # pylint: disable=R0913
+        self,
+        job_monitor: JobMonitor,
+        notify: Optional[Callable[[str, Dict], None]] = None,
+        mode: str = ADMISSION_CONFIG["MODE"],
+        tolerance: float = ADMISSION_CONFIG["TOLERANCE"],
+        capacity: int = SYSTEM_CONFIG["SYSTEM_CPU"],
+    ) -> None:
+        self.job_monitor = job_monitor
+        self.notify = notify
+        self.mode = mode
+        self.tolerance = timedelta(seconds=tolerance)
+        self.capacity = capacity
+
+        # key: (deadline, seq), weight: work of the staging job
+        self.tree = OrderStatisticTree()
+        self.keys: Dict[int, Tuple[datetime, int]] = {}
+        self.seq = itertools.count()
+
+    def on_staged(self, _: int, job: Job) -> None:
+        """ a job is inserted into a staging list
+        """
+        key = (job.job_times["deadline"], next(self.seq))
+        self.keys[id(job)] = key
+        self.tree.insert(key, job.job_id, get_job_work(job))
+
+    def on_unstaged(self, _: int, job: Job) -> None:
+        """ a job leaves its staging list, e.g. it is dispatched
+        """
+        key = self.keys.pop(id(job), None)
+        if key is not None:
+            self.tree.remove(key)
+
+    def estimate_finish_time(self, job: Job) -> datetime:
+        """ finish time of a new job if all jobs run in deadline order on the whole cluster
+        """
+        # jobs with the same deadline are staged earlier, so they are ahead of the new job
+        work_ahead = self.tree.prefix_weight(
+            (job.job_times["deadline"], next(self.seq))
+        )
+        work_ahead += self.job_monitor.get_running_work()
+
+        return get_clock().utcnow() + timedelta(
+            seconds=work_ahead / self.capacity
+            + (job.job_resources["computing_time"] or 0)
+        )
+
+    def admit(self, job: Job) -> bool:
+        """ test a new job before staging
+
+        Returns:
+            bool -- False if the job should not be staged
+        """
+        finish_time = self.estimate_finish_time(job)
+        if finish_time <= job.job_times["deadline"] + self.tolerance:
+            return True
+
+        is_rejected = self.mode == "reject"
+        logger.warning(
+            f"Job {job.job_id} could not meet deadline {job.job_times['deadline']}, "
+            + f"estimated finish: {finish_time}, {'reject' if is_rejected else 'flag'}"
+        )
+
+        if self.notify is not None:
+            self.notify(
+                job.job_id,
+                {
+                    "job_id": job.job_id,
+                    "status": "rejected" if is_rejected else "flagged",
+                    "deadline": job.job_times["deadline"].strftime(DATE_FORMAT),
+                    "estimated_finish_time": finish_time.strftime(DATE_FORMAT),
+                },
+            )
+
+        return not is_rejected
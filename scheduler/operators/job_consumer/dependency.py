@@ -0,0 +1,201 @@
+"""
+Module for jobs depending on other jobs
+A job with `depends_on` (job ids in job_config) waits until all of its parents complete.
+Waiting jobs keep in-degree counters, a completion decrements the counters of its children,
+so ready jobs are found in O(out-degree) without scanning the waiting jobs.
+Completed job ids are only kept in memory, so after a restart or a partition handover a job may wait
+for parents which already completed; such jobs are released after the max wait,
+unless a parent is still known to the scheduler, e.g. staging or running
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from loguru import logger
+
+from config import DEPENDENCY_CONFIG
+from utils.clock import get_clock
+from operators.job_consumer.resources.base_job import Job
+
+
+class DependencyTracker:
+    """ waiting jobs and the completed jobs they may depend on
+
+    Args:
+        completed_size: number of recent completed job ids kept,
+                        for jobs submitted after their parents complete
+        max_wait: seconds a job waits before it is released, 0: wait forever
+    """
+
+    def __init__(
+        self,
+        completed_size: int = DEPENDENCY_CONFIG["COMPLETED_SIZE"],
+        max_wait: float = DEPENDENCY_CONFIG["MAX_WAIT"],
+    ) -> None:
+        self.completed_size = completed_size
+        self.completed: "OrderedDict[str, None]" = OrderedDict()
+        self.max_wait = max_wait
+        # job_id: time the job starts waiting, in waiting order
+        self.held_at: "OrderedDict[str, datetime]" = OrderedDict()
+
+        # job_id: job whose parents are not all completed, and its unmet parent number
+        self.waiting: Dict[str, Job] = {}
+        self.in_degree: Dict[str, int] = {}
+        # parent job_id: children job_ids, removed children are skipped
+        self.children: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.waiting)
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self.waiting
+
+    @staticmethod
+    def get_parents(job: Job) -> List[str]:
+        """ job ids the job depends on
+        """
+        return job.job_config.get("depends_on") or []
+
+    def hold(self, job: Job) -> bool:
+        """ keep a new job waiting if any of its parents is not completed
+
+        Returns:
+            bool -- whether the job waits
+        """
+        unmet_parents = {
+            parent_id
+            for parent_id in self.get_parents(job)
+            if parent_id not in self.completed and parent_id != job.job_id
+        }
+        if not unmet_parents:
+            return False
+
+        self.waiting[job.job_id] = job
+        self.held_at.pop(job.job_id, None)
+        self.held_at[job.job_id] = get_clock().utcnow()
+        self.in_degree[job.job_id] = len(unmet_parents)
+        for parent_id in unmet_parents:
+            self.children.setdefault(parent_id, []).append(job.job_id)
+
+        logger.info(f"Job {job.job_id} waits for {sorted(unmet_parents)}")
+        return True
+
+    def complete(self, job_id: str) -> List[Job]:
+        """ a job completes, O(out-degree)
+
+        Returns:
+            List[Job] -- children whose parents are all completed
+        """
+        self.completed[job_id] = None
+        if len(self.completed) > self.completed_size:
+            self.completed.popitem(last=False)
+
+        ready_jobs = []
+        for child_id in self.children.pop(job_id, []):
+            if child_id not in self.in_degree:
+                continue
+
+            self.in_degree[child_id] -= 1
+            if self.in_degree[child_id] == 0:
+                del self.in_degree[child_id]
+                del self.held_at[child_id]
+                ready_jobs.append(self.waiting.pop(child_id))
+
+        if ready_jobs:
+            logger.info(
+                f"Job {job_id} completes, ready: {[job.job_id for job in ready_jobs]}"
+            )
+        return ready_jobs
+
+    def get_unmet_parents(self, job_id: str) -> List[str]:
+        """ parents of a waiting job which are not completed
+        """
+        job = self.waiting.get(job_id)
+        if job is None:
+            return []
+        return [
+            parent_id
+            for parent_id in self.get_parents(job)
+            if parent_id not in self.completed
+        ]
+
+    def remove(self, job_id: str) -> Optional[Job]:
+        """ drop a waiting job, e.g. it is cancelled
+        """
+        self.in_degree.pop(job_id, None)
+        self.held_at.pop(job_id, None)
+        job = self.waiting.pop(job_id, None)
+        if job is not None:
+            self._unlink(job)
+        return job
+
+    def _unlink(self, job: Job) -> None:
+        """ remove a job from the children of its parents, so parents which never complete
+            do not keep the children lists
+        """
+        for parent_id in self.get_parents(job):
+            children = self.children.get(parent_id)
+            if children is None:
+                continue
+            children = [child_id for child_id in children if child_id != job.job_id]
+            if children:
+                self.children[parent_id] = children
+            else:
+                del self.children[parent_id]
+
+    def release_expired(self, is_known: Callable[[str], bool]) -> List[Job]:
+        """ release the jobs waiting longer than the max wait, in waiting order,
+            e.g. their parents completed before a restart or a partition handover,
+            jobs with a known parent wait for another max wait instead
+
+        Arguments:
+            is_known {Callable[[str], bool]} -- whether a parent job is still in the scheduler,
+                                                so its completion would come
+        """
+        if not self.max_wait or not self.held_at:
+            return []
+
+        now: datetime = get_clock().utcnow()
+        expired_time = now - timedelta(seconds=self.max_wait)
+        expired_jobs = []
+        while self.held_at:
+            job_id, held_at = next(iter(self.held_at.items()))
+            if held_at > expired_time:
+                break
+
+            unmet_parents = self.get_unmet_parents(job_id)
+            if any(is_known(parent_id) for parent_id in unmet_parents):
+                self.held_at.move_to_end(job_id)
+                self.held_at[job_id] = now
+                continue
+
+            logger.warning(
+                f"Job {job_id} waits over {self.max_wait}s, "
+                + f"release it without {unmet_parents}"
+            )
+            expired_jobs.append(self.remove(job_id))
+        return expired_jobs
+
+    def drop_dependents(self, job_id: str) -> List[Job]:
+        """ drop the waiting jobs which depend on a job directly or indirectly,
+            e.g. the job is cancelled, so they could never be ready
+        """
+        dropped_jobs = []
+        parent_ids = [job_id]
+        while parent_ids:
+            for child_id in self.children.pop(parent_ids.pop(), []):
+                child = self.remove(child_id)
+                if child is not None:
+                    dropped_jobs.append(child)
+                    parent_ids.append(child_id)
+        return dropped_jobs
+
+    def drop_partitions(self, partitions: Set[int]) -> List[Job]:
+        """ take the waiting jobs of the given msg partitions
+        """
+        job_ids = [
+            job_id
+            for job_id, job in self.waiting.items()
+            if job.partition in partitions
+        ]
+        return [self.remove(job_id) for job_id in job_ids]
@@ -0,0 +1,85 @@
+"""
+Module for publishing estimated start times of staging jobs
+Estimates come from the queue position across all levels, the expected finish times of running jobs
+and computing times. Only estimates which shift more than a threshold since the last published one
+are sent, so a scheduling round does not flood the topic
+"""
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+
+from config import DATE_FORMAT, ETA_CONFIG
+from utils.clock import get_clock
+from operators.job_consumer.introspection import JobRankIndex
+
+
+class EtaPublisher:
+    """ send estimated start times of staging jobs periodically
+
+    Args:
+        rank_index: staging jobs in latest start order
+        notify: send (job_id, msg_value), e.g. to an eta topic
+        interval: min seconds between two publishes
+        threshold: seconds an estimate should shift before it is sent again
+    """
+
+    def __init__(
+        self,
+        rank_index: JobRankIndex,
+        notify: Callable[[str, Dict], None],
+        interval: float = ETA_CONFIG["INTERVAL"],
+        threshold: float = ETA_CONFIG["THRESHOLD"],
+    ) -> None:
+        self.rank_index = rank_index
+        self.notify = notify
+        self.interval = interval
+        self.threshold = threshold
+
+        # job_id: the last published start time
+        self.published: Dict[str, datetime] = {}
+        self.last_time: Optional[float] = None
+
+    def publish(self) -> int:
+        """ send the estimates which shift enough, at most once per interval
+
+        Returns:
+            int -- number of sent estimates
+        """
+        now = get_clock().monotonic()
+        if self.last_time is not None and now - self.last_time < self.interval:
+            return 0
+        self.last_time = now
+
+        published: Dict[str, datetime] = {}
+        sent_num = 0
+        for (
+            job_id,
+            rank,
+            start_time,
+            finish_time,
+        ) in self.rank_index.estimate_start_times():
+            last_start_time = self.published.get(job_id)
+            if (
+                last_start_time is None
+                or abs((start_time - last_start_time).total_seconds()) > self.threshold
+            ):
+                self.notify(
+                    job_id,
+                    {
+                        "job_id": job_id,
+                        "rank": rank,
+                        "estimated_start_time": start_time.strftime(DATE_FORMAT),
+                        "estimated_finish_time": finish_time.strftime(DATE_FORMAT),
+                    },
+                )
+                last_start_time = start_time
+                sent_num += 1
+            published[job_id] = last_start_time
+
+        # jobs which left staging lists are forgotten
+        self.published = published
+
+        if sent_num:
+            logger.info(f"Publish {sent_num} ETAs of {len(published)} staging Jobs")
+        return sent_num
@@ -0,0 +1,74 @@
+"""
+Module for handing over staging jobs between scheduler instances of the same consumer group
+ - on revoke: staging jobs of the revoked partitions are flushed to the store, then offsets are committed
+ - on assign: staging jobs of the assigned partitions are loaded from the store
+So the jobs are neither lost nor duplicated when partitions move
+"""
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+from loguru import logger
+
+from config import KAFKA_TOPIC_CONFIG
+from connector.state_store.local import LocalStagingStore
+from operators.job_consumer.main import JobConsumer
+from operators.job_consumer.resources.base_job import Job
+
+
+class PartitionHandoff:
+    """ rebalance callbacks of a scheduler instance
+
+    Args:
+        operator: the JobConsumer owning staging lists
+        store: store shared by scheduler instances
+        commit: commit consumed offsets synchronously
+    """
+
+    def __init__(
+        self,
+        operator: JobConsumer,
+        store: LocalStagingStore,
+        commit: Callable[[], None],
+    ) -> None:
+        self.operator = operator
+        self.store = store
+        self.commit = commit
+
+        self.job_topic = KAFKA_TOPIC_CONFIG["TOPIC_NEW_JOB_NOTIFY"]
+
+    def _get_job_partitions(self, partitions: List[Tuple[str, int]]) -> List[int]:
+        return [partition for topic, partition in partitions if topic == self.job_topic]
+
+    def on_revoke(self, partitions: List[Tuple[str, int]]) -> None:
+        """ flush staging jobs of revoked partitions, then commit offsets
+            msgs after the committed offsets belong to the next owner
+        """
+        job_partitions = set(self._get_job_partitions(partitions))
+        dropped_jobs = self.operator.drop_partition_jobs(job_partitions)
+
+        partition_jobs: Dict[int, List[Dict]] = defaultdict(list)
+        for job in dropped_jobs:
+            partition_jobs[job.partition].append(job.to_dict())
+        for partition, job_dicts in partition_jobs.items():
+            self.store.save(self.job_topic, partition, job_dicts)
+
+        self.commit()
+        logger.warning(
+            f"Revoke partitions {sorted(job_partitions)}, hand over {len(dropped_jobs)} jobs"
+        )
+
+    def on_assign(self, partitions: List[Tuple[str, int]]) -> None:
+        """ rehydrate staging jobs of assigned partitions
+        """
+        restored_jobs = [
+            Job.from_dict(job_dict)
+            for partition in self._get_job_partitions(partitions)
+            for job_dict in self.store.load(self.job_topic, partition)
+        ]
+        logger.warning(
+            f"Assign partitions {partitions}, take over {len(restored_jobs)} jobs"
+        )
+
+        if restored_jobs:
+            self.operator.restore_jobs(restored_jobs)
+            self.operator.run_scheduling_round()
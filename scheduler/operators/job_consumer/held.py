@@ -0,0 +1,117 @@
+"""
+Module for the jobs known by the scheduler but kept out of staging lists
+ - waiting: jobs waiting for the jobs in their depends_on
+ - parked: picked jobs limited by concurrency caps or rate limits
+ - spilled: far-deadline jobs of the lowest level kept on disk
+and the cancels of unknown jobs, which drop the jobs when they come
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from config import CANCEL_CONFIG, DISPATCH_LIMIT_CONFIG
+from connector.state_store.sqlite import SQLiteJobStore
+from operators.job_consumer.dependency import DependencyTracker
+from operators.job_consumer.limiter import DispatchLimiter, SharedDispatchLimiter
+from operators.job_consumer.spill import ColdStagingTier
+from operators.job_consumer.resources.base_job import Job
+
+
+class HeldJobs:
+    """ waiting, parked and spilled jobs, and pending cancels
+
+    Args:
+        ledger: SharedResourceLedger of sharded workers, which counts type caps across them
+        spill_path: sqlite file of the cold tier, empty: no spilling
+    """
+
+    def __init__(self, ledger: Optional[Any], spill_path: str) -> None:
+        # jobs waiting for the jobs in their depends_on
+        self.dependencies = DependencyTracker()
+        # cancels of unknown jobs, e.g. overtaking new job msgs by the express lane
+        self.pending_cancels: "OrderedDict[str, None]" = OrderedDict()
+
+        # concurrency caps and rate limits of job types and users
+        self.limiter: Optional[DispatchLimiter] = None
+        if any(DISPATCH_LIMIT_CONFIG.values()):
+            self.limiter = (
+                DispatchLimiter() if ledger is None else SharedDispatchLimiter(ledger)
+            )
+
+        # far-deadline jobs of the lowest level wait on disk
+        self.cold_tier: Optional[ColdStagingTier] = None
+        if spill_path:
+            self.cold_tier = ColdStagingTier(SQLiteJobStore(spill_path))
+
+    def __contains__(self, job_id: str) -> bool:
+        return (
+            job_id in self.dependencies
+            or (self.limiter is not None and job_id in self.limiter)
+            or (self.cold_tier is not None and job_id in self.cold_tier)
+        )
+
+    def add_pending_cancel(self, job_id: str) -> None:
+        """ keep the cancel of an unknown job, the oldest one is dropped when it is full
+        """
+        self.pending_cancels[job_id] = None
+        if len(self.pending_cancels) > CANCEL_CONFIG["PENDING_SIZE"]:
+            self.pending_cancels.popitem(last=False)
+
+    def pop_pending_cancel(self, job_id: str) -> bool:
+        """ whether a new job is cancelled before it comes
+        """
+        if job_id not in self.pending_cancels:
+            return False
+        del self.pending_cancels[job_id]
+        return True
+
+    def remove(self, job_id: str) -> Optional[str]:
+        """ drop a held job, e.g. it is cancelled
+
+        Returns:
+            Optional[str] -- where the job was held: waiting, parked or spilled, None if not held
+        """
+        if self.dependencies.remove(job_id) is not None:
+            return "waiting"
+        if self.limiter is not None and self.limiter.remove(job_id) is not None:
+            return "parked"
+        if self.cold_tier is not None and self.cold_tier.remove(job_id):
+            return "spilled"
+        return None
+
+    def drop_partitions(self, partitions: Set[int]) -> List[Job]:
+        """ take the held jobs of the given msg partitions
+        """
+        dropped_jobs = []
+        if self.cold_tier is not None:
+            dropped_jobs += self.cold_tier.drop_partitions(partitions)
+        if self.limiter is not None:
+            dropped_jobs += self.limiter.drop_partitions(partitions)
+        dropped_jobs += self.dependencies.drop_partitions(partitions)
+        return dropped_jobs
+
+    def describe(self, job_id: str, spilled_level: int) -> Optional[Dict]:
+        """ where a held job is, spilled jobs belong to the lowest level
+        """
+        if job_id in self.dependencies:
+            return {
+                "job_id": job_id,
+                "status": "waiting",
+                "waiting_for": self.dependencies.get_unmet_parents(job_id),
+            }
+
+        if self.limiter is not None and job_id in self.limiter.parked_keys:
+            return {
+                "job_id": job_id,
+                "status": "parked",
+                "limited_by": self.limiter.parked_keys[job_id],
+            }
+
+        if self.cold_tier is not None and job_id in self.cold_tier.keys:
+            return {
+                "job_id": job_id,
+                "status": "spilled",
+                "level": spilled_level,
+                "latest_start_time": self.cold_tier.keys[job_id][0],
+            }
+
+        return None
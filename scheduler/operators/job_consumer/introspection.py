@@ -0,0 +1,175 @@
+"""
+Module for looking up where a staging job is
+Staging jobs are kept in order statistic trees, one per level in the order of its staging list
+and one across all levels in latest start order, so the rank of a job is found in O(log n)
+without copying or sorting staging lists.
+Lookups come from the admin server thread, so the trees are guarded by a lock
+"""
+import itertools
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import ADMIN_CONFIG, SYSTEM_CONFIG
+from utils.clock import get_clock
+from utils.order_statistic import OrderStatisticTree
+from operators.job_consumer.admission import get_job_work
+from operators.job_consumer.resources.base_job import Job
+from operators.job_consumer.plugins.job_selector.laxity import get_latest_start
+from operators.job_monitor.main import JobMonitor
+
+
+def get_level_order(job: Job) -> Any:
+    """ order of a job in its staging list which does not change when jobs are renewed,
+        the schedule time of all jobs moves together, so latest start keeps their order
+    """
+    if job.sort_key_name == "schedule_time":
+        return get_latest_start(job)
+    return job.sort_key
+
+
+class JobRankIndex:
+    """ rank of staging jobs, also a stage listener of JobConsumer
+
+    Args:
+        job_monitor: for the remaining work of running jobs
+        total_level: number of staging lists
+        capacity: cpu of the cluster
+    """
+
+    def __init__(
+        self,
+        job_monitor: JobMonitor,
+        total_level: int,
+        capacity: int = SYSTEM_CONFIG["SYSTEM_CPU"],
+    ) -> None:
+        self.job_monitor = job_monitor
+        self.capacity = capacity
+
+        self.level_trees: List[OrderStatisticTree] = [
+            OrderStatisticTree() for _ in range(total_level)
+        ]
+        # value: (job_id, cpu, computing time), weight: work of the job, for the work ahead of a job
+        self.tree = OrderStatisticTree()
+        # job_id: (level, level key, key)
+        self.keys: Dict[str, Tuple[int, Tuple[Any, int], Tuple[datetime, int]]] = {}
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+
+    def on_staged(self, level: int, job: Job) -> None:
+        """ a job is inserted into a staging list
+        """
+        seq = next(self.seq)
+        level_key = (get_level_order(job), seq)
+        key = (get_latest_start(job), seq)
+        with self.lock:
+            self.keys[job.job_id] = (level, level_key, key)
+            self.level_trees[level].insert(level_key, job.job_id)
+            self.tree.insert(
+                key,
+                (
+                    job.job_id,
+                    job.job_resources["cpu"],
+                    job.job_resources["computing_time"] or 0,
+                ),
+                get_job_work(job),
+            )
+
+    def on_unstaged(self, _: int, job: Job) -> None:
+        """ a job leaves its staging list
+        """
+        with self.lock:
+            keys = self.keys.pop(job.job_id, None)
+            if keys is None:
+                return
+            level, level_key, key = keys
+            self.level_trees[level].remove(level_key)
+            self.tree.remove(key)
+
+    def lookup(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """ level and ranks (0: next) of a staging job, and its estimated start time
+            if all jobs run in latest start order on the whole cluster
+
+        Returns:
+            Optional[Dict[str, Any]] -- None if the job is not staging
+        """
+        with self.lock:
+            keys = self.keys.get(job_id)
+            if keys is None:
+                return None
+            level, level_key, key = keys
+            level_rank = self.level_trees[level].rank(level_key)
+            level_size = len(self.level_trees[level])
+            rank = self.tree.rank(key)
+            work_ahead = self.tree.prefix_weight(key)
+
+        work_ahead += self.job_monitor.get_running_work()
+        return {
+            "level": level,
+            "level_rank": level_rank,
+            "level_size": level_size,
+            "rank": rank,
+            "size": len(self.keys),
+            "latest_start_time": key[0],
+            "estimated_start_time": get_clock().utcnow()
+            + timedelta(seconds=work_ahead / self.capacity),
+        }
+
+    def estimate_start_times(self) -> List[Tuple[str, int, datetime, datetime]]:
+        """ (job_id, rank, estimated start time, estimated finish time) of all staging jobs,
+            by one walk of the tree in O(n)
+        """
+        now = get_clock().utcnow()
+        work_ahead = self.job_monitor.get_running_work()
+        estimates = []
+        with self.lock:
+            for rank, (_, value) in enumerate(self.tree.items()):
+                job_id, cpu, computing_time = value
+                start_time = now + timedelta(seconds=work_ahead / self.capacity)
+                estimates.append(
+                    (
+                        job_id,
+                        rank,
+                        start_time,
+                        start_time + timedelta(seconds=computing_time),
+                    )
+                )
+                work_ahead += cpu * computing_time
+        return estimates
+
+
+def get_admin_routes(operator) -> Dict[Tuple[str, str], Callable]:
+    """ admin server routes of a JobConsumer
+        GET /jobs/<job_id>: where the job is
+        GET /policy: current policy options
+        POST /policy: switch policy options, e.g. {"STAGE_QUEUE": "bisect"}
+    """
+
+    def describe_job(job_id: str, _: Dict) -> Tuple[int, Dict]:
+        try:
+            job_state = operator.describe_job(job_id).result(
+                timeout=ADMIN_CONFIG["POLICY_TIMEOUT"]
+            )
+        except FutureTimeoutError:
+            return 503, {"job_id": job_id, "error": "scheduling thread is busy"}
+        if job_state is None:
+            return 404, {"job_id": job_id, "error": "job not found"}
+        return 200, job_state
+
+    def get_policy(*_) -> Tuple[int, Dict]:
+        return 200, operator.get_policy()
+
+    def switch_policy(_: str, values: Dict) -> Tuple[int, Dict]:
+        future = operator.request_policy(values)
+        try:
+            # invalid options are raised and responded as bad requests
+            return 200, future.result(timeout=ADMIN_CONFIG["POLICY_TIMEOUT"])
+        except FutureTimeoutError:
+            return 202, {"status": "pending", "policy": values}
+
+    return {
+        ("GET", "/jobs/"): describe_job,
+        ("GET", "/policy"): get_policy,
+        ("POST", "/policy"): switch_policy,
+    }
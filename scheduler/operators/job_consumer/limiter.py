@@ -0,0 +1,261 @@
+"""
+Module for limiting dispatches of job types and users
+ - concurrency caps: max running jobs of a job type / a user
+ - token buckets: dispatch rate and burst of a job type / a user
+Checks are O(1) by counters and lazily refilled buckets. A picked job which is limited is parked
+under its limit key instead of staying in staging lists, so it is not scanned again by every round;
+the jobs of a key are restaged when the key is released or its bucket refills
+"""
+import heapq
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from config import DISPATCH_LIMIT_CONFIG
+from utils.clock import get_clock
+from operators.job_consumer.resources.base_job import Job
+
+# ("type", job_type) or ("user", username)
+LimitKey = Tuple[str, str]
+
+
+class TokenBucket:
+    """ rate tokens per second up to burst tokens, refilled when it is read
+    """
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last_time = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.last_time) * self.rate)
+        self.last_time = now
+
+    def has_token(self, now: float) -> bool:
+        """ whether a dispatch is allowed now
+        """
+        self._refill(now)
+        return self.tokens >= 1
+
+    def take(self, now: float) -> None:
+        """ take a token for a dispatch
+        """
+        self._refill(now)
+        self.tokens -= 1
+
+    def get_next_token_time(self, now: float) -> float:
+        """ when the next token is ready
+        """
+        self._refill(now)
+        return now + max(1 - self.tokens, 0) / self.rate
+
+
+# limit settings, running counters and parked jobs are updated together by every dispatch
+class DispatchLimiter:  # pylint: disable=R0902
+    """ concurrency caps and rate limits of job types and users
+
+    Args:
+        type_caps: max running jobs of job types
+        user_cap: max running jobs of every user, 0: no cap
+        type_rates: (dispatches per second, burst) of job types
+        user_rate: (dispatches per second, burst) of every user, None: no limit
+    """
+
+    def __init__(
+        self,
+        type_caps: Dict[str, int] = DISPATCH_LIMIT_CONFIG["TYPE_CAPS"],
+        user_cap: int = DISPATCH_LIMIT_CONFIG["USER_CAP"],
+        type_rates: Dict[str, Tuple[float, float]] = DISPATCH_LIMIT_CONFIG[
+            "TYPE_RATES"
+        ],
+        user_rate: Optional[Tuple[float, float]] = DISPATCH_LIMIT_CONFIG["USER_RATE"],
+    ) -> None:
+        self.type_caps = type_caps
+        self.user_cap = user_cap
+        self.type_rates = type_rates
+        self.user_rate = user_rate
+
+        # running jobs of a key, and keys of running jobs for releasing by job_id
+        self.running: Dict[LimitKey, int] = {}
+        self.running_keys: Dict[str, List[LimitKey]] = {}
+        self.buckets: Dict[LimitKey, TokenBucket] = {}
+
+        # limited jobs: key: [(level, job)], and job_id: key
+        self.parked: Dict[LimitKey, List[Tuple[int, Job]]] = {}
+        self.parked_keys: Dict[str, LimitKey] = {}
+        # (next token time, key) of keys parked by rate limits
+        self.wakeups: List[Tuple[float, LimitKey]] = []
+        self.waking_keys: Set[LimitKey] = set()
+
+    def __len__(self) -> int:
+        return len(self.parked_keys)
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self.parked_keys
+
+    @staticmethod
+    def _get_keys(job: Job) -> List[LimitKey]:
+        # a job without a username is not limited per user, it is not anyone's quota
+        keys = [("type", job.job_type)]
+        if job.username:
+            keys.append(("user", job.username))
+        return keys
+
+    def _get_cap(self, key: LimitKey) -> int:
+        if key[0] == "type":
+            return self.type_caps.get(key[1], 0)
+        return self.user_cap
+
+    def _get_bucket(self, key: LimitKey, now: float) -> Optional[TokenBucket]:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            rate = self.type_rates.get(key[1]) if key[0] == "type" else self.user_rate
+            if rate is None:
+                return None
+            bucket = self.buckets[key] = TokenBucket(*rate, now)
+        return bucket
+
+    def _is_capped(self, key: LimitKey) -> bool:
+        cap = self._get_cap(key)
+        return 0 < cap <= self.running.get(key, 0)
+
+    def _is_rate_limited(self, key: LimitKey, now: float) -> bool:
+        bucket = self._get_bucket(key, now)
+        return bucket is not None and not bucket.has_token(now)
+
+    def get_limited_key(self, job: Job) -> Optional[LimitKey]:
+        """ the key which does not allow the job to be dispatched now, O(1)
+        """
+        now = get_clock().monotonic()
+        for key in self._get_keys(job):
+            if key in self.parked or self._is_capped(key):
+                return key
+            if self._is_rate_limited(key, now):
+                return key
+        return None
+
+    def acquire(self, job: Job) -> None:
+        """ count a reserved job and take its tokens
+        """
+        now = get_clock().monotonic()
+        keys = self._get_keys(job)
+        for key in keys:
+            self.running[key] = self.running.get(key, 0) + 1
+            bucket = self._get_bucket(key, now)
+            if bucket is not None:
+                bucket.take(now)
+        self.running_keys[job.job_id] = keys
+
+    def release(self, job_id: str) -> List[Tuple[int, Job]]:
+        """ a job completes or gives its resources back
+
+        Returns:
+            List[Tuple[int, Job]] -- parked jobs of the keys which are not capped any more
+        """
+        jobs: List[Tuple[int, Job]] = []
+        for key in self.running_keys.pop(job_id, []):
+            self.running[key] -= 1
+            if key in self.parked and not self._is_capped(key):
+                jobs += self._unpark(key)
+        return jobs
+
+    def park(self, key: LimitKey, level: int, job: Job) -> None:
+        """ keep a limited job aside until its key allows dispatching
+        """
+        self.parked.setdefault(key, []).append((level, job))
+        self.parked_keys[job.job_id] = key
+
+        now = get_clock().monotonic()
+        bucket = self._get_bucket(key, now)
+        if (
+            not self._is_capped(key)
+            and bucket is not None
+            and key not in self.waking_keys
+        ):
+            heapq.heappush(self.wakeups, (bucket.get_next_token_time(now), key))
+            self.waking_keys.add(key)
+
+    def _unpark(self, key: LimitKey) -> List[Tuple[int, Job]]:
+        jobs = self.parked.pop(key, [])
+        for _, job in jobs:
+            del self.parked_keys[job.job_id]
+        logger.info(f"Unpark {len(jobs)} Jobs of {key}")
+        return jobs
+
+    def unpark_due(self) -> List[Tuple[int, Job]]:
+        """ parked jobs of the keys whose buckets have refilled
+        """
+        now = get_clock().monotonic()
+        jobs: List[Tuple[int, Job]] = []
+        while self.wakeups and self.wakeups[0][0] <= now:
+            _, key = heapq.heappop(self.wakeups)
+            self.waking_keys.discard(key)
+            if not self._is_capped(key):
+                jobs += self._unpark(key)
+        return jobs
+
+    def remove(self, job_id: str) -> Optional[Job]:
+        """ drop a parked job, e.g. it is cancelled
+        """
+        key = self.parked_keys.pop(job_id, None)
+        if key is None:
+            return None
+
+        jobs = self.parked[key]
+        index = next(i for i, (_, job) in enumerate(jobs) if job.job_id == job_id)
+        _, job = jobs.pop(index)
+        if not jobs:
+            del self.parked[key]
+        return job
+
+    def drop_partitions(self, partitions: Set[int]) -> List[Job]:
+        """ take the parked jobs of the given msg partitions
+        """
+        job_ids = [
+            job.job_id
+            for jobs in self.parked.values()
+            for _, job in jobs
+            if job.partition in partitions
+        ]
+        return [self.remove(job_id) for job_id in job_ids]
+
+
+class SharedDispatchLimiter(DispatchLimiter):
+    """ DispatchLimiter of a sharded worker, running jobs of capped types are counted
+        by the shared ledger across workers, which also refuses reservations over a cap;
+        jobs parked by a type cap are unparked when a job of the type stops in any worker
+
+    Args:
+        ledger: SharedResourceLedger of all workers
+    """
+
+    def __init__(self, ledger: Any, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.ledger = ledger
+
+    def _is_capped(self, key: LimitKey) -> bool:
+        if key[0] == "type" and key[1] in self.ledger.type_caps:
+            return self.ledger.is_type_capped(key[1])
+        return super()._is_capped(key)
+
+    def _unpark_shared_keys(self) -> List[Tuple[int, Job]]:
+        # completions are sent to every worker, while only the owner releases the type
+        shared_keys = [
+            key
+            for key in self.parked
+            if key[0] == "type"
+            and key[1] in self.ledger.type_caps
+            and not self._is_capped(key)
+        ]
+        jobs: List[Tuple[int, Job]] = []
+        for key in shared_keys:
+            jobs += self._unpark(key)
+        return jobs
+
+    def release(self, job_id: str) -> List[Tuple[int, Job]]:
+        return super().release(job_id) + self._unpark_shared_keys()
+
+    def unpark_due(self) -> List[Tuple[int, Job]]:
+        return super().unpark_due() + self._unpark_shared_keys()
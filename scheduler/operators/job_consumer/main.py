@@ -2,18 +2,51 @@
 Entry Module for handling coming jobs
 Author: Po-Chun, Lu
 """
-from typing import Tuple, List, Dict
+import time
+from concurrent.futures import Future
+from typing import Any, Tuple, List, Dict, Callable, Optional, Set, Union
 
 from loguru import logger
 
 from config import (
     KAFKA_TOPIC_CONFIG,
     SCHEDULER_CONFIG,
+    JOB_SELECTION_CONFIG,
+    ADMISSION_CONFIG,
+    SPILL_CONFIG,
+    ADMIN_CONFIG,
+    get_exp_config,
+    get_exp_id,
 )
+from utils.clock import get_clock
+from utils.request_queue import RequestQueue
 from operators.job_monitor.main import JobMonitor
+from operators.job_consumer.admission import AdmissionController
+from operators.job_consumer.introspection import JobRankIndex
+from operators.job_consumer.eta import EtaPublisher
+from operators.job_consumer.held import HeldJobs
+from operators.job_consumer.policy import (
+    PolicyPlugins,
+    get_policy,
+    load_plugins,
+    parse_policy,
+)
 from operators.job_consumer.resources.base_job import Job
 from operators.job_consumer.resources import STAGING_LIST
-from operators.job_consumer.plugins import QUEUE_SELECTOR, JOB_SELECTOR, SEND_JOB
+from operators.job_consumer.plugins import (
+    QUEUE_SELECTOR,
+    JOB_SELECTOR,
+    ROUND_SELECTOR,
+    SEND_JOB,
+    SEND_JOBS,
+    CANCEL_JOB,
+)
+from operators.job_consumer.plugins.job_selector.laxity import LeastLaxityIndex
+from operators.job_consumer.plugins.job_operator_trigger.main import set_exp_config
+from operators.job_consumer.plugins.job_operator_trigger.retry import (
+    CircuitBreaker,
+    DispatchChannel,
+)
 from operators.job_consumer.plugins.job_selector.exceptions import (
     EmptyListException,
     NoValidJobInListException,
@@ -21,20 +54,100 @@ from operators.job_consumer.plugins.job_selector.exceptions import (
 )
 
 
-class JobConsumer:
+# staging lists, their index and listeners, and the optional indexes listening to them;
+# dispatching, policies, requests and held jobs are grouped by their helpers
+class JobConsumer:  # pylint: disable=R0902
     """ Operator for consuming job object and send job object to its staging list
     """
 
-    def __init__(self, job_monitor: JobMonitor):
+    # callbacks and the spill store are injected by each runtime, e.g. a store per sharded worker
+    def __init__(  # pylint: disable=R0913
+        self,
+        job_monitor: JobMonitor,
+        send_job: Callable[[Job], Optional[bool]] = SEND_JOB,
+        send_jobs: Callable[[List[Job]], Optional[List[Job]]] = SEND_JOBS,
+        notify_admission: Optional[Callable[[str, Dict], None]] = None,
+        notify_eta: Optional[Callable[[str, Dict], None]] = None,
+        spill_path: str = SPILL_CONFIG["PATH"],
+    ):
         # for monitor system resources
         self.job_monitor = job_monitor
 
+        # how picked jobs leave the scheduler, e.g. async runtime dispatch them in a task,
+        # with the retry queue and circuit breaker of failed dispatches
+        self.dispatcher = DispatchChannel(send_job, send_jobs)
+
         self.total_level: int = SCHEDULER_CONFIG["TOTAL_LEVEL"]
-        self.level_limit: Tuple[int, ...] = SCHEDULER_CONFIG["LEVEL_LIMIT"]
 
         # init all staging queue
         self.stage_lists = [STAGING_LIST(level) for level in range(self.total_level)]
 
+        # the current policy and its plugins, switched by reconfigure
+        self.policy: Dict[str, Any] = get_policy()
+        self.plugins = PolicyPlugins(
+            STAGING_LIST, QUEUE_SELECTOR, JOB_SELECTOR, ROUND_SELECTOR
+        )
+        # requested by the admin server or signals, applied / answered between msgs
+        self.requests = RequestQueue()
+
+        # job_id: (level, job) of staging jobs, for finding a job without scanning lists
+        self.job_index: Dict[str, Tuple[int, Job]] = {}
+
+        # notified with (level, job) when a job is staged / unstaged,
+        # for indexes across all staging lists
+        self.stage_listeners: List = []
+
+        # adaptive queue selectors keep level statistics of staging jobs
+        if hasattr(self.plugins.queue_selector, "on_staged"):
+            self.plugins.queue_selector.reset()
+            self.stage_listeners.append(self.plugins.queue_selector)
+
+        self.laxity_index: Optional[LeastLaxityIndex] = None
+        if JOB_SELECTION_CONFIG["IS_LEAST_LAXITY_FIRST"]:
+            self.laxity_index = LeastLaxityIndex()
+            self.stage_listeners.append(self.laxity_index)
+
+        # test whether a new job could meet its deadline before staging it
+        self.admission: Optional[AdmissionController] = None
+        if ADMISSION_CONFIG["MODE"] != "off":
+            self.admission = AdmissionController(job_monitor, notify_admission)
+            self.stage_listeners.append(self.admission)
+
+        # rank of staging jobs for the admin server and estimated start times
+        self.rank_index: Optional[JobRankIndex] = None
+        if ADMIN_CONFIG["PORT"] or notify_eta is not None:
+            self.rank_index = JobRankIndex(job_monitor, self.total_level)
+            self.stage_listeners.append(self.rank_index)
+
+        self.eta_publisher: Optional[EtaPublisher] = None
+        if notify_eta is not None:
+            self.eta_publisher = EtaPublisher(self.rank_index, notify_eta)
+
+        # waiting, parked and spilled jobs,
+        # type caps of sharded workers are counted by their shared ledger
+        self.held = HeldJobs(getattr(job_monitor, "ledger", None), spill_path)
+
+    @property
+    def level_limit(self) -> Tuple[int, ...]:
+        """ sort key limits of levels, of the current policy
+        """
+        return self.policy["LEVEL_LIMIT"]
+
+    def _stage(self, level: int, job: Job) -> None:
+        self.stage_lists[level].insert(job)
+        self.job_index[job.job_id] = (level, job)
+        for listener in self.stage_listeners:
+            listener.on_staged(level, job)
+
+    def _notify_unstaged(self, level: int, job: Job) -> None:
+        self.job_index.pop(job.job_id, None)
+        for listener in self.stage_listeners:
+            listener.on_unstaged(level, job)
+
+    def _unstage(self, level: int, job: Job) -> None:
+        self.stage_lists[level].remove(job)
+        self._notify_unstaged(level, job)
+
     def _extract_job_level(self, job: Job) -> int:
         """ Check the importance level (priority) of this job
             e.g. level_limit = (600,1200) and job_sort_key = 100, then job_level is 0
@@ -54,10 +167,14 @@ class JobConsumer:
         return self.total_level - 1
 
     def _consume_job(self, job: Job) -> None:
+        if self._drop_cancelled_job(job):
+            return
+
         try:
             # setup job cpu & mem usage based on system status
             job.job_resources = self.job_monitor.get_single_job_resources(job)
         except ValueError:
+            self._drop_dependents(job.job_id, "unknown type")
             return
 
         # TODO: Remove for Prod
@@ -73,40 +190,238 @@ class JobConsumer:
         job.job_times["schedule_time"] -= job.job_resources["computing_time"]
         logger.debug(f'schedule_time: {job.job_times["schedule_time"]}')
 
+        if self.held.dependencies.hold(job):
+            return
+
+        self._admit_job(job)
+
+    def _drop_cancelled_job(self, job: Job) -> bool:
+        """ drop a new job whose cancel msg arrives before it, with the jobs depending on it
+
+        Returns:
+            bool -- whether the job is cancelled
+        """
+        if not self.held.pop_pending_cancel(job.job_id):
+            return False
+
+        logger.warning(f"Cancel Job {job.job_id}, its cancel msg arrives first")
+        self._drop_dependents(job.job_id, "cancelled")
+        return True
+
+    def _drop_dependents(self, job_id: str, reason: str) -> None:
+        """ drop the waiting jobs depending on a job which would never complete
+        """
+        for job in self.held.dependencies.drop_dependents(job_id):
+            logger.warning(
+                f"Cancel Job {job.job_id}, it depends on {reason} Job {job_id}"
+            )
+
+    def _admit_job(self, job: Job) -> None:
+        """ stage a job whose parents are completed, unless it fails the admission test
+        """
+        if self.admission is not None and not self.admission.admit(job):
+            self._drop_dependents(job.job_id, "rejected")
+            return
+
         job_level = self._extract_job_level(job)
+        if self._spill_cold_job(job_level, job):
+            return
+
         if SCHEDULER_CONFIG["IS_RENEW_BEFORE_INSERT"]:
             self.stage_lists[job_level].renew_jobs_priority()
 
-        self.stage_lists[job_level].insert(job)
+        self._stage(job_level, job)
+
+    def finish_job(self, job_id: str) -> None:
+        """ a job completes, stop tracking it and stage the jobs which are ready by it,
+            system resources are updated by the caller
+        """
+        self._finish_running_job(job_id)
+        for job in self.held.dependencies.complete(job_id):
+            job.renew_priority()
+            self._admit_job(job)
+
+    def _release_waiting_jobs(self) -> bool:
+        """ stage the jobs waiting for their parents longer than the max wait
+
+        Returns:
+            bool -- whether any job is released
+        """
+        released_jobs = self.held.dependencies.release_expired(self._is_known_job)
+        for job in released_jobs:
+            job.renew_priority()
+            self._admit_job(job)
+        return bool(released_jobs)
+
+    def _is_known_job(self, job_id: str) -> bool:
+        """ whether a job is waiting, staging, parked, spilled, retrying or running here
+        """
+        return (
+            job_id in self.held
+            or job_id in self.job_index
+            or job_id in self.job_monitor.running_jobs
+        )
+
+    def _spill_cold_job(self, job_level: int, job: Job) -> bool:
+        """ keep a job of the lowest level on disk if it would not be dispatched for a long time
+
+        Returns:
+            bool -- whether the job is spilled
+        """
+        if (
+            self.held.cold_tier is None
+            or job_level != self.total_level - 1
+            or not self.held.cold_tier.is_cold(job)
+        ):
+            return False
+
+        self.held.cold_tier.spill(job)
+        return True
+
+    def _unpark_due_jobs(self) -> bool:
+        """ restage parked jobs whose rate limits have refilled
+
+        Returns:
+            bool -- whether any job is restaged
+        """
+        if self.held.limiter is None or len(self.held.limiter) == 0:
+            return False
+        return self._restage_parked_jobs(self.held.limiter.unpark_due())
+
+    def _page_in_cold_jobs(self) -> bool:
+        """ stage spilled jobs which become dispatchable soon,
+            or the earliest ones if no job is staging while resources are free
+
+        Returns:
+            bool -- whether any job is staged
+        """
+        if self.held.cold_tier is None or len(self.held.cold_tier) == 0:
+            return False
+
+        num = 0
+        if (
+            not self.job_index
+            and self.job_monitor.system_resources["total"]["cpu"] >= 1
+        ):
+            num = SPILL_CONFIG["PAGE_IN_BATCH"]
+
+        is_staged = False
+        for job in self.held.cold_tier.page_in(num):
+            job.renew_priority()
+            self._stage(self._extract_job_level(job), job)
+            is_staged = True
+        return is_staged
 
     def reallocate(self) -> None:
         """ move job from low level stage queue to high level stage queue
         """
+        # spilled jobs whose slack runs out come back even without new msgs
+        self._page_in_cold_jobs()
+
+        for stage_list in self.stage_lists:
+            stage_list.renew_jobs_priority()
+
         for level, stage_list in enumerate(self.stage_lists):
-            self.stage_lists[level].renew_jobs_priority()
+            if level == 0:
+                continue
+
+            # Check whether the real level of a job is changed
+            for job in list(stage_list.job_list):
+                job_level = self._extract_job_level(job)
+                if job_level < level:
+                    self._unstage(level, job)
+                    self._stage(job_level, job)
+                    logger.debug(f"Promote Job {job.job_id}: L{level} -> L{job_level}")
+
+    def check_overdue_jobs(self) -> int:
+        """ count the staging jobs which already miss their deadline
+
+        Returns:
+            int -- number of overdue jobs in all staging lists
+        """
+        now = get_clock().utcnow()
+        overdue_num = 0
+        for stage_list in self.stage_lists:
+            overdue_num += sum(
+                1 for job in stage_list.tolist() if job.job_times["deadline"] < now
+            )
+
+        if overdue_num:
+            logger.warning(f"Overdue Staging Jobs: {overdue_num}")
+
+        return overdue_num
+
+    def _select_job(self, stage_list, system_resources: Dict) -> Job:
+        """ pick a valid job of a staging list by the job selector,
+            or by the vectorized selection of a columnar staging list
+        """
+        select_fit = getattr(stage_list, "select_fit", None)
+        if select_fit is None:
+            return self.plugins.job_selector.select_job(
+                stage_list.tolist(), system_resources
+            )
+
+        if len(stage_list) == 0:
+            raise EmptyListException
+
+        next_job = select_fit(
+            system_resources["total"]["cpu"], system_resources["total"]["mem"]
+        )
+        if next_job is None:
+            raise NoValidJobInListException(system_resources)
+
+        return next_job
+
+    def _park_limited_job(self, level: int, job: Job) -> bool:
+        """ move a picked job out of staging lists if its job type or user is limited
+
+        Returns:
+            bool -- whether the job is parked
+        """
+        if self.held.limiter is None:
+            return False
+
+        limited_key = self.held.limiter.get_limited_key(job)
+        if limited_key is None:
+            return False
 
-            if level != 0:
-                # Check whether the real level of a job is changed
-                while (level) > self._extract_job_level(stage_list[0]):
-                    job = stage_list.pop()
-                    self.stage_lists[level].insert(job)
+        logger.info(f"Park Job {job.job_id}, limited by {limited_key}")
+        self._unstage(level, job)
+        self.held.limiter.park(limited_key, level, job)
+        return True
+
+    def _select_allowed_job(self, stage_list, system_resources: Dict) -> Job:
+        """ pick a valid job of a staging list which is not limited,
+            limited jobs are parked, so each of them is checked once until its key is released
+        """
+        next_job = self._select_job(stage_list, system_resources)
+        while self._park_limited_job(stage_list.level, next_job):
+            if len(stage_list) == 0:
+                raise NoValidJobInListException(system_resources)
+            next_job = self._select_job(stage_list, system_resources)
+
+        return next_job
+
+    def _restage_parked_jobs(self, parked_jobs: List[Tuple[int, Job]]) -> bool:
+        for _, job in parked_jobs:
+            job.renew_priority()
+            self._stage(self._extract_job_level(job), job)
+        return bool(parked_jobs)
 
     def _re_pick_next_valid_job(
         self, valid_queues: List[int], system_resources: Dict
     ) -> Job:
         candidate_queues = valid_queues.copy()
         for queue_level in valid_queues:
-            if len(self.stage_lists[queue_level].job_list) == 0:
+            if len(self.stage_lists[queue_level]) == 0:
                 candidate_queues.remove(queue_level)
 
         logger.warning(f"Other Non Empty Queues: {candidate_queues}")
         for queue_level in candidate_queues:
             try:
                 next_queue = self.stage_lists[queue_level]
-                next_job = JOB_SELECTOR.select_job(
-                    next_queue.tolist(), system_resources
-                )
-                next_queue.remove(next_job)
+                next_job = self._select_allowed_job(next_queue, system_resources)
+                self._unstage(queue_level, next_job)
                 logger.warning(f"Final Pick Level {next_queue.level}")
                 break
             except NoValidJobInListException as error:
@@ -130,6 +445,21 @@ class JobConsumer:
         except NoValidJobInAllListException:
             raise EmptyListException
 
+    def _pick_least_laxity_job(self, system_resources: Dict) -> Job:
+        """ pick the least laxity job of all levels which fits the system resources
+        """
+        logger.info(f"Least Laxity: {self.laxity_index.get_least_laxity()}")
+        picked = self.laxity_index.select_job(system_resources)
+        while picked is not None and self._park_limited_job(*picked):
+            picked = self.laxity_index.select_job(system_resources)
+        if picked is None:
+            raise EmptyListException
+
+        level, next_job = picked
+        self._unstage(level, next_job)
+        logger.info(f"Least Laxity Pick Level {level}")
+        return next_job
+
     def _pick_next_job(self) -> Job:
         """ When spark executor is free, it would pick a job which is the top priority of computing
 
@@ -137,14 +467,17 @@ class JobConsumer:
             Job -- [The next job that would be assign to airflow and spark]
         """
         system_resources = self.job_monitor.fetch_current_system_resources_from_api()
-        next_queue = QUEUE_SELECTOR.select_queue(self.stage_lists)
+        if self.laxity_index is not None:
+            return self._pick_least_laxity_job(system_resources)
+
+        next_queue = self.plugins.queue_selector.select_queue(self.stage_lists)
         logger.info(
-            f"Current Queue - Level: {next_queue.level}, Length: {len(next_queue.job_list)}"
+            f"Current Queue - Level: {next_queue.level}, Length: {len(next_queue)}"
         )
 
         try:
-            next_job = JOB_SELECTOR.select_job(next_queue.tolist(), system_resources)
-            next_queue.remove(next_job)
+            next_job = self._select_allowed_job(next_queue, system_resources)
+            self._unstage(next_queue.level, next_job)
 
         except EmptyListException:
             raise
@@ -158,29 +491,448 @@ class JobConsumer:
 
         return next_job
 
-    def _send_job_to_trigger(self):
+    def _reserve_next_job(self) -> Optional[Job]:
+        """ pick the next job and reserve its resources
+
+        Returns:
+            Optional[Job] -- None if there is no staging or valid job
+        """
         try:
             next_job = self._pick_next_job()
 
         except EmptyListException:
             logger.warning("No staging or valid job in all queues")
             for queue in self.stage_lists:
-                logger.debug(
-                    f"- Queue Level: {queue.level}, Job Num: {len(queue.job_list)}"
-                )
+                logger.debug(f"- Queue Level: {queue.level}, Job Num: {len(queue)}")
+
+            return None
+
+        if not self.job_monitor.reserve_job_resources(next_job):
+            logger.warning(f"Resources are taken, restage Job {next_job.job_id}")
+            self._stage(self._extract_job_level(next_job), next_job)
+            return None
 
-            return "empty"
+        if self.held.limiter is not None:
+            self.held.limiter.acquire(next_job)
 
         logger.info(
             f"Pick Job:\n Resources: \n{next_job.job_resources}, \n Time: \n{next_job.job_times}"
         )
-        SEND_JOB(next_job)
 
+        return next_job
+
+    def _dispatch_jobs(self, next_jobs: List[Job]) -> None:
+        for sent_jobs, result in self.dispatcher.send(next_jobs):
+            if result is not None:
+                self.on_dispatch_result(sent_jobs, result)
+
+    def _release_job_resources(self, job: Job) -> None:
+        self._finish_running_job(job.job_id)
         self.job_monitor.update_current_system_resources(
-            -next_job.job_resources["cpu"], -next_job.job_resources["mem"]
+            job.job_resources["cpu"], job.job_resources["mem"]
         )
 
-        return ""
+    def _finish_running_job(self, job_id: str) -> None:
+        self.job_monitor.finish_running_job(job_id)
+        if self.held.limiter is not None:
+            self._restage_parked_jobs(self.held.limiter.release(job_id))
+
+    def _restage_job(self, job: Job) -> None:
+        """ give the reserved resources back and put the job back to staging list
+        """
+        self._release_job_resources(job)
+        job.renew_priority()
+        self._stage(self._extract_job_level(job), job)
+
+    def _handle_failed_dispatch(self, job: Job) -> None:
+        job.dispatch_attempts += 1
+
+        if job.dispatch_attempts > self.dispatcher.max_retry:
+            logger.error(
+                f"Give up Job {job.job_id} after {self.dispatcher.max_retry} retries, release its resources"
+            )
+            self._release_job_resources(job)
+            self._drop_dependents(job.job_id, "given up")
+
+        elif self.dispatcher.breaker.is_open:
+            # trigger is dead, do not keep the resources while waiting
+            logger.warning(f"Trigger unavailable, restage Job {job.job_id}")
+            self._restage_job(job)
+
+        else:
+            delay = self.dispatcher.retry_queue.push(job, job.dispatch_attempts)
+            logger.warning(
+                f"Dispatch Job {job.job_id} failed {job.dispatch_attempts} times, retry after {delay}s"
+            )
+
+    def on_dispatch_result(
+        self, next_jobs: List[Job], result: Union[bool, List[Job]]
+    ) -> None:
+        """ update circuit breaker and handle failed jobs,
+            should be called in the same thread/task of scheduling
+
+        Arguments:
+            next_jobs {List[Job]} -- jobs sent by one request, or by a batch trigger
+            result {Union[bool, List[Job]]} -- whether the trigger accepts the jobs,
+                or the jobs which are not accepted of a batch trigger
+        """
+        if isinstance(result, list):
+            failed_jobs = result
+        else:
+            failed_jobs = [] if result else next_jobs
+
+        # the trigger is up if it accepts any job
+        self.dispatcher.breaker.record(len(failed_jobs) < len(next_jobs))
+        for job in failed_jobs:
+            self._handle_failed_dispatch(job)
+
+    def process_retries(self) -> None:
+        """ resend the failed jobs whose backoff is over without blocking,
+            and resume the scheduling round skipped by the open breaker,
+            or run one for unparked, paged-in and released waiting jobs
+        """
+        self.requests.resolve()
+        is_released = self._release_waiting_jobs()
+
+        if self.dispatcher.breaker.is_open:
+            if len(self.dispatcher.retry_queue) > 0:
+                # no more retry until the trigger recovers
+                for job in self.dispatcher.retry_queue.pop_all():
+                    logger.warning(f"Trigger unavailable, restage Job {job.job_id}")
+                    self._restage_job(job)
+            return
+
+        retry_jobs = []
+        for job in self.dispatcher.retry_queue.pop_due():
+            if self.dispatcher.breaker.allow_request():
+                retry_jobs.append(job)
+            else:
+                self._restage_job(job)
+
+        if retry_jobs:
+            logger.info(f"Retry Jobs: {[job.job_id for job in retry_jobs]}")
+            self._dispatch_jobs(retry_jobs)
+
+        if (
+            self.dispatcher.is_round_blocked
+            or self._unpark_due_jobs()
+            or self._page_in_cold_jobs()
+            or is_released
+        ):
+            self._send_jobs_to_trigger()
+
+    def _reserve_round_jobs(self) -> List[Job]:
+        """ pick a set of jobs by the round selector and reserve their resources together
+
+        Returns:
+            List[Job] -- reserved jobs
+        """
+        next_jobs: List[Job] = []
+        system_resources = self.job_monitor.fetch_current_system_resources_from_api()
+        for level, next_job in self.plugins.round_selector.select_jobs(
+            self.stage_lists, system_resources
+        ):
+            if self._park_limited_job(level, next_job):
+                continue
+
+            self._unstage(level, next_job)
+            if not self.job_monitor.reserve_job_resources(next_job):
+                logger.warning(f"Resources are taken, restage Job {next_job.job_id}")
+                self._stage(level, next_job)
+                continue
+
+            if self.held.limiter is not None:
+                self.held.limiter.acquire(next_job)
+            next_jobs.append(next_job)
+
+        logger.info(f"Pick Jobs: {[next_job.job_id for next_job in next_jobs]}")
+        return next_jobs
+
+    def _send_jobs_to_trigger(self) -> List[Job]:
+        """ a scheduling round, pick jobs until system resources or staging jobs run out
+            and dispatch them together
+
+        Returns:
+            List[Job] -- jobs sent in this round
+        """
+        self._page_in_cold_jobs()
+        self._unpark_due_jobs()
+
+        # the half-open breaker allows a trial job only, so pick jobs one by one
+        is_round_selected = (
+            self.plugins.round_selector is not None
+            and self.dispatcher.breaker.state == CircuitBreaker.CLOSED
+        )
+        next_jobs = self._reserve_round_jobs() if is_round_selected else []
+
+        while (
+            not is_round_selected
+            and self.job_monitor.system_resources["total"]["cpu"] >= 1
+        ):
+            if not self.dispatcher.breaker.allow_request():
+                logger.warning(
+                    f"Circuit Breaker {self.dispatcher.breaker.state}, keep jobs staging"
+                )
+                break
+
+            next_job = self._reserve_next_job()
+            if next_job is None:
+                self.dispatcher.breaker.release_trial()
+                break
+            next_jobs.append(next_job)
+
+        self.dispatcher.is_round_blocked = (
+            self.dispatcher.breaker.state != CircuitBreaker.CLOSED
+        )
+
+        if next_jobs:
+            self._dispatch_jobs(next_jobs)
+
+        if self.job_monitor.system_resources["total"]["cpu"] < 1:
+            logger.warning(f"No more resources : {self.job_monitor.system_resources}")
+
+        return next_jobs
+
+    def run_scheduling_round(self) -> None:
+        """ run a scheduling round outside msg handling,
+            e.g. resources released by another scheduler process, or staging jobs restored
+        """
+        self.process_retries()
+        self._send_jobs_to_trigger()
+
+    def drop_partition_jobs(self, partitions: Set[int]) -> List[Job]:
+        """ remove the staging jobs which come from the given msg partitions,
+            e.g. the partitions are revoked and handed over to another scheduler
+
+        Arguments:
+            partitions {Set[int]} -- partitions of TOPIC_NEW_JOB_NOTIFY
+
+        Returns:
+            List[Job] -- the removed jobs
+        """
+        dropped_jobs = []
+        for stage_list in self.stage_lists:
+            level_jobs = stage_list.remove_if(lambda job: job.partition in partitions)
+            for job in level_jobs:
+                self._notify_unstaged(stage_list.level, job)
+            dropped_jobs += level_jobs
+
+        return dropped_jobs + self.held.drop_partitions(partitions)
+
+    def restore_jobs(self, jobs: List[Job]) -> None:
+        """ put jobs back to staging lists, e.g. jobs handed over from another scheduler
+        """
+        for job in jobs:
+            job.renew_priority()
+            if self.held.dependencies.hold(job):
+                continue
+
+            job_level = self._extract_job_level(job)
+            if not self._spill_cold_job(job_level, job):
+                self._stage(job_level, job)
+
+    def cancel_job(self, job_id: str) -> bool:
+        """ withdraw a job, and the waiting jobs depending on it which could never be ready
+
+        Returns:
+            bool -- whether the job is found and cancelled
+        """
+        is_cancelled = self._withdraw_job(job_id)
+        self._drop_dependents(job_id, "cancelled")
+        return is_cancelled
+
+    def _withdraw_job(self, job_id: str) -> bool:
+        """ withdraw a job wherever it is
+             - waiting: removed from waiting jobs of dependencies
+             - staging: found by job_index in O(1) and removed from its staging list
+             - parked: removed from the limiter
+             - spilled: removed from the cold tier and its store
+             - retrying: removed from retry queue and its resources are released
+             - running: ask the trigger to stop it, resources are released by its completion msg
+
+        Returns:
+            bool -- whether the job is found and cancelled
+        """
+        held_status = self.held.remove(job_id)
+        if held_status is not None:
+            logger.warning(f"Cancel {held_status} Job {job_id}")
+            return True
+
+        if job_id in self.job_index:
+            level, job = self.job_index[job_id]
+            self.stage_lists[level].cancel(job)
+            self._notify_unstaged(level, job)
+            logger.warning(f"Cancel staging Job {job_id} in Level {level}")
+            return True
+
+        for job in self.dispatcher.retry_queue.remove_if(
+            lambda job: job.job_id == job_id
+        ):
+            self._release_job_resources(job)
+            logger.warning(f"Cancel retrying Job {job_id}")
+            return True
+
+        if job_id in self.job_monitor.running_jobs:
+            is_cancelled = CANCEL_JOB(job_id)
+            logger.warning(f"Cancel running Job {job_id}: {is_cancelled}")
+            return is_cancelled
+
+        # the job may come later, e.g. its new job msg is overtaken by the express lane
+        logger.warning(f"Cancel unknown Job {job_id}, drop it if it comes later")
+        self.held.add_pending_cancel(job_id)
+        return False
+
+    def publish_etas(self) -> None:
+        """ send estimated start times of staging jobs which shift enough, at most once per ETA_INTERVAL
+        """
+        if self.eta_publisher is not None:
+            self.eta_publisher.publish()
+
+    def request_policy(self, values: Dict[str, Any]) -> Future:
+        """ switch policies from another thread or a signal handler,
+            applied by the scheduling thread in process_retries
+
+        Returns:
+            Future -- resolved with the applied policy, or the error of the update
+        """
+        return self.requests.request(self.reconfigure, values)
+
+    def get_exp_id(self) -> str:
+        """ experiment id of the current policy
+        """
+        return get_exp_id(
+            self.policy["QUEUE_SELECT_METHOD"], self.policy["STAGE_QUEUE"]
+        )
+
+    def get_policy(self) -> Dict[str, Any]:
+        """ current policy options, the policy dict is replaced but never changed by reconfigure
+        """
+        return dict(self.policy)
+
+    def reconfigure(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """ switch selectors, staging list type and level limits,
+            staging jobs are moved into new staging lists by one bulk rebuild
+
+        Arguments:
+            values {Dict[str, Any]} -- e.g. {"STAGE_QUEUE": "bisect", "LEVEL_LIMIT": "300,900"}
+
+        Raises:
+            ValueError: unknown option or plugin, nothing is changed
+
+        Returns:
+            Dict[str, Any] -- the applied policy
+        """
+        policy = parse_policy(values, self.policy, self.total_level)
+        plugins = load_plugins(policy)
+        start = time.perf_counter()
+        self.policy = policy
+
+        # a selector of the same type keeps its state, e.g. level statistics
+        old_queue_selector = self.plugins.queue_selector
+        if type(plugins.queue_selector) is type(old_queue_selector):
+            plugins = plugins._replace(queue_selector=old_queue_selector)
+        elif old_queue_selector in self.stage_listeners:
+            self.stage_listeners.remove(old_queue_selector)
+        self.plugins = plugins
+        if hasattr(plugins.round_selector, "horizon"):
+            plugins.round_selector.horizon = policy["LEVEL_LIMIT"][-1]
+        # jobs are sent with the exp config of the policy scheduling them
+        set_exp_config(get_exp_config(policy))
+
+        moved_num = self._rebuild_stage_lists(plugins.staging_list)
+
+        if plugins.queue_selector is not old_queue_selector and hasattr(
+            plugins.queue_selector, "on_staged"
+        ):
+            plugins.queue_selector.reset()
+            for level, job in self.job_index.values():
+                plugins.queue_selector.on_staged(level, job)
+            self.stage_listeners.append(plugins.queue_selector)
+
+        logger.warning(
+            f"Switch Policy {policy}: {len(self.job_index)} staging jobs, "
+            + f"{moved_num} moved between levels in "
+            + f"{(time.perf_counter() - start) * 1000:.2f} ms"
+        )
+        return policy
+
+    def _rebuild_stage_lists(self, staging_list_type: type) -> int:
+        """ build staging lists of all staging jobs, in O(n) besides the sort or heapify
+            of each staging list, jobs are leveled again by the current level limits
+
+        Returns:
+            int -- number of jobs moved to another level
+        """
+        level_jobs: List[List[Job]] = [[] for _ in range(self.total_level)]
+        moved_jobs = []
+        # job_index keeps the staging order
+        for level, job in self.job_index.values():
+            job.renew_priority()
+            job_level = self._extract_job_level(job)
+            level_jobs[job_level].append(job)
+            if job_level != level:
+                moved_jobs.append((level, job_level, job))
+
+        self.stage_lists = [
+            staging_list_type.from_jobs(level, jobs)
+            for level, jobs in enumerate(level_jobs)
+        ]
+
+        for level, job_level, job in moved_jobs:
+            self.job_index[job.job_id] = (job_level, job)
+            for listener in self.stage_listeners:
+                listener.on_unstaged(level, job)
+                listener.on_staged(job_level, job)
+
+        return len(moved_jobs)
+
+    def describe_job(self, job_id: str) -> Future:
+        """ where a job is, called by the admin server thread:
+            staging jobs are looked up in the locked rank index at once,
+            other jobs are looked up by the scheduling thread in process_retries
+
+        Returns:
+            Future -- resolved with the job state, None if the job is unknown or already finished
+        """
+        if self.rank_index is not None:
+            job_rank = self.rank_index.lookup(job_id)
+            if job_rank is not None:
+                future: Future = Future()
+                future.set_result({"job_id": job_id, "status": "staging", **job_rank})
+                return future
+        return self.requests.request(self._get_job_state, job_id)
+
+    def _get_job_state(self, job_id: str) -> Optional[Dict]:
+        """ where a job is, only called by the scheduling thread
+        """
+        if job_id in self.job_index:
+            # e.g. staged after the rank index lookup, or no rank index without admin server
+            return {
+                "job_id": job_id,
+                "status": "staging",
+                "level": self.job_index[job_id][0],
+            }
+
+        if job_id in self.held:
+            return self.held.describe(job_id, self.total_level - 1)
+
+        if job_id in self.job_monitor.running_jobs:
+            return {
+                "job_id": job_id,
+                "status": "running",
+                "estimated_end_time": self.job_monitor.running_jobs[job_id][0],
+            }
+
+        return None
+
+    def consume_new_job(self, job: Job) -> None:
+        """ stage a job built from a new job msg, then run a scheduling round,
+            e.g. the job is built by a decode stage in another thread
+        """
+        self.process_retries()
+
+        self._consume_job(job)
+        self._send_jobs_to_trigger()
 
     def consume_msg(self, msg) -> None:
         """ A common method for handling msg, used for Polymorphism
@@ -190,24 +942,18 @@ class JobConsumer:
                                 include ["topic", "msg_key", "msg_value", "timestamp"]
         """
         if msg.topic == KAFKA_TOPIC_CONFIG["TOPIC_NEW_JOB_NOTIFY"]:
-            self._consume_job(
+            self.consume_new_job(
                 Job(job_msg=msg, sort_key=SCHEDULER_CONFIG["JOB_SORT_KEY"])
             )
 
-            session = ""
-            while (
-                self.job_monitor.system_resources["total"]["cpu"] >= 1
-                and session != "empty"
-            ):
-                session = self._send_job_to_trigger()
-
-            if self.job_monitor.system_resources["total"]["cpu"] < 1:
-                logger.warning(
-                    f"No more resources : {self.job_monitor.system_resources}"
-                )
-
         elif msg.topic == KAFKA_TOPIC_CONFIG["TOPIC_JOB_COMPLETE_NOTIFY"]:
+            self.process_retries()
+            self.finish_job(msg.msg_key)
             self.job_monitor.update_current_system_resources(
                 msg.msg_value["cpu"], msg.msg_value["mem"]
             )
-            self._send_job_to_trigger()
+            # a big completion may free many cores
+            self._send_jobs_to_trigger()
+
+        elif msg.topic == KAFKA_TOPIC_CONFIG["TOPIC_JOB_CANCEL_NOTIFY"]:
+            self.cancel_job(msg.msg_value.get("job_id", msg.msg_key))
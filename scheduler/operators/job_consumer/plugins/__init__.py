@@ -1,12 +1,13 @@
 """ Collection of queue plugins
 """
 
-from operators.job_consumer.plugins.queue_selector.main import get_queue_selector
-from operators.job_consumer.plugins.job_selector.main import get_job_selector
-from operators.job_consumer.plugins.job_operator_trigger.main import get_job_trigger
+from operators.job_consumer.registry import get_plugin
 
-# For JobConsumer Import
-QUEUE_SELECTOR = get_queue_selector()
-JOB_SELECTOR = get_job_selector()
+# For JobConsumer Import, only the configured plugins are imported
+QUEUE_SELECTOR = get_plugin("queue_selector")
+JOB_SELECTOR = get_plugin("job_selector")
+ROUND_SELECTOR = get_plugin("round_selector")
 
-SEND_JOB = get_job_trigger()
+SEND_JOB = get_plugin("job_trigger")
+SEND_JOBS = get_plugin("batch_job_trigger")
+CANCEL_JOB = get_plugin("job_canceller")
@@ -5,6 +5,9 @@ Author: Po-Chun, Lu
 
 import json
 from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import requests
 
 from loguru import logger
 
@@ -15,23 +18,49 @@ from config import (
     get_exp_config,
 )
 from utils.common import send_post_request
+from operators.job_consumer.registry import get_plugin
+
+
+# the exp config only changes by policy switches, serialize it once per switch instead of once per job
+# e.g. '"method": {...}, "exp_id": "0.0.0_c1_m1..."'
+EXP_CONFIG = get_exp_config()
+EXP_CONFIG_JSON_ITEMS = json.dumps(EXP_CONFIG)[1:-1]
+
+JSON_HEADERS = {"Cache-Control": "no-cache", "Content-Type": "application/json"}
 
 
-def send_job_to_none(next_job) -> None:
+def _is_success(res: Optional[requests.Response]) -> bool:
+    # send_request returns None when timeout or connection error
+    return res is not None and res.status_code == 200
+
+
+def send_job_to_none(next_job) -> bool:
     """ For Local Testing
     """
     logger.success(f'\n{"-"*20}\nFake send success {next_job.job_times}\n{"-"*20}')
+    return True
+
+
+def send_jobs_to_none(next_jobs) -> List:
+    """ For Local Testing
+    """
+    for next_job in next_jobs:
+        send_job_to_none(next_job)
+    return []
 
 
-def send_job_to_airflow(next_job) -> None:
+def send_job_to_airflow(next_job) -> bool:
     """ send job to airflow spark trigger
 
     Args:
         next_job (Job): the job that would send to spark
+
+    Returns:
+        bool: whether the job is accepted
     """
-    send_post_request(
+    res = send_post_request(
         url=f'{AIRFLOW_CONFIG["URL"]}',
-        headers={"Cache-Control": "no-cache", "Content-Type": "application/json"},
+        headers=JSON_HEADERS,
         data=json.dumps(
             {
                 "conf": {
@@ -55,13 +84,36 @@ def send_job_to_airflow(next_job) -> None:
             }
         ),
     )
+    return _is_success(res)
 
 
-def send_job_to_job_trigger(next_job) -> None:
-    """ send job to spark trigger
+def set_exp_config(exp_config: Dict[str, Any]) -> None:
+    """ exp config sent with jobs, e.g. the policy is switched
+    """
+    global EXP_CONFIG, EXP_CONFIG_JSON_ITEMS  # pylint: disable=W0603
+    EXP_CONFIG = exp_config
+    EXP_CONFIG_JSON_ITEMS = json.dumps(exp_config)[1:-1]
+
+
+def _get_job_params_json(job_params) -> str:
+    """ job_params merged with the exp config, the exp config wins a duplicate key,
+        the pre-serialized items are spliced unless a key is duplicated
+    """
+    if not job_params:
+        return "{" + EXP_CONFIG_JSON_ITEMS + "}"
+    if not any(key in job_params for key in EXP_CONFIG):
+        return json.dumps(job_params)[:-1] + ", " + EXP_CONFIG_JSON_ITEMS + "}"
+    return json.dumps({**job_params, **EXP_CONFIG})
+
+
+def _get_job_trigger_payload(next_job) -> str:
+    """ serialize a job for job trigger, the exp config is merged into job_params
 
     Args:
         next_job (Job): the job that would send to spark
+
+    Returns:
+        str: json string of the job
     """
     job_times = {
         key: datetime.strftime(next_job.job_times[key], DATE_FORMAT)
@@ -69,29 +121,112 @@ def send_job_to_job_trigger(next_job) -> None:
         else next_job.job_times[key]
         for key in next_job.job_times
     }
-    send_post_request(
+    job_payload = json.dumps(
+        {
+            "job_id": next_job.job_id,
+            "job_type": next_job.job_type,
+            "job_times": job_times,
+            "job_resources": next_job.job_resources,
+        }
+    )
+    return (
+        job_payload[:-1]
+        + ', "job_params": '
+        + _get_job_params_json(next_job.job_params)
+        + "}"
+    )
+
+
+def send_job_to_job_trigger(next_job) -> bool:
+    """ send job to spark trigger
+
+    Args:
+        next_job (Job): the job that would send to spark
+
+    Returns:
+        bool: whether the job is accepted
+    """
+    res = send_post_request(
         url=f'{JOB_TRIGGER_CONFIG["URL"]}',
-        headers={"Cache-Control": "no-cache", "Content-Type": "application/json"},
-        data=json.dumps(
-            {
-                "job_id": next_job.job_id,
-                "job_type": next_job.job_type,
-                "job_params": {**next_job.job_params, **get_exp_config()},
-                "job_times": job_times,
-                "job_resources": next_job.job_resources,
-            }
-        ),
+        headers=JSON_HEADERS,
+        data=_get_job_trigger_payload(next_job),
+    )
+    return _is_success(res)
+
+
+def send_jobs_to_job_trigger(next_jobs) -> List:
+    """ send all jobs of a scheduling round to spark trigger by a single bulk request
+
+    Args:
+        next_jobs (List[Job]): the jobs that would send to spark
+
+    Returns:
+        List[Job]: the jobs which are not accepted, all or none of a bulk request
+    """
+    res = send_post_request(
+        url=f'{JOB_TRIGGER_CONFIG["BATCH_URL"]}',
+        headers=JSON_HEADERS,
+        data="[" + ", ".join(map(_get_job_trigger_payload, next_jobs)) + "]",
+    )
+    return [] if _is_success(res) else list(next_jobs)
+
+
+def send_jobs_to_airflow(next_jobs: List) -> List:
+    """ airflow has no bulk api, trigger dag runs one by one,
+        only the failed ones are returned, so triggered dag runs are not retried
+    """
+    return [next_job for next_job in next_jobs if not send_job_to_airflow(next_job)]
+
+
+def cancel_job_to_none(job_id: str) -> bool:
+    """ For Local Testing
+    """
+    logger.success(f"Fake cancel success {job_id}")
+    return True
+
+
+def cancel_job_to_job_trigger(job_id: str) -> bool:
+    """ ask spark trigger to stop a running job
+
+    Args:
+        job_id (str): id of the job
+
+    Returns:
+        bool: whether the cancel request is accepted
+    """
+    res = send_post_request(
+        url=f'{JOB_TRIGGER_CONFIG["CANCEL_URL"]}',
+        headers=JSON_HEADERS,
+        data=json.dumps({"job_id": job_id}),
+    )
+    return _is_success(res)
+
+
+def cancel_job_to_airflow(job_id: str) -> bool:
+    """ airflow experimental api could not stop a dag run
+    """
+    logger.error(
+        f"Cancel is not supported by airflow trigger, Job {job_id} keeps running"
     )
+    return False
 
 
 def get_job_trigger():
     """ Organize the triggers
         select a queue selector based on .env
     """
-    selector_map = {
-        "test": send_job_to_none,
-        "api": send_job_to_job_trigger,
-        "airflow": send_job_to_airflow,
-    }
+    return get_plugin("job_trigger")
+
 
-    return selector_map[JOB_TRIGGER_CONFIG["METHOD"]]
+def get_batch_job_trigger():
+    """ Organize the batch triggers
+        select a batch trigger based on .env
+    """
+    return get_plugin("batch_job_trigger")
+
+
+def get_job_canceller():
+    """ Organize the cancel methods of triggers
+        select a cancel method based on .env
+    """
+    return get_plugin("job_canceller")
@@ -0,0 +1,187 @@
+"""
+Dispatch reliability of job triggers
+A delay queue for retrying failed dispatches with exponential backoff,
+and a circuit breaker for not hammering a dead trigger
+"""
+import heapq
+import itertools
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Union
+
+from loguru import logger
+
+from config import DISPATCH_RETRY_CONFIG, JOB_TRIGGER_CONFIG
+from utils.clock import get_clock
+from operators.job_consumer.resources.base_job import Job
+
+
+class RetryQueue:
+    """ Delay queue of failed dispatches, the earliest due item pops first
+    """
+
+    def __init__(self) -> None:
+        self.base_delay: float = DISPATCH_RETRY_CONFIG["BACKOFF_BASE"]
+        self.max_delay: float = DISPATCH_RETRY_CONFIG["BACKOFF_MAX"]
+
+        # (due time, insert order, item), insert order keeps FIFO for the same due time
+        self.delay_list: List[Tuple[float, int, Any]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.delay_list)
+
+    def get_backoff(self, attempts: int) -> float:
+        """ exponential backoff, e.g. base 1s: 1, 2, 4, 8 ... max_delay
+        """
+        return min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+
+    def push(self, item: Any, attempts: int) -> float:
+        """ delay the item based on how many times it failed
+
+        Returns:
+            float -- delay seconds of this item
+        """
+        delay = self.get_backoff(attempts)
+        due_time = get_clock().monotonic() + delay
+        heapq.heappush(self.delay_list, (due_time, next(self._counter), item))
+        return delay
+
+    def pop_due(self) -> List[Any]:
+        """ pop all items whose delay is over
+        """
+        now = get_clock().monotonic()
+        due_items = []
+        while self.delay_list and self.delay_list[0][0] <= now:
+            due_items.append(heapq.heappop(self.delay_list)[2])
+
+        return due_items
+
+    def remove_if(self, predicate: Callable[[Any], bool]) -> List[Any]:
+        """ remove the items matching predicate, e.g. cancelled jobs
+        """
+        removed_items = [item for _, _, item in self.delay_list if predicate(item)]
+        if removed_items:
+            self.delay_list = [
+                delay_item
+                for delay_item in self.delay_list
+                if not predicate(delay_item[2])
+            ]
+            heapq.heapify(self.delay_list)
+        return removed_items
+
+    def pop_all(self) -> List[Any]:
+        """ pop all items whether they are due or not
+        """
+        items = [item for _, _, item in sorted(self.delay_list)]
+        self.delay_list = []
+        return items
+
+
+class CircuitBreaker:
+    """ closed: requests pass, open after `failure_threshold` continuous failures
+        open: requests are rejected until `reset_timeout` passed
+        half-open: a single trial request passes, close it if success else open again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self) -> None:
+        self.failure_threshold: int = DISPATCH_RETRY_CONFIG["BREAKER_THRESHOLD"]
+        self.reset_timeout: float = DISPATCH_RETRY_CONFIG["BREAKER_RESET_TIMEOUT"]
+
+        self.state = self.CLOSED
+        self.failure_num = 0
+        self.opened_at = 0.0
+        self.is_trial_sent = False
+
+    def allow_request(self) -> bool:
+        """ whether a request could be sent now
+        """
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if get_clock().monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self.is_trial_sent = False
+            logger.warning("Circuit Breaker: half-open, send a trial request")
+
+        # half-open, only one trial request
+        if self.is_trial_sent:
+            return False
+        self.is_trial_sent = True
+        return True
+
+    def release_trial(self) -> None:
+        """ the allowed trial request is not sent, e.g. no job to dispatch
+        """
+        if self.state == self.HALF_OPEN:
+            self.is_trial_sent = False
+
+    def record(self, is_success: bool) -> None:
+        """ update breaker state by the result of a request
+        """
+        if is_success:
+            if self.state != self.CLOSED:
+                logger.success("Circuit Breaker: closed")
+            self.state = self.CLOSED
+            self.failure_num = 0
+            return
+
+        self.failure_num += 1
+        if self.state == self.HALF_OPEN or self.failure_num >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.error(f"Circuit Breaker: open after {self.failure_num} failures")
+            self.state = self.OPEN
+            self.opened_at = get_clock().monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        """ whether requests are blocked now, an open breaker after reset timeout
+            would be half-open at the next request
+        """
+        return (
+            self.state == self.OPEN
+            and get_clock().monotonic() - self.opened_at < self.reset_timeout
+        )
+
+
+class DispatchChannel:
+    """ how picked jobs leave the scheduler, and the state of their failed dispatches
+
+    Args:
+        send_job: send a job, returns the dispatch result, or None if it would be reported later
+        send_jobs: send a round of jobs by a bulk request, returns the failed jobs or None
+    """
+
+    def __init__(
+        self,
+        send_job: Callable[[Job], Optional[bool]],
+        send_jobs: Callable[[List[Job]], Optional[List[Job]]],
+    ) -> None:
+        self.send_job = send_job
+        self.send_jobs = send_jobs
+        self.is_batch_dispatch: bool = JOB_TRIGGER_CONFIG["IS_BATCH_DISPATCH"]
+
+        # for failed dispatches
+        self.retry_queue = RetryQueue()
+        self.breaker = CircuitBreaker()
+        self.max_retry: int = DISPATCH_RETRY_CONFIG["MAX_RETRY"]
+        # a scheduling round is skipped when the breaker is open
+        self.is_round_blocked = False
+
+    def send(
+        self, next_jobs: List[Job]
+    ) -> Iterator[Tuple[List[Job], Union[None, bool, List[Job]]]]:
+        """ send jobs by a bulk request, or a request per job
+
+        Yields:
+            Tuple[List[Job], Union[None, bool, List[Job]]] -- jobs of a request and its result
+        """
+        if self.is_batch_dispatch and len(next_jobs) > 1:
+            yield next_jobs, self.send_jobs(next_jobs)
+        else:
+            for next_job in next_jobs:
+                yield [next_job], self.send_job(next_job)
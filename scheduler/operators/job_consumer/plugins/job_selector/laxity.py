@@ -0,0 +1,126 @@
+"""
+Least laxity first selection across all staging lists
+laxity = deadline - now - computing_time, i.e. the renewed schedule_time
+Laxity of every staging job decreases at the same rate, so jobs are ordered by their latest start time
+(deadline - computing_time) once when staged, and the order never needs recomputing
+"""
+import itertools
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+from config import JOB_SELECTION_CONFIG, SYSTEM_CONFIG
+from utils.clock import get_clock
+from utils.order_statistic import OrderStatisticTree
+from operators.job_consumer.resources.base_job import Job
+
+
+def get_latest_start(job: Job) -> datetime:
+    """ the job misses its deadline if it starts later than this time
+    """
+    return job.job_times["deadline"] - timedelta(
+        seconds=job.job_resources["computing_time"] or 0
+    )
+
+
+class LeastLaxityIndex:
+    """ all staging jobs ordered by laxity, updated in O(log n) when a job is staged / unstaged
+
+    Args:
+        starvation_bound: times the least laxity job could be bypassed by jobs which fit the free resources,
+                          then resources are held until it fits, negative: never hold
+        capacity_cpu: cpu of the cluster, resources are never held for a larger job
+        capacity_mem: mem of the cluster, resources are never held for a larger job
+    """
+
+    def __init__(
+        self,
+        starvation_bound: int = JOB_SELECTION_CONFIG["LAXITY_STARVATION_BOUND"],
+        capacity_cpu: int = SYSTEM_CONFIG["SYSTEM_CPU"],
+        capacity_mem: int = SYSTEM_CONFIG["SYSTEM_MEM"],
+    ) -> None:
+        self.starvation_bound = starvation_bound
+        self.capacity = {"cpu": capacity_cpu, "mem": capacity_mem}
+
+        # key: (latest start, seq), value: (level, job)
+        self.tree = OrderStatisticTree()
+        self.keys: Dict[int, Tuple[datetime, int]] = {}
+        self.seq = itertools.count()
+
+        # the least laxity job which does not fit, and how many times it is bypassed
+        self.head_key: Optional[Tuple[datetime, int]] = None
+        self.bypass_num = 0
+
+    def __len__(self) -> int:
+        return len(self.tree)
+
+    def on_staged(self, level: int, job: Job) -> None:
+        """ a job is inserted into the staging list of level
+        """
+        if not self._is_within_capacity(job):
+            logger.warning(
+                f"Job {job.job_id} needs more than the cluster, it is bypassed without holding resources"
+            )
+
+        key = (get_latest_start(job), next(self.seq))
+        self.keys[id(job)] = key
+        self.tree.insert(key, (level, job))
+
+    def on_unstaged(self, _: int, job: Job) -> None:
+        """ a job is removed from its staging list
+        """
+        key = self.keys.pop(id(job), None)
+        if key is not None:
+            self.tree.remove(key)
+
+    def get_least_laxity(self) -> Optional[float]:
+        """ seconds of the least laxity, None if there is no staging job
+        """
+        first = self.tree.first()
+        if first is None:
+            return None
+        return (first[0][0] - get_clock().utcnow()).total_seconds()
+
+    def _is_within_capacity(self, job: Job) -> bool:
+        """ whether the job fits the whole cluster when no job is running
+        """
+        return (
+            job.job_resources["cpu"] <= self.capacity["cpu"]
+            and job.job_resources["mem"] <= self.capacity["mem"]
+        )
+
+    def _is_starving(self, head_key: Tuple[datetime, int]) -> bool:
+        if head_key != self.head_key:
+            self.head_key = head_key
+            self.bypass_num = 0
+
+        return 0 <= self.starvation_bound <= self.bypass_num
+
+    def select_job(self, system_resources: Dict) -> Optional[Tuple[int, Job]]:
+        """ the least laxity job which fits the free resources, the job is still staging
+
+        Returns:
+            Optional[Tuple[int, Job]] -- (level, job), None if no job fits
+                                         or resources are held for a starving job,
+                                         which is never a job larger than the cluster
+        """
+        cpu = system_resources["total"]["cpu"]
+        mem = system_resources["total"]["mem"]
+
+        head_key = None
+        for key, (level, job) in self.tree.items():
+            if job.job_resources["cpu"] <= cpu and job.job_resources["mem"] <= mem:
+                if head_key is not None:
+                    self.bypass_num += 1
+                return level, job
+
+            if head_key is None and self._is_within_capacity(job):
+                head_key = key
+                if self._is_starving(head_key):
+                    logger.warning(
+                        f"Hold resources for Job {job.job_id}, bypassed {self.bypass_num} times"
+                    )
+                    return None
+
+        return None
@@ -6,8 +6,8 @@ Author: Po-Chun, Lu
 import abc
 from typing import Dict, List
 
-from config import JOB_SELECTION_CONFIG
 from operators.job_consumer.resources.base_job import Job
+from operators.job_consumer.registry import get_plugin
 from operators.job_consumer.plugins.job_selector.exceptions import (
     EmptyListException,
     NoValidJobInListException,
@@ -71,9 +71,4 @@ def get_job_selector():
     """ Organize the selectors
         select a queue selector based on .env
     """
-    selector_map = {
-        "basic_pick_first": BaseJobSelector,
-        "basic_check_resource": BasicJobSelector,
-    }
-
-    return selector_map[JOB_SELECTION_CONFIG["JOB_SELECT_METHOD"]]
+    return get_plugin("job_selector")
@@ -3,14 +3,17 @@ Collection of queue selectors
 When spark executor is free, queue selector would pick a queue which is the top priority
 Author: Po-Chun, Lu
 """
-from typing import List
+from typing import Dict, List
 import abc
+import math
 import random
 
 from loguru import logger
 
 from config import QUEUE_SELECTION_CONFIG
+from utils.clock import get_clock
 from operators.job_consumer.resources import STAGING_LIST
+from operators.job_consumer.registry import get_plugin
 
 
 class BaseQueueSelector:
@@ -35,7 +38,7 @@ class TopLevelQueueSelector(BaseQueueSelector):
     def select_queue(cls, stage_lists) -> STAGING_LIST:
 
         for stage_list in stage_lists:
-            if len(stage_list.job_list) > 0:
+            if len(stage_list) > 0:
                 return stage_list
 
         return stage_lists[0]
@@ -75,7 +78,7 @@ class EnvWeightRandomSelect(BaseQueueSelector):
         env_weights = cls._get_level_weight()
 
         level_weights = [
-            (1 if len(stage_list.job_list) > 0 else 0) * env_weights[i]
+            (1 if len(stage_list) > 0 else 0) * env_weights[i]
             for i, stage_list in enumerate(stage_lists)
         ]
         return level_weights
@@ -90,22 +93,155 @@ class EnvWeightRandomSelect(BaseQueueSelector):
 
         queue_level = cls._get_queue_level()
 
-        if len(stage_lists[queue_level].job_list) > 0:
+        if len(stage_lists[queue_level]) > 0:
+            return stage_lists[queue_level]
+
+        if all(len(stage_list) == 0 for stage_list in stage_lists):
+            # all of the queues are empty, job selector would raise EmptyListException
             return stage_lists[queue_level]
 
         new_queue_level = cls._get_queue_level_with_length(stage_lists)
         return stage_lists[new_queue_level]
 
 
+class LevelStats:
+    """ exponentially decayed statistics of a level, updated in O(1) per event
+    """
+
+    def __init__(self, decay_seconds: float, now: float) -> None:
+        self.decay_seconds = decay_seconds
+        self.last_time = now
+
+        # decayed arrivals per second
+        self.arrival_rate = 0.0
+        # current and time-decayed average number of staging jobs
+        self.depth = 0
+        self.avg_depth = 0.0
+        # id(job): staged time, in staging order, so the first one is the oldest
+        self.staged_times: Dict[int, float] = {}
+
+    def _decay(self, now: float) -> None:
+        factor = math.exp(-max(now - self.last_time, 0) / self.decay_seconds)
+        self.arrival_rate *= factor
+        # depth is constant since the last event
+        self.avg_depth = self.depth + (self.avg_depth - self.depth) * factor
+        self.last_time = now
+
+    def on_arrival(self, job_key: int, now: float) -> None:
+        """ a job is staged
+        """
+        self._decay(now)
+        self.arrival_rate += 1 / self.decay_seconds
+        self.depth += 1
+        self.staged_times[job_key] = now
+
+    def on_leave(self, job_key: int, now: float) -> None:
+        """ a job is dispatched, cancelled or dropped
+        """
+        if self.staged_times.pop(job_key, None) is None:
+            return
+        self._decay(now)
+        self.depth -= 1
+
+    def get_load(self, now: float) -> float:
+        """ decayed depth plus the jobs expected to arrive in a decay window
+        """
+        self._decay(now)
+        return self.avg_depth + self.arrival_rate * self.decay_seconds
+
+    def get_oldest_wait(self, now: float) -> float:
+        """ seconds the oldest staging job has waited
+        """
+        for staged_time in self.staged_times.values():
+            return now - staged_time
+        return 0.0
+
+
 class WeightRandomSelect(EnvWeightRandomSelect):
     """ set level ranges and pick a random number to choose queue
-        level range based on queue states
+        level range based on queue states:
+            weight = env weight * load * (1 + oldest wait / aging seconds)
+        load is the decayed depth and arrival rate, weights are lifted to a floor
+        so a quiet level still gets picked sometimes.
+
+        also a stage listener of JobConsumer for updating level statistics
     """
 
-    @staticmethod
-    def _get_level_weight():
+    def __init__(self) -> None:
+        # aging_seconds, log_interval and decay_seconds
+        self.config = QUEUE_SELECTION_CONFIG["weight_random_select"]
+        self.env_weights = QUEUE_SELECTION_CONFIG["env_weight_random_select"][
+            "env_weights"
+        ]
+        self.weight_floor = min(self.config["weight_floor"], 1 / len(self.env_weights))
+
+        self.level_stats: List[LevelStats] = []
+        self.level_weights: List[float] = []
+        self.last_log_time = 0.0
+        self.reset()
+
+    def reset(self) -> None:
+        """ forget level statistics, e.g. a new JobConsumer or a new simulation clock
+        """
+        now = get_clock().monotonic()
+        self.level_stats = [
+            LevelStats(self.config["decay_seconds"], now) for _ in self.env_weights
+        ]
+        self.level_weights = self._normalize(self.env_weights)
+        self.last_log_time = now
+
+    def on_staged(self, level: int, job) -> None:
+        """ a job is inserted into a staging list
+        """
+        self.level_stats[level].on_arrival(id(job), get_clock().monotonic())
+
+    def on_unstaged(self, level: int, job) -> None:
+        """ a job leaves its staging list
+        """
+        self.level_stats[level].on_leave(id(job), get_clock().monotonic())
+
+    def _normalize(self, raw_weights: List[float]) -> List[float]:
+        total = sum(raw_weights)
+        if total <= 0:
+            raw_weights, total = self.env_weights, sum(self.env_weights)
+
+        share = 1 - self.weight_floor * len(raw_weights)
+        return [self.weight_floor + share * weight / total for weight in raw_weights]
+
+    def _get_level_weight(self) -> List[float]:
         # get weights from calculations
-        pass
+        now = get_clock().monotonic()
+        raw_weights = [
+            env_weight
+            * stats.get_load(now)
+            * (1 + stats.get_oldest_wait(now) / self.config["aging_seconds"])
+            for env_weight, stats in zip(self.env_weights, self.level_stats)
+        ]
+        self.level_weights = self._normalize(raw_weights)
+
+        if now - self.last_log_time >= self.config["log_interval"]:
+            logger.info(f"Level Weights: {self.get_level_weights()}")
+            self.last_log_time = now
+
+        return self.level_weights
+
+    def get_level_weights(self) -> List[float]:
+        """ weights of the latest selection, for logs and metrics
+        """
+        return [round(weight, 3) for weight in self.level_weights]
+
+    def select_queue(self, stage_lists) -> STAGING_LIST:
+        # prevent get a list with no job
+        level_weights = [
+            weight if len(stage_list) > 0 else 0
+            for weight, stage_list in zip(self._get_level_weight(), stage_lists)
+        ]
+
+        if not any(level_weights):
+            # all of the queues are empty, job selector would raise EmptyListException
+            return stage_lists[0]
+
+        return stage_lists[self._pick_item_with_weights(level_weights)]
 
 
 class EnvZipSelect(BaseQueueSelector):
@@ -153,7 +289,7 @@ class EnvZipSelect(BaseQueueSelector):
         ori_cross_queue_cursor = self.cross_queue_cursor
         self._update_queue_cursor_level(pre_update=True)
 
-        while len(stage_lists[self.cross_queue_cursor].job_list) == 0:
+        while len(stage_lists[self.cross_queue_cursor]) == 0:
             self.cross_queue_cursor += 1
 
             if self.cross_queue_cursor >= len(self.queue_order):
@@ -174,7 +310,7 @@ class EnvZipSelect(BaseQueueSelector):
         """
         next_queue = stage_lists[self.cross_queue_cursor]
 
-        if len(next_queue.job_list) > 0:
+        if len(next_queue) > 0:
             self._update_queue_cursor()
             return next_queue
 
@@ -188,13 +324,6 @@ class EnvZipSelect(BaseQueueSelector):
 
 def get_queue_selector():
     """ Organize the selectors
-        select a queue selector based on .env
+        select a queue selector based on .env, only the selected one is created
     """
-    selector_map = {
-        "top_level_select": TopLevelQueueSelector(),
-        "env_weight_random_select": EnvWeightRandomSelect(),
-        # "weight_random_select": WeightRandomSelect(),
-        "env_zip_select": EnvZipSelect(),
-    }
-
-    return selector_map[QUEUE_SELECTION_CONFIG["QUEUE_SELECT_METHOD"]]
+    return get_plugin("queue_selector")
@@ -0,0 +1,213 @@
+"""
+Collection of round selectors
+When several executors are free at once, round selector picks a set of jobs for the whole scheduling round
+instead of picking jobs one by one
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config import JOB_SELECTION_CONFIG, SCHEDULER_CONFIG
+from operators.job_consumer.resources.base_job import Job
+from operators.job_consumer.registry import get_plugin
+
+
+# (level of the staging list, job)
+Candidate = Tuple[int, Job]
+
+
+class KnapsackRoundSelector:
+    """ pick the top-K urgent jobs of all levels, then pack them into free cpu & mem
+        by a bounded 2D 0/1 knapsack, the value of a job is its resources weighted by urgency
+        fall back to greedy first-fit if the table is too big, it would not be solved within
+        the time budget by the measured seconds per cell, or the time budget runs out
+
+    Args:
+        top_k: candidates considered in a round
+        time_budget: seconds for solving a round
+        max_cells: max cpu * mem states of the knapsack table
+    """
+
+    def __init__(
+        self,
+        top_k: int = JOB_SELECTION_CONFIG["ROUND_TOP_K"],
+        time_budget: float = JOB_SELECTION_CONFIG["ROUND_TIME_BUDGET"],
+        max_cells: int = JOB_SELECTION_CONFIG["ROUND_MAX_CELLS"],
+    ) -> None:
+        self.top_k = top_k
+        self.time_budget = time_budget
+        self.max_cells = max_cells
+
+        # a job staging longer than the last level limit is as urgent as a new job
+        self.horizon: int = SCHEDULER_CONFIG["LEVEL_LIMIT"][-1]
+
+        # seconds per candidate * cell of the last solved or timed out round, None: not measured
+        self.cell_seconds: Optional[float] = None
+
+    def _get_urgency(self, job: Job) -> float:
+        """ 2 for a job without slack, 1 for a job with slack over horizon
+        """
+        slack = min(max(job.job_times["schedule_time"], 0), self.horizon)
+        return 1 + (self.horizon - slack) / self.horizon
+
+    def _get_candidates(self, stage_lists) -> List[Candidate]:
+        candidates: List[Candidate] = []
+        for stage_list in stage_lists:
+            candidates += [
+                (stage_list.level, job) for job in stage_list.tolist()[: self.top_k]
+            ]
+
+        candidates.sort(key=lambda candidate: (candidate[0], candidate[1].sort_key))
+        return candidates[: self.top_k]
+
+    @staticmethod
+    def _select_greedy(
+        candidates: List[Candidate], cpu: int, mem: int
+    ) -> List[Candidate]:
+        """ first-fit in the order of urgency
+        """
+        selected = []
+        for level, job in candidates:
+            if job.job_resources["cpu"] <= cpu and job.job_resources["mem"] <= mem:
+                selected.append((level, job))
+                cpu -= job.job_resources["cpu"]
+                mem -= job.job_resources["mem"]
+
+        return selected
+
+    @staticmethod
+    def _add_item(
+        best: List[float],
+        capacity: Tuple[int, int],
+        weight: Tuple[int, int],
+        value: float,
+        deadline: float,
+    ) -> Optional[List[bool]]:
+        """ update the best values of (cpu, mem) cells by an item
+
+        Returns:
+            Optional[List[bool]] -- whether the item is taken for the best value of each cell,
+                                    None if the time budget runs out
+        """
+        cpu, mem = capacity
+        job_cpu, job_mem = weight
+        width = mem + 1
+        taken = [False] * len(best)
+
+        # iterate downwards, so a job is taken at most once
+        for cell_cpu in range(cpu, job_cpu - 1, -1):
+            # a job alone could take (cpu + 1) * (mem + 1) cells, so check per cpu row
+            if time.perf_counter() > deadline:
+                return None
+            for cell_mem in range(mem, job_mem - 1, -1):
+                cell = cell_cpu * width + cell_mem
+                new_value = (
+                    best[(cell_cpu - job_cpu) * width + cell_mem - job_mem] + value
+                )
+                if new_value > best[cell]:
+                    best[cell] = new_value
+                    taken[cell] = True
+
+        return taken
+
+    @staticmethod
+    def _trace_back(
+        candidates: List[Candidate], is_taken: List[List[bool]], cpu: int, mem: int
+    ) -> List[Candidate]:
+        """ the taken candidates of the best value with all cpu and mem
+        """
+        width = mem + 1
+        selected = []
+        cell_cpu, cell_mem = cpu, mem
+        for i in range(len(candidates) - 1, -1, -1):
+            if is_taken[i][cell_cpu * width + cell_mem]:
+                level, job = candidates[i]
+                selected.append((level, job))
+                cell_cpu -= job.job_resources["cpu"]
+                cell_mem -= job.job_resources["mem"]
+
+        selected.reverse()
+        return selected
+
+    def _select_knapsack(
+        self, candidates: List[Candidate], cpu: int, mem: int, deadline: float
+    ) -> Optional[List[Candidate]]:
+        """ 0/1 knapsack over (cpu, mem)
+
+        Returns:
+            Optional[List[Candidate]] -- None if the time budget runs out
+        """
+        # best[c * (mem + 1) + m]: max value with at most c cpu and m mem
+        best = [0.0] * ((cpu + 1) * (mem + 1))
+        # is_taken[i][cell]: candidate i is taken for the best value of cell
+        is_taken: List[List[bool]] = []
+
+        for level, job in candidates:
+            if time.perf_counter() > deadline:
+                return None
+
+            job_cpu, job_mem = job.job_resources["cpu"], job.job_resources["mem"]
+            value = (job_cpu / cpu + job_mem / mem) * self._get_urgency(job)
+            taken = self._add_item(
+                best, (cpu, mem), (job_cpu, job_mem), value, deadline
+            )
+            if taken is None:
+                return None
+
+            is_taken.append(taken)
+            logger.debug(f"Knapsack L{level} Job {job.job_id} value: {value:.3f}")
+
+        return self._trace_back(candidates, is_taken, cpu, mem)
+
+    def select_jobs(self, stage_lists, system_resources: Dict) -> List[Candidate]:
+        """ pick jobs of a scheduling round, the jobs are still in their staging lists
+
+        Arguments:
+            stage_lists {List[STAGING_LIST]} -- staging lists of all levels
+            system_resources {Dict} -- e.g. {"total": {"cpu": 8, "mem": 16}}
+
+        Returns:
+            List[Candidate] -- (level, job) pairs which fit the free resources together
+        """
+        start = time.perf_counter()
+        cpu = int(system_resources["total"]["cpu"])
+        mem = int(system_resources["total"]["mem"])
+        candidates = self._get_candidates(stage_lists)
+        if not candidates or cpu < 1 or mem < 1:
+            return []
+
+        selected = None
+        work = len(candidates) * (cpu + 1) * (mem + 1)
+        is_in_budget = (
+            self.cell_seconds is None or work * self.cell_seconds < self.time_budget
+        )
+        if (cpu + 1) * (mem + 1) <= self.max_cells and is_in_budget:
+            selected = self._select_knapsack(
+                candidates, cpu, mem, start + self.time_budget
+            )
+            elapsed = time.perf_counter() - start
+            if selected is None:
+                # the whole work takes longer than the budget, so it is skipped next time
+                elapsed = max(elapsed, self.time_budget)
+            self.cell_seconds = elapsed / work
+        elif not is_in_budget:
+            # try again after some rounds, in case the measure is disturbed, e.g. by gc
+            self.cell_seconds *= 0.99
+
+        if selected is None:
+            logger.warning(f"Knapsack over budget, greedy for {len(candidates)} jobs")
+            selected = self._select_greedy(candidates, cpu, mem)
+
+        logger.info(
+            f"Round Pick {len(selected)}/{len(candidates)} Jobs in "
+            + f"{(time.perf_counter() - start) * 1000:.2f} ms"
+        )
+        return selected
+
+
+def get_round_selector():
+    """ Organize the round selectors
+        select a round selector based on .env, None: pick jobs one by one
+    """
+    return get_plugin("round_selector")
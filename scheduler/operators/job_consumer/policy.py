@@ -0,0 +1,141 @@
+"""
+Module for switching scheduling policies without restarting
+Updates are requested by the admin server or a signal, and applied by the scheduling thread
+between msgs, since staging lists and selectors are not thread-safe
+"""
+import os
+from typing import Any, Dict, NamedTuple, Tuple
+
+from dotenv import load_dotenv
+
+from config import (
+    SCHEDULER_CONFIG,
+    QUEUE_SCHEDULE_CONFIG,
+    QUEUE_SELECTION_CONFIG,
+    JOB_SELECTION_CONFIG,
+)
+from operators.job_consumer.registry import get_plugin
+
+
+# policy option: (config, key), the same names as .env
+POLICY_OPTIONS = {
+    "STAGE_QUEUE": (QUEUE_SCHEDULE_CONFIG, "STAGE_QUEUE"),
+    "QUEUE_SELECT_METHOD": (QUEUE_SELECTION_CONFIG, "QUEUE_SELECT_METHOD"),
+    "JOB_SELECT_METHOD": (JOB_SELECTION_CONFIG, "JOB_SELECT_METHOD"),
+    "ROUND_SELECT_METHOD": (JOB_SELECTION_CONFIG, "ROUND_SELECT_METHOD"),
+    "LEVEL_LIMIT": (SCHEDULER_CONFIG, "LEVEL_LIMIT"),
+}
+
+
+class PolicyPlugins(NamedTuple):
+    """ plugins built from a policy
+    """
+
+    staging_list: type
+    queue_selector: Any
+    job_selector: Any
+    round_selector: Any
+
+
+def get_policy() -> Dict[str, Any]:
+    """ policy options of the config, i.e. the startup policy
+
+    Raises:
+        ValueError: options which could not work together
+    """
+    policy = {name: config[key] for name, (config, key) in POLICY_OPTIONS.items()}
+    check_policy(policy)
+    return policy
+
+
+def check_policy(policy: Dict[str, Any]) -> None:
+    """ refuse options which could not work together
+
+    Raises:
+        ValueError: e.g. a round selector with least laxity first,
+                    which picks jobs one by one, so one of them would be ignored
+    """
+    if (
+        JOB_SELECTION_CONFIG["IS_LEAST_LAXITY_FIRST"]
+        and policy["ROUND_SELECT_METHOD"] != "greedy"
+    ):
+        raise ValueError(
+            f"ROUND_SELECT_METHOD={policy['ROUND_SELECT_METHOD']} "
+            + "could not work with IS_LEAST_LAXITY_FIRST=1, use greedy"
+        )
+
+
+def _parse_level_limit(value, total_level: int) -> Tuple[int, ...]:
+    if isinstance(value, str):
+        value = value.split(",")
+    try:
+        level_limit = tuple(map(int, value))
+    except TypeError as error:
+        raise ValueError(f"LEVEL_LIMIT should be integers: {value}") from error
+
+    if len(level_limit) != total_level - 1:
+        raise ValueError(f"LEVEL_LIMIT needs {total_level - 1} limits: {value}")
+    if list(level_limit) != sorted(level_limit):
+        raise ValueError(f"LEVEL_LIMIT should be ascending: {value}")
+    return level_limit
+
+
+def parse_policy(
+    values: Dict[str, Any], current_policy: Dict[str, Any], total_level: int
+) -> Dict[str, Any]:
+    """ check the options of a policy update, options not given are kept
+
+    Arguments:
+        values {Dict[str, Any]} -- options to update
+        current_policy {Dict[str, Any]} -- the policy which is updated, not changed
+
+    Raises:
+        ValueError: unknown option, plugin names which are not strings, invalid level limits
+                    or options which could not work together
+
+    Returns:
+        Dict[str, Any] -- the whole policy after the update
+    """
+    unknown_names = set(values) - set(POLICY_OPTIONS)
+    if unknown_names:
+        raise ValueError(f"Unknown policy options: {sorted(unknown_names)}")
+
+    for name, value in values.items():
+        # LEVEL_LIMIT could also be a list of integers
+        if name != "LEVEL_LIMIT" and not isinstance(value, str):
+            raise ValueError(f"{name} should be a string: {value!r}")
+
+    policy = {**current_policy, **values}
+    policy["LEVEL_LIMIT"] = _parse_level_limit(policy["LEVEL_LIMIT"], total_level)
+    check_policy(policy)
+    return policy
+
+
+def load_plugins(policy: Dict[str, Any]) -> PolicyPlugins:
+    """ build the plugins of a policy, the config is not changed,
+        entry points other than the ones of the startup env are refused
+
+    Raises:
+        ValueError: unknown plugin
+    """
+    try:
+        return PolicyPlugins(
+            get_plugin("staging_list", policy["STAGE_QUEUE"], is_runtime=True),
+            get_plugin(
+                "queue_selector", policy["QUEUE_SELECT_METHOD"], is_runtime=True
+            ),
+            get_plugin("job_selector", policy["JOB_SELECT_METHOD"], is_runtime=True),
+            get_plugin(
+                "round_selector", policy["ROUND_SELECT_METHOD"], is_runtime=True
+            ),
+        )
+    except Exception as error:  # pylint: disable=W0703
+        # any error of importing or creating plugins keeps the current policy
+        raise ValueError(f"Unknown plugin {error!r}") from error
+
+
+def read_env_policy() -> Dict[str, str]:
+    """ policy options of the .env file and the environment, e.g. reloaded by SIGHUP
+    """
+    load_dotenv(override=True)
+    return {name: os.environ[name] for name in POLICY_OPTIONS if name in os.environ}
@@ -0,0 +1,136 @@
+"""
+Lazy registry of scheduling plugins
+Plugins are referred by "module:attribute" entry points, so only the configured plugin of each kind
+is imported and instantiated, e.g. numpy is imported only by the columnar staging list.
+A plugin name with ":" is an entry point itself, for plugins outside this package,
+only accepted from the env at startup; policy updates at runtime choose registered names
+"""
+import functools
+import importlib
+from typing import Any, Dict, Optional
+
+from config import (
+    QUEUE_SCHEDULE_CONFIG,
+    QUEUE_SELECTION_CONFIG,
+    JOB_SELECTION_CONFIG,
+    JOB_TRIGGER_CONFIG,
+)
+
+_PLUGINS = "operators.job_consumer.plugins"
+_TRIGGER = f"{_PLUGINS}.job_operator_trigger.main"
+
+# kind: {name: entry point}, None: no plugin
+PLUGIN_ENTRY_POINTS: Dict[str, Dict[str, Optional[str]]] = {
+    "staging_list": {
+        "deque": "operators.job_consumer.resources.base_queue:DequeStagingList",
+        "heap": "operators.job_consumer.resources.base_queue:HeapStagingList",
+        "bisect": "operators.job_consumer.resources.base_queue:BisectStagingList",
+        "columnar": "operators.job_consumer.resources.columnar_queue:ColumnarStagingList",
+    },
+    "queue_selector": {
+        "top_level_select": f"{_PLUGINS}.queue_selector.main:TopLevelQueueSelector",
+        "env_weight_random_select": f"{_PLUGINS}.queue_selector.main:EnvWeightRandomSelect",
+        "weight_random_select": f"{_PLUGINS}.queue_selector.main:WeightRandomSelect",
+        "env_zip_select": f"{_PLUGINS}.queue_selector.main:EnvZipSelect",
+    },
+    "job_selector": {
+        "basic_pick_first": f"{_PLUGINS}.job_selector.main:BaseJobSelector",
+        "basic_check_resource": f"{_PLUGINS}.job_selector.main:BasicJobSelector",
+    },
+    "round_selector": {
+        "greedy": None,
+        "knapsack": f"{_PLUGINS}.round_selector.main:KnapsackRoundSelector",
+    },
+    "job_trigger": {
+        "test": f"{_TRIGGER}:send_job_to_none",
+        "api": f"{_TRIGGER}:send_job_to_job_trigger",
+        "airflow": f"{_TRIGGER}:send_job_to_airflow",
+    },
+    "batch_job_trigger": {
+        "test": f"{_TRIGGER}:send_jobs_to_none",
+        "api": f"{_TRIGGER}:send_jobs_to_job_trigger",
+        "airflow": f"{_TRIGGER}:send_jobs_to_airflow",
+    },
+    "job_canceller": {
+        "test": f"{_TRIGGER}:cancel_job_to_none",
+        "api": f"{_TRIGGER}:cancel_job_to_job_trigger",
+        "airflow": f"{_TRIGGER}:cancel_job_to_airflow",
+    },
+}
+
+# kind: (config, key of the plugin name, whether an instance is created per call)
+PLUGIN_KINDS = {
+    "staging_list": (QUEUE_SCHEDULE_CONFIG, "STAGE_QUEUE", False),
+    "queue_selector": (QUEUE_SELECTION_CONFIG, "QUEUE_SELECT_METHOD", True),
+    "job_selector": (JOB_SELECTION_CONFIG, "JOB_SELECT_METHOD", False),
+    "round_selector": (JOB_SELECTION_CONFIG, "ROUND_SELECT_METHOD", True),
+    "job_trigger": (JOB_TRIGGER_CONFIG, "METHOD", False),
+    "batch_job_trigger": (JOB_TRIGGER_CONFIG, "METHOD", False),
+    "job_canceller": (JOB_TRIGGER_CONFIG, "METHOD", False),
+}
+
+# kind: attributes a plugin should have, functions of triggers are only called
+PLUGIN_INTERFACES = {
+    "staging_list": ("insert", "pop", "from_jobs"),
+    "queue_selector": ("select_queue",),
+    "job_selector": ("select_job",),
+    "round_selector": ("select_jobs",),
+    "job_trigger": ("__call__",),
+    "batch_job_trigger": ("__call__",),
+    "job_canceller": ("__call__",),
+}
+
+# plugin names of the env at startup, the only entry points allowed at runtime
+STARTUP_NAMES = {kind: config[key] for kind, (config, key, _) in PLUGIN_KINDS.items()}
+
+
+@functools.lru_cache(maxsize=None)
+def load_plugin(kind: str, name: str) -> Any:
+    """ import a plugin by its name or entry point
+
+    Raises:
+        KeyError: unknown plugin name
+        TypeError: the plugin does not have the interface of its kind
+
+    Returns:
+        Any -- the class or function of the plugin, None if the name means no plugin
+    """
+    entry_point = name if ":" in name else PLUGIN_ENTRY_POINTS[kind][name]
+    if entry_point is None:
+        return None
+
+    module_name, attribute = entry_point.split(":")
+    plugin = getattr(importlib.import_module(module_name), attribute)
+
+    missing = [name for name in PLUGIN_INTERFACES[kind] if not hasattr(plugin, name)]
+    if missing:
+        raise TypeError(f"{entry_point} is not a {kind}, missing {missing}")
+    return plugin
+
+
+def get_plugin(kind: str, name: Optional[str] = None, is_runtime: bool = False) -> Any:
+    """ the configured plugin of a kind, selectors with state are new instances
+
+    Arguments:
+        name {Optional[str]} -- plugin name or entry point, None: the name of the config
+        is_runtime {bool} -- the name comes from a policy update,
+            only registered names or the name of the startup env are allowed
+
+    Raises:
+        KeyError: unknown plugin name
+        TypeError: the plugin does not have the interface of its kind
+    """
+    config, key, is_instance = PLUGIN_KINDS[kind]
+    if name is None:
+        name = config[key]
+    if (
+        is_runtime
+        and name not in PLUGIN_ENTRY_POINTS[kind]
+        and name != STARTUP_NAMES[kind]
+    ):
+        raise KeyError(name)
+
+    plugin = load_plugin(kind, name)
+    if is_instance and plugin is not None:
+        return plugin()
+    return plugin
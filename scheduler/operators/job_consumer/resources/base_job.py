@@ -6,9 +6,20 @@ from typing import Dict, Any
 from datetime import datetime, timedelta
 
 from config import DATE_FORMAT
+from connector.msg_queue.msg_info import MsgInfo
+from utils.clock import get_clock
 
 
-class Job:
+def parse_job_time(value) -> datetime:
+    """ a time of job config, a date string of json msgs or epoch seconds of binary msgs
+    """
+    if isinstance(value, int):
+        return datetime.utcfromtimestamp(value)
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+# a job is a plain record of its msg fields and scheduling state
+class Job:  # pylint: disable=R0902
     """ class for storaging job related parameters
     """
 
@@ -16,13 +27,18 @@ class Job:
 
         self.job_id = job_msg.msg_key
         self.job_type = job_msg.msg_value["job_type"]
+        self.username = job_msg.msg_value.get("username")
+
+        # msg partition of this job, for handing over staging jobs when rebalance
+        self.partition = getattr(job_msg, "partition", None)
 
         self.job_params = job_msg.msg_value["job_parameters"]
 
         job_config = job_msg.msg_value["job_config"]
+        self.job_config = job_config
         self.job_times: Dict[str, Any] = {
-            "deadline": datetime.strptime(job_config["deadline"], DATE_FORMAT),
-            "request_time": datetime.strptime(job_config["request_time"], DATE_FORMAT),
+            "deadline": parse_job_time(job_config["deadline"]),
+            "request_time": parse_job_time(job_config["request_time"]),
         }
 
         # job resource requirement for executor
@@ -33,11 +49,25 @@ class Job:
             "computing_time": None,
         }
 
+        # failed dispatch times, for retrying with backoff
+        self.dispatch_attempts = 0
+
+        # withdrawn by a cancel msg, for staging lists removing it lazily
+        self.is_cancelled = False
+
         # for inner scheduling sorting
-        self.job_times["schedule_time"] = (
-            self.job_times["deadline"] - self.job_times["request_time"]
-        ).seconds
-        self.sort_key = self.job_times[sort_key]
+        self.job_times["schedule_time"] = int(
+            (
+                self.job_times["deadline"] - self.job_times["request_time"]
+            ).total_seconds()
+        )
+        self.sort_key_name = sort_key
+
+    @property
+    def sort_key(self):
+        """ follow the renewed job times, so a renewed job could move to another level
+        """
+        return self.job_times[self.sort_key_name]
 
     def __lt__(self, other) -> None:
         """ For sorting usage
@@ -48,11 +78,13 @@ class Job:
         return ",".join((self.job_id, self.job_type, str(self.sort_key)))
 
     def _renew_schedule_time(self) -> None:
-        self.job_times["schedule_time"] = (
-            self.job_times["deadline"]
-            - datetime.utcnow()
-            - timedelta(seconds=self.job_resources["computing_time"])
-        ).seconds
+        self.job_times["schedule_time"] = int(
+            (
+                self.job_times["deadline"]
+                - get_clock().utcnow()
+                - timedelta(seconds=self.job_resources["computing_time"])
+            ).total_seconds()
+        )
 
     def renew_priority(self) -> object:
         """ When a new job coming, we need to recompute the scheduling time before insert the new job into staging list
@@ -60,6 +92,43 @@ class Job:
         self._renew_schedule_time()
         return self
 
+    def to_dict(self) -> Dict[str, Any]:
+        """ serialize the job with its scheduling state, e.g. for storing staging jobs
+        """
+        return {
+            "job_id": self.job_id,
+            "partition": self.partition,
+            "sort_key": self.sort_key_name,
+            "msg_value": {
+                "username": self.username,
+                "job_type": self.job_type,
+                "job_config": self.job_config,
+                "job_parameters": self.job_params,
+            },
+            "job_resources": self.job_resources,
+            "schedule_time": self.job_times["schedule_time"],
+            "dispatch_attempts": self.dispatch_attempts,
+        }
+
+    @classmethod
+    def from_dict(cls, job_dict: Dict[str, Any]) -> "Job":
+        """ rebuild a job serialized by to_dict
+        """
+        job = cls(
+            MsgInfo(
+                None,
+                job_dict["job_id"],
+                job_dict["msg_value"],
+                None,
+                job_dict["partition"],
+            ),
+            sort_key=job_dict["sort_key"],
+        )
+        job.job_resources = job_dict["job_resources"]
+        job.job_times["schedule_time"] = job_dict["schedule_time"]
+        job.dispatch_attempts = job_dict["dispatch_attempts"]
+        return job
+
     def get_job_compute_requirement(self) -> None:
         """ deside the job computing resource, it would be submit to spark
         """
@@ -3,13 +3,13 @@ Single Staging Queue Module
 Author: Po-Chun, Lu
 """
 import abc
-from typing import List, Deque
+from typing import Callable, List, Deque, Set
 from collections import deque
 import heapq
 import bisect
 
-from config import QUEUE_SCHEDULE_CONFIG
 from operators.job_consumer.resources.base_job import Job
+from operators.job_consumer.registry import get_plugin
 
 
 class BaseStagingList:
@@ -27,6 +27,17 @@ class BaseStagingList:
         # for job storaging
         self.job_list: List[Job] = []
 
+    def __len__(self) -> int:
+        return len(self.job_list)
+
+    @classmethod
+    def from_jobs(cls, level: int, jobs: List[Job]) -> "BaseStagingList":
+        """ build a staging list of jobs by one sort, e.g. when the staging list type is switched
+        """
+        staging_list = cls(level)
+        staging_list.job_list = sorted(jobs)
+        return staging_list
+
     @abc.abstractmethod
     def insert(self, job: Job) -> None:
         """ insert new job to job queue """
@@ -47,6 +58,14 @@ class BaseStagingList:
         """
         return self.job_list
 
+    def remove_if(self, predicate: Callable[[Job], bool]) -> List[Job]:
+        """ remove all jobs matching predicate in a single pass, the order is kept
+        """
+        removed_jobs = [job for job in self.job_list if predicate(job)]
+        if removed_jobs:
+            self.job_list = [job for job in self.job_list if not predicate(job)]
+        return removed_jobs
+
 
 class DequeStagingList:
     """ Job Queue for buffering each level job request before assigning to worker
@@ -62,6 +81,19 @@ class DequeStagingList:
 
         # for job storaging
         self.job_list: Deque[Job] = deque([])
+        # cancelled jobs are left in job_list and skipped, until they are the majority
+        self.cancelled_num = 0
+
+    def __len__(self) -> int:
+        return len(self.job_list) - self.cancelled_num
+
+    @classmethod
+    def from_jobs(cls, level: int, jobs: List[Job]) -> "DequeStagingList":
+        """ build a staging list of jobs in their staging order
+        """
+        staging_list = cls(level)
+        staging_list.job_list = deque(jobs)
+        return staging_list
 
     def insert(self, job: Job) -> None:
         """ insert the latest job into this list
@@ -71,41 +103,162 @@ class DequeStagingList:
     def pop(self) -> Job:
         """ get the most urgent job for worker to operate
         """
-        return self.job_list.popleft()
+        job = self.job_list.popleft()
+        while job.is_cancelled:
+            self.cancelled_num -= 1
+            job = self.job_list.popleft()
+        return job
+
+    def cancel(self, job: Job) -> None:
+        """ mark the job as cancelled in O(1), it is removed lazily
+        """
+        job.is_cancelled = True
+        self.cancelled_num += 1
+        if self.cancelled_num * 2 > len(self.job_list):
+            self.purge()
+
+    def purge(self) -> None:
+        """ remove all cancelled jobs
+        """
+        if self.cancelled_num:
+            self.job_list = deque(job for job in self.job_list if not job.is_cancelled)
+            self.cancelled_num = 0
+
+    def remove(self, job: Job) -> None:
+        """ remove specific job from list
+        """
+        self.job_list.remove(job)
 
     def renew_jobs_priority(self) -> None:
         """ recompute the job priority since the scheduling time would change
         """
+        self.purge()
         self.job_list = deque(map(lambda job: job.renew_priority(), self.job_list))
 
     def tolist(self) -> Deque[Job]:
         """ return deque for job selector iterating and pick a valid job
         """
+        self.purge()
         return self.job_list
 
+    def remove_if(self, predicate: Callable[[Job], bool]) -> List[Job]:
+        """ remove all jobs matching predicate in a single pass, the order is kept
+        """
+        self.purge()
+        removed_jobs = [job for job in self.job_list if predicate(job)]
+        if removed_jobs:
+            self.job_list = deque(job for job in self.job_list if not predicate(job))
+        return removed_jobs
 
-class HeapStagingList:
-    """ Staging List Based on Heap
+
+class LazyStagingList(BaseStagingList):
+    """ Staging list which removes jobs lazily, e.g. a picked job in the middle of the list:
+        removed jobs are left in job_list and skipped, until they are the majority
     """
 
     def __init__(self, level: int) -> None:
-        """
-        Arguments:
-            level {int} -- importance of this list
-        """
-        self.level = level
+        super().__init__(level)
 
-        # for job storaging
-        self.job_list: List[Job] = []
+        # id of the removed jobs still in job_list, a job in job_list is never garbage collected
+        self.removed_ids: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.job_list) - len(self.removed_ids)
+
+    @abc.abstractmethod
+    def _push(self, job: Job) -> None:
+        """ insert a job into job_list """
+        return NotImplemented
+
+    @abc.abstractmethod
+    def _pop(self) -> Job:
+        """ pop the most urgent job of job_list, including removed jobs """
+        return NotImplemented
+
+    @abc.abstractmethod
+    def sort(self) -> None:
+        """ restore the order of job_list """
+        return NotImplemented
 
     def insert(self, job: Job) -> None:
-        """ insert the latest job into this heap
+        """ insert the latest job into this list
         """
-        heapq.heappush(self.job_list, job)
+        if id(job) in self.removed_ids:
+            # e.g. a failed dispatch is restaged, its removed entry may have an old sort key
+            self.purge()
+        self._push(job)
 
     def pop(self) -> Job:
         """ get the most urgent job for worker to operate
         """
+        job = self._pop()
+        while id(job) in self.removed_ids:
+            self.removed_ids.discard(id(job))
+            job = self._pop()
+        return job
+
+    def remove(self, job: Job) -> None:
+        """ mark the job as removed in O(1), it is removed lazily
+        """
+        self.removed_ids.add(id(job))
+        if len(self.removed_ids) * 2 > len(self.job_list):
+            self.purge()
+
+    def cancel(self, job: Job) -> None:
+        """ remove a cancelled job lazily
+        """
+        self.remove(job)
+
+    def purge(self) -> None:
+        """ remove all removed jobs, then restore the order once
+        """
+        if self.removed_ids:
+            self.job_list = [
+                job for job in self.job_list if id(job) not in self.removed_ids
+            ]
+            self.removed_ids.clear()
+            self.sort()
+
+    def renew_jobs_priority(self) -> None:
+        """ recompute the job priority and restore the order once
+        """
+        self.purge()
+        super().renew_jobs_priority()
+        self.sort()
+
+    def tolist(self) -> List[Job]:
+        """ job_list without removed jobs
+        """
+        self.purge()
+        return self.job_list
+
+    def remove_if(self, predicate: Callable[[Job], bool]) -> List[Job]:
+        """ remove all jobs matching predicate, then restore the order once
+        """
+        self.purge()
+        removed_jobs = super().remove_if(predicate)
+        if removed_jobs:
+            self.sort()
+        return removed_jobs
+
+
+class HeapStagingList(LazyStagingList):
+    """ Staging List Based on Heap
+    """
+
+    @classmethod
+    def from_jobs(cls, level: int, jobs: List[Job]) -> "HeapStagingList":
+        """ build a staging list of jobs by one heapify in O(n)
+        """
+        staging_list = cls(level)
+        staging_list.job_list = list(jobs)
+        staging_list.sort()
+        return staging_list
+
+    def _push(self, job: Job) -> None:
+        heapq.heappush(self.job_list, job)
+
+    def _pop(self) -> Job:
         return heapq.heappop(self.job_list)
 
     def sort(self) -> None:
@@ -113,45 +266,30 @@ class HeapStagingList:
         """
         heapq.heapify(self.job_list)
 
-    def renew_jobs_priority(self) -> None:
-        """ recompute the job priority since the scheduling time would change
-        """
-        self.job_list = list(map(lambda job: job.renew_priority(), self.job_list))
-
     def tolist(self) -> List[Job]:
         """ return sorted list type for job selector iterating and pick a valid job
         """
-        return sorted(self.job_list)
+        return sorted(super().tolist())
 
 
-class BisectStagingList(BaseStagingList):
+class BisectStagingList(LazyStagingList):
     """ Staging list based on bisect insort
     """
 
-    def insert(self, job: Job) -> None:
-        """ insert the latest job into this heap
-        """
+    def _push(self, job: Job) -> None:
         bisect.insort_right(self.job_list, job)
 
-    def pop(self) -> Job:
-        """ get the most urgent job for worker to operate
-        """
+    def _pop(self) -> Job:
         return self.job_list.pop()
 
-    def remove(self, job: Job):
-        """ remove specific job from list
+    def sort(self) -> None:
+        """ keep the list sorted for bisect
         """
-        self.job_list.remove(job)
+        self.job_list.sort()
 
 
 def get_staging_list():
     """ Choose Type of staging list based on .env
         Each staging list get diff sort method or data structure
     """
-    queue_map = {
-        "deque": DequeStagingList,
-        "heap": HeapStagingList,
-        "bisect": BisectStagingList,
-    }
-
-    return queue_map[QUEUE_SCHEDULE_CONFIG["STAGE_QUEUE"]]
+    return get_plugin("staging_list")
@@ -0,0 +1,245 @@
+"""
+Columnar Staging List Module
+Scheduling columns of staging jobs are kept in numpy arrays, and job objects are looked up by slot
+ - renew: one vectorized subtraction instead of renewing every job object
+ - select: "the most urgent job that fits" is a masked argmin instead of scanning a sorted list
+Renewed schedule_time is written back to a job only when the job leaves the list or is listed
+"""
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from config import SCHEDULER_CONFIG
+from utils.clock import get_clock
+from operators.job_consumer.resources.base_job import Job
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_seconds(value) -> float:
+    """ sort key value as a float, datetime keys are converted to epoch seconds
+    """
+    if isinstance(value, datetime):
+        return (value - EPOCH).total_seconds()
+    return float(value)
+
+
+# every scheduling field is a column of its own, the struct of arrays is the point of it
+class ColumnarStagingList:  # pylint: disable=R0902
+    """ Staging list based on numpy struct of arrays
+
+    Args:
+        level: importance of this list
+        capacity: initial slots, the arrays grow by doubling
+    """
+
+    # compact when more than half of the used slots are removed jobs
+    MIN_COMPACT_SIZE = 64
+
+    def __init__(self, level: int, capacity: int = 1024) -> None:
+        self.level = level
+
+        self.sort_key_name: str = SCHEDULER_CONFIG["JOB_SORT_KEY"]
+        # only schedule_time changes when renewing
+        self.is_sorted_by_schedule_time = self.sort_key_name == "schedule_time"
+
+        # used slots (live and removed), live jobs
+        self.size = 0
+        self.live_num = 0
+
+        self.jobs: List[Optional[Job]] = [None] * capacity
+        self.slots: Dict[int, int] = {}
+
+        self.is_alive = np.zeros(capacity, dtype=bool)
+        self.deadline = np.zeros(capacity, dtype=np.float64)
+        self.computing_time = np.zeros(capacity, dtype=np.float64)
+        self.cpu = np.zeros(capacity, dtype=np.int64)
+        self.mem = np.zeros(capacity, dtype=np.int64)
+        self.schedule_time = np.zeros(capacity, dtype=np.int64)
+        # the value of JOB_SORT_KEY, same as schedule_time for the default sort key
+        self.sort_value = np.zeros(capacity, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return self.live_num
+
+    @classmethod
+    def from_jobs(cls, level: int, jobs: List[Job]) -> "ColumnarStagingList":
+        """ build a staging list of jobs in O(n), the columns are allocated once
+        """
+        staging_list = cls(level, capacity=max(1024, 2 * len(jobs)))
+        for job in jobs:
+            staging_list.insert(job)
+        return staging_list
+
+    @property
+    def capacity(self) -> int:
+        """ allocated slots
+        """
+        return len(self.jobs)
+
+    def _resize(self, capacity: int) -> None:
+        for name in (
+            "is_alive",
+            "deadline",
+            "computing_time",
+            "cpu",
+            "mem",
+            "schedule_time",
+            "sort_value",
+        ):
+            column = getattr(self, name)
+            new_column = np.zeros(capacity, dtype=column.dtype)
+            new_column[: self.size] = column[: self.size]
+            setattr(self, name, new_column)
+
+        self.jobs = self.jobs[: self.size] + [None] * (capacity - self.size)
+
+    def _compact(self) -> None:
+        """ move live jobs to the front, the order of slots is kept
+        """
+        live_slots = np.flatnonzero(self.is_alive[: self.size])
+        live_num = len(live_slots)
+
+        for column in (
+            self.deadline,
+            self.computing_time,
+            self.cpu,
+            self.mem,
+            self.schedule_time,
+            self.sort_value,
+        ):
+            column[:live_num] = column[live_slots]
+
+        self.jobs = [self.jobs[slot] for slot in live_slots] + [None] * (
+            self.capacity - live_num
+        )
+        self.slots = {id(job): slot for slot, job in enumerate(self.jobs[:live_num])}
+
+        self.is_alive[:live_num] = True
+        self.is_alive[live_num : self.size] = False
+        self.size = live_num
+
+    def _sync_job(self, slot: int) -> Job:
+        job = self.jobs[slot]
+        job.job_times["schedule_time"] = int(self.schedule_time[slot])
+        return job
+
+    def _get_sort_value(self, job: Job) -> float:
+        return to_seconds(job.job_times[self.sort_key_name])
+
+    def _take(self, slot: int) -> Job:
+        """ remove the job of a slot and return it with the renewed times
+        """
+        job = self._sync_job(slot)
+        self.is_alive[slot] = False
+        self.jobs[slot] = None
+        del self.slots[id(job)]
+        self.live_num -= 1
+
+        if self.live_num == 0:
+            self.size = 0
+        elif self.size >= self.MIN_COMPACT_SIZE and self.live_num * 2 < self.size:
+            self._compact()
+
+        return job
+
+    def _get_live_slots(self) -> np.ndarray:
+        """ slots of live jobs, sorted by the sort key
+        """
+        live_slots = np.flatnonzero(self.is_alive[: self.size])
+        order = np.argsort(self.sort_value[live_slots], kind="stable")
+        return live_slots[order]
+
+    def insert(self, job: Job) -> None:
+        """ insert the latest job into the next slot
+        """
+        if self.size == self.capacity:
+            if self.live_num * 2 < self.size:
+                self._compact()
+            else:
+                self._resize(self.capacity * 2)
+
+        slot = self.size
+        self.jobs[slot] = job
+        self.slots[id(job)] = slot
+        self.is_alive[slot] = True
+        self.deadline[slot] = to_seconds(job.job_times["deadline"])
+        self.computing_time[slot] = job.job_resources["computing_time"] or 0
+        self.cpu[slot] = job.job_resources["cpu"]
+        self.mem[slot] = job.job_resources["mem"]
+        self.schedule_time[slot] = job.job_times["schedule_time"]
+        self.sort_value[slot] = self._get_sort_value(job)
+
+        self.size += 1
+        self.live_num += 1
+
+    def pop(self) -> Job:
+        """ get the most urgent job for worker to operate
+        """
+        if self.live_num == 0:
+            raise IndexError("pop from empty staging list")
+
+        sort_value = np.where(
+            self.is_alive[: self.size], self.sort_value[: self.size], np.inf
+        )
+        return self._take(int(np.argmin(sort_value)))
+
+    def remove(self, job: Job) -> None:
+        """ remove specific job from list
+        """
+        self._take(self.slots[id(job)])
+
+    def cancel(self, job: Job) -> None:
+        """ remove a cancelled job, a slot is released in O(1)
+        """
+        self._take(self.slots[id(job)])
+
+    def select_fit(self, cpu: int, mem: int) -> Optional[Job]:
+        """ the most urgent job whose resources fit, it is still in this list
+
+        Returns:
+            Optional[Job] -- None if no job fits
+        """
+        size = self.size
+        is_fit = (
+            self.is_alive[:size] & (self.cpu[:size] <= cpu) & (self.mem[:size] <= mem)
+        )
+        if not is_fit.any():
+            return None
+
+        slot = int(np.argmin(np.where(is_fit, self.sort_value[:size], np.inf)))
+        return self._sync_job(slot)
+
+    def renew_jobs_priority(self) -> None:
+        """ recompute schedule_time of all jobs in one vectorized operation
+        """
+        size = self.size
+        now = to_seconds(get_clock().utcnow())
+        # int() of job objects truncates toward zero as well
+        self.schedule_time[:size] = np.trunc(
+            self.deadline[:size] - now - self.computing_time[:size]
+        )
+
+        if self.is_sorted_by_schedule_time:
+            self.sort_value[:size] = self.schedule_time[:size]
+
+    def tolist(self) -> List[Job]:
+        """ return sorted list type for job selector iterating and pick a valid job
+        """
+        return [self._sync_job(slot) for slot in self._get_live_slots()]
+
+    @property
+    def job_list(self) -> List[Job]:
+        """ live jobs with renewed times, same as tolist
+        """
+        return self.tolist()
+
+    def remove_if(self, predicate: Callable[[Job], bool]) -> List[Job]:
+        """ remove all jobs matching predicate, the order is kept
+        """
+        removed_jobs = [job for job in self.tolist() if predicate(job)]
+        for job in removed_jobs:
+            self.remove(job)
+        return removed_jobs
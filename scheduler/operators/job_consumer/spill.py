@@ -0,0 +1,124 @@
+"""
+Module for the cold tier of staging jobs
+Jobs whose latest start is far beyond a slack would not be dispatched for a long time,
+so they are serialized to a disk store and only a compact key stays in memory.
+They are paged back into staging lists before their latest start comes within the slack
+"""
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from config import SPILL_CONFIG
+from connector.state_store.sqlite import SQLiteJobStore
+from utils.clock import get_clock
+from operators.job_consumer.resources.base_job import Job
+from operators.job_consumer.plugins.job_selector.laxity import get_latest_start
+
+
+class ColdStagingTier:
+    """ spilled jobs ordered by latest start
+
+    Args:
+        store: disk store of serialized jobs
+        slack: seconds before latest start, jobs later than this are spilled
+    """
+
+    def __init__(
+        self, store: SQLiteJobStore, slack: float = SPILL_CONFIG["SLACK"]
+    ) -> None:
+        self.store = store
+        self.slack = timedelta(seconds=slack)
+
+        # job_id: (latest start, cpu, mem, partition)
+        self.keys: Dict[str, Tuple[datetime, int, int, Optional[int]]] = {}
+        # (latest start, job_id), entries of removed jobs are skipped when popped
+        self.heap: List[Tuple[datetime, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self.keys
+
+    def is_cold(self, job: Job) -> bool:
+        """ whether the job could wait on disk
+        """
+        return get_latest_start(job) - get_clock().utcnow() > self.slack
+
+    def spill(self, job: Job) -> None:
+        """ move a job to the disk store
+        """
+        latest_start = get_latest_start(job)
+        self.store.put(job.job_id, job.to_dict())
+        self.keys[job.job_id] = (
+            latest_start,
+            job.job_resources["cpu"],
+            job.job_resources["mem"],
+            job.partition,
+        )
+        heapq.heappush(self.heap, (latest_start, job.job_id))
+        logger.debug(f"Spill Job {job.job_id}, latest start: {latest_start}")
+
+    def _take(self, job_id: str) -> Optional[Job]:
+        del self.keys[job_id]
+        job_dict = self.store.take(job_id)
+        if job_dict is None:
+            logger.error(f"Spilled Job {job_id} not in store")
+            return None
+        return Job.from_dict(job_dict)
+
+    def _pop_heap(self) -> Optional[Job]:
+        while self.heap:
+            latest_start, job_id = heapq.heappop(self.heap)
+            key = self.keys.get(job_id)
+            if key is not None and key[0] == latest_start:
+                return self._take(job_id)
+        return None
+
+    def _peek_latest_start(self) -> Optional[datetime]:
+        while self.heap:
+            latest_start, job_id = self.heap[0]
+            key = self.keys.get(job_id)
+            if key is not None and key[0] == latest_start:
+                return latest_start
+            heapq.heappop(self.heap)
+        return None
+
+    def page_in(self, num: int = 0) -> List[Job]:
+        """ take the jobs whose latest start comes within the slack,
+            and at least num jobs of the earliest latest start, e.g. when staging lists run dry
+        """
+        due_time = get_clock().utcnow() + self.slack
+        jobs: List[Job] = []
+        while True:
+            latest_start = self._peek_latest_start()
+            if latest_start is None or (latest_start > due_time and len(jobs) >= num):
+                break
+
+            job = self._pop_heap()
+            if job is not None:
+                jobs.append(job)
+
+        if jobs:
+            logger.info(f"Page in {len(jobs)} Jobs, {len(self.keys)} Jobs spilled")
+        return jobs
+
+    def remove(self, job_id: str) -> bool:
+        """ drop a spilled job, e.g. it is cancelled
+
+        Returns:
+            bool -- whether the job is spilled
+        """
+        if self.keys.pop(job_id, None) is None:
+            return False
+        self.store.delete(job_id)
+        return True
+
+    def drop_partitions(self, partitions: Set[int]) -> List[Job]:
+        """ take the spilled jobs of the given msg partitions
+        """
+        job_ids = [job_id for job_id, key in self.keys.items() if key[3] in partitions]
+        jobs = [self._take(job_id) for job_id in job_ids]
+        return [job for job in jobs if job is not None]
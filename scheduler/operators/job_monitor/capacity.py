@@ -0,0 +1,186 @@
+"""
+Module for polling live cluster capacity in the background
+A daemon thread fetches the Spark master status periodically into a cache,
+so scheduling reads capacity without network calls; stale snapshots are ignored
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from config import SPARK_MASTER_CONFIG
+
+
+class CapacitySnapshot(NamedTuple):
+    """ free resources reported by the cluster
+    """
+
+    cpu: float
+    mem: float
+    # monotonic time of fetching, and the number of the snapshot
+    fetched_at: float
+    seq: int
+
+
+class SparkCapacityPoller:
+    """ cache of the free resources of the Spark cluster
+
+    Args:
+        url: json status url of the Spark master
+        interval: seconds between polls
+        max_staleness: seconds a snapshot could be used after fetching
+        fetch: (url, timeout) -> status, for a stub of the master, None: the Spark master client
+    """
+
+    def __init__(
+        self,
+        url: str = SPARK_MASTER_CONFIG["URL"],
+        interval: float = SPARK_MASTER_CONFIG["POLL_INTERVAL"],
+        max_staleness: float = SPARK_MASTER_CONFIG["MAX_STALENESS"],
+        fetch: Optional[Callable[[str, float], Dict[str, float]]] = None,
+    ) -> None:
+        if fetch is None:
+            # requests is only imported when polling is enabled
+            # pylint: disable=C0415
+            from connector.spark.master import fetch_spark_master_status
+
+            fetch = fetch_spark_master_status
+
+        self.url = url
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.fetch = fetch
+
+        # replaced by one assignment of the poller thread, so it is read without a lock
+        self.snapshot: Optional[CapacitySnapshot] = None
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def poll(self) -> None:
+        """ fetch the status once and cache it
+        """
+        try:
+            status = self.fetch(self.url, SPARK_MASTER_CONFIG["TIMEOUT"])
+        except Exception as error:  # pylint: disable=W0703
+            logger.warning(f"Spark Master unavailable: {error}")
+            return
+
+        seq = self.snapshot.seq + 1 if self.snapshot is not None else 0
+        self.snapshot = CapacitySnapshot(
+            cpu=status["cpu_total"] - status["cpu_used"],
+            mem=status["mem_total"] - status["mem_used"],
+            fetched_at=time.monotonic(),
+            seq=seq,
+        )
+
+    def _run(self) -> None:
+        while True:
+            self.poll()
+            if self.stop_event.wait(self.interval):
+                break
+
+    def start(self) -> None:
+        """ poll in a daemon thread
+        """
+        self.thread = threading.Thread(
+            target=self._run, name="capacity-poller", daemon=True
+        )
+        self.thread.start()
+        logger.info(f"Poll Spark capacity from {self.url} every {self.interval}s")
+
+    def stop(self) -> None:
+        """ stop polling
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def get_snapshot(self) -> Optional[CapacitySnapshot]:
+        """ the latest snapshot, None if it is older than max staleness
+        """
+        snapshot = self.snapshot
+
+        if (
+            snapshot is None
+            or time.monotonic() - snapshot.fetched_at > self.max_staleness
+        ):
+            return None
+        return snapshot
+
+
+class CapacityReconciler:
+    """ correct the local counters of free resources by new snapshots of a poller
+         - less free in spark, e.g. manual jobs or node loss: corrected at once
+         - more free in spark, e.g. a lost completion msg: corrected when seen twice,
+           since a completion msg usually arrives a little later than spark frees cores
+    """
+
+    def __init__(self, poller: SparkCapacityPoller) -> None:
+        self.poller = poller
+        self.reconciled_seq = -1
+        # free resources seen by spark but not locally at the last reconciliation
+        self.surplus = {"cpu": 0, "mem": 0}
+        # (monotonic time, cpu, mem) of recent reservations, spark may not see them yet
+        self.reservations: Deque[Tuple[float, int, int]] = deque()
+
+    def record_reservation(self, cpu: int, mem: int) -> None:
+        """ resources are reserved locally now
+        """
+        self.reservations.append((time.monotonic(), cpu, mem))
+
+    def _get_in_flight(self, fetched_at: float) -> Dict[str, int]:
+        """ resources reserved locally which spark may not count as used at fetched_at
+        """
+        start_grace = SPARK_MASTER_CONFIG["START_GRACE"]
+        expired_time = (
+            time.monotonic() - start_grace - SPARK_MASTER_CONFIG["MAX_STALENESS"]
+        )
+        while self.reservations and self.reservations[0][0] < expired_time:
+            self.reservations.popleft()
+
+        in_flight = {"cpu": 0, "mem": 0}
+        for reserved_at, cpu, mem in self.reservations:
+            if reserved_at >= fetched_at - start_grace:
+                in_flight["cpu"] += cpu
+                in_flight["mem"] += mem
+        return in_flight
+
+    def reconcile(self, total: Dict[str, int]) -> None:
+        """ correct the local free resources in place, once per snapshot
+
+        Arguments:
+            total {Dict[str, int]} -- e.g. {"cpu": 8, "mem": 16}
+        """
+        snapshot = self.poller.get_snapshot()
+        if snapshot is None or snapshot.seq == self.reconciled_seq:
+            return
+        self.reconciled_seq = snapshot.seq
+
+        in_flight = self._get_in_flight(snapshot.fetched_at)
+        for name, spark_free in (("cpu", snapshot.cpu), ("mem", snapshot.mem)):
+            drift = int(spark_free) - in_flight[name] - total[name]
+            correction = drift if drift < 0 else min(drift, self.surplus[name])
+            self.surplus[name] = max(drift, 0)
+
+            if correction:
+                logger.warning(
+                    f"Reconcile {name} with spark: {total[name]} -> {total[name] + correction}"
+                )
+                total[name] += correction
+
+
+def get_capacity_poller() -> Optional[SparkCapacityPoller]:
+    """ a started poller of SPARK_MASTER_STATUS_URL for a runtime entry point,
+        None if it is not set
+
+    Returns:
+        Optional[SparkCapacityPoller] -- the poller given to JobMonitor
+    """
+    if not SPARK_MASTER_CONFIG["URL"]:
+        return None
+
+    capacity_poller = SparkCapacityPoller()
+    capacity_poller.start()
+    return capacity_poller
@@ -0,0 +1,135 @@
+"""
+Module for sharing system resources between scheduler processes
+Reservations are checked and deducted atomically, so the cluster is never overcommitted,
+and running jobs of capped job types are counted in the same reservation, so a cap holds across processes
+"""
+import multiprocessing
+from typing import Dict, Optional
+
+from loguru import logger
+
+from config import DISPATCH_LIMIT_CONFIG, SYSTEM_CONFIG
+from operators.job_consumer.resources.base_job import Job
+from operators.job_monitor.main import JobMonitor
+
+
+class SharedResourceLedger:
+    """ valid cpu & mem and running jobs of capped job types in shared memory,
+        created by the parent process and passed to workers
+
+    Args:
+        type_caps: max running jobs of job types across all processes
+    """
+
+    CPU, MEM = 0, 1
+
+    def __init__(
+        self, cpu: int, mem: int, type_caps: Optional[Dict[str, int]] = None
+    ) -> None:
+        self.type_caps = dict(type_caps or {})
+        # job_type: index of its running job number, after cpu & mem
+        self.type_indexes = {
+            job_type: index for index, job_type in enumerate(self.type_caps, start=2)
+        }
+        self.resources = multiprocessing.Array(
+            "q", [cpu, mem] + [0] * len(self.type_caps), lock=True
+        )
+
+    def try_reserve(self, cpu: int, mem: int, job_type: Optional[str] = None) -> bool:
+        """ deduct resources only if both of them are enough
+            and the job type is not capped, then count the job of a capped type
+
+        Returns:
+            bool -- whether the resources are reserved
+        """
+        index = self.type_indexes.get(job_type)
+        with self.resources.get_lock():
+            if self.resources[self.CPU] < cpu or self.resources[self.MEM] < mem:
+                return False
+            if index is not None and self.resources[index] >= self.type_caps[job_type]:
+                return False
+            self.resources[self.CPU] -= cpu
+            self.resources[self.MEM] -= mem
+            if index is not None:
+                self.resources[index] += 1
+            return True
+
+    def release_type(self, job_type: str) -> None:
+        """ a job of a capped type stops running, e.g. it completes or gives its resources back
+        """
+        with self.resources.get_lock():
+            self.resources[self.type_indexes[job_type]] -= 1
+
+    def is_type_capped(self, job_type: str) -> bool:
+        """ whether the running jobs of a capped type reach its cap in all processes
+        """
+        return self.resources[self.type_indexes[job_type]] >= self.type_caps[job_type]
+
+    def release(self, cpu: int, mem: int) -> None:
+        """ give resources back, e.g. a job completes
+        """
+        with self.resources.get_lock():
+            self.resources[self.CPU] += cpu
+            self.resources[self.MEM] += mem
+
+    def get(self) -> Dict[str, int]:
+        """ a consistent snapshot of valid resources
+        """
+        with self.resources.get_lock():
+            return {"cpu": self.resources[self.CPU], "mem": self.resources[self.MEM]}
+
+
+class SharedJobMonitor(JobMonitor):
+    """ JobMonitor whose system resources live in a shared ledger
+    """
+
+    # pylint: disable=W0231
+    # (super-init-not-called) system resources are owned by the ledger
+    def __init__(self, ledger: SharedResourceLedger) -> None:
+        self.jobs_resources = self._fetch_job_resources_from_api()
+        self.ledger = ledger
+        self._init_running_jobs()
+        # job_id: job type of the running jobs counted by the ledger
+        self.capped_types: Dict[str, str] = {}
+
+    # pylint: enable=W0231
+
+    @property
+    def system_resources(self) -> Dict[str, Dict]:
+        """ snapshot of the shared resources, same format as JobMonitor
+        """
+        return {"total": self.ledger.get()}
+
+    def fetch_current_system_resources_from_api(self) -> Dict[str, Dict]:
+        return self.system_resources
+
+    def reserve_job_resources(self, job: Job) -> bool:
+        is_reserved = self.ledger.try_reserve(
+            job.job_resources["cpu"], job.job_resources["mem"], job.job_type
+        )
+        if is_reserved:
+            self._track_running_job(job)
+            if job.job_type in self.ledger.type_caps:
+                self.capped_types[job.job_id] = job.job_type
+            logger.info(f"Current System Resources: {self.system_resources}")
+        return is_reserved
+
+    def finish_running_job(self, job_id: str) -> None:
+        super().finish_running_job(job_id)
+        job_type = self.capped_types.pop(job_id, None)
+        if job_type is not None:
+            self.ledger.release_type(job_type)
+
+    def update_current_system_resources(self, cpu, mem):
+        self.ledger.release(cpu, mem)
+        logger.info(f"Current System Resources: {self.system_resources}")
+
+
+def create_ledger() -> SharedResourceLedger:
+    """ ledger seeded from SYSTEM_CPU / SYSTEM_MEM and TYPE_CONCURRENCY_CAPS
+    """
+    return SharedResourceLedger(
+        SYSTEM_CONFIG["SYSTEM_CPU"],
+        SYSTEM_CONFIG["SYSTEM_MEM"],
+        DISPATCH_LIMIT_CONFIG["TYPE_CAPS"],
+    )
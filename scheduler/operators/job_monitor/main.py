@@ -2,29 +2,47 @@
 Module for monitor system valid resources of spark and assign resources for jobs
 Author: Po-Chun, Lu
 """
-from typing import Dict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
 
 from loguru import logger
 
 from config import SYSTEM_CONFIG
+from utils.clock import get_clock
 from operators.job_consumer.resources.base_job import Job
+from operators.job_monitor.capacity import CapacityReconciler, SparkCapacityPoller
+from operators.job_monitor.work import RunningWork
 
 
 class JobMonitor:
     """ monitor system resources and allocate job resources
     """
 
-    def __init__(self):
+    def __init__(self, capacity_poller: Optional[SparkCapacityPoller] = None):
         self.jobs_resources = self._fetch_job_resources_from_api()
 
         self.system_resources = {
             "total": {
                 "cpu": SYSTEM_CONFIG["SYSTEM_CPU"],
                 "mem": SYSTEM_CONFIG["SYSTEM_MEM"],
-            },
+            }
         }
         logger.info(f"TOTAL SYSTEM RESOURCE: {self.system_resources}")
 
+        self._init_running_jobs()
+
+        # live capacity of spark, reconciled with the local counters,
+        # started by the runtime entry points, so a simulation never polls the cluster
+        self.reconciler: Optional[CapacityReconciler] = None
+        if capacity_poller is not None:
+            self.reconciler = CapacityReconciler(capacity_poller)
+
+    def _init_running_jobs(self) -> None:
+        # job_id: (estimated end time, cpu) of the jobs holding resources
+        self.running_jobs: Dict[str, Tuple[datetime, int]] = {}
+        # remaining work of running jobs, for admission tests and estimated start times
+        self.running_work = RunningWork()
+
     @staticmethod
     def _fetch_job_resources_from_api() -> Dict[str, Dict]:
         """ Get Job related resource requirements
@@ -76,9 +94,50 @@ class JobMonitor:
             }
         """
 
-        # TODO: get system resources from spark
+        if self.reconciler is not None:
+            self.reconciler.reconcile(self.system_resources["total"])
         return self.system_resources
 
+    def reserve_job_resources(self, job: Job) -> bool:
+        """ take system resources for a picked job
+
+        Arguments:
+            job {Job} -- [The next job that would be assign to airflow and spark]
+
+        Returns:
+            bool -- False if resources are not enough, e.g. taken by another scheduler
+        """
+        cpu, mem = job.job_resources["cpu"], job.job_resources["mem"]
+        total = self.system_resources["total"]
+        if cpu > total["cpu"] or mem > total["mem"]:
+            return False
+
+        self.update_current_system_resources(-cpu, -mem)
+        self._track_running_job(job)
+        if self.reconciler is not None:
+            self.reconciler.record_reservation(cpu, mem)
+        return True
+
+    def _track_running_job(self, job: Job) -> None:
+        end_time = get_clock().utcnow() + timedelta(
+            seconds=job.job_resources["computing_time"] or 0
+        )
+        cpu = job.job_resources["cpu"]
+        self.running_jobs[job.job_id] = (end_time, cpu)
+        self.running_work.add(job.job_id, end_time, cpu)
+
+    def finish_running_job(self, job_id: str) -> None:
+        """ stop tracking a job which completes or gives its resources back
+        """
+        self.running_jobs.pop(job_id, None)
+        self.running_work.remove(job_id)
+
+    def get_running_work(self) -> float:
+        """ remaining cpu seconds of running jobs, estimated by their computing time,
+            in amortized O(log n) since ended jobs leave the sums once
+        """
+        return self.running_work.get()
+
     def update_current_system_resources(self, cpu, mem):
         """ increase system valid resource when a job complete
 
@@ -0,0 +1,66 @@
+"""
+Module for the remaining work of running jobs
+Remaining work = cpu_end_sum - cpu_sum * now, in seconds since the origin, so it is read in
+amortized O(log n); jobs leave the sums when they finish or pass their end time, found by a heap of end times
+"""
+import heapq
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from utils.clock import get_clock
+
+
+class RunningWork:
+    """ running sums of cpu and cpu * end time of the running jobs which are not ended yet
+    """
+
+    def __init__(self) -> None:
+        self.origin = get_clock().utcnow()
+        # job_id: (end time, cpu)
+        self.unended_jobs: Dict[str, Tuple[float, int]] = {}
+        self.end_heap: List[Tuple[float, str]] = []
+        self.cpu_sum = 0
+        self.cpu_end_sum = 0.0
+        # the admin server thread reads the remaining work
+        self.lock = threading.Lock()
+
+    def add(self, job_id: str, end_time: datetime, cpu: int) -> None:
+        """ count a running job, a job tracked again replaces its old end time
+        """
+        end = (end_time - self.origin).total_seconds()
+        with self.lock:
+            self._remove(job_id)
+            self.unended_jobs[job_id] = (end, cpu)
+            heapq.heappush(self.end_heap, (end, job_id))
+            self.cpu_sum += cpu
+            self.cpu_end_sum += cpu * end
+
+    def _remove(self, job_id: str) -> None:
+        end, cpu = self.unended_jobs.pop(job_id, (0.0, 0))
+        self.cpu_sum -= cpu
+        self.cpu_end_sum -= cpu * end
+        if not self.unended_jobs:
+            # drop the rounding errors of the float sum
+            self.cpu_sum, self.cpu_end_sum = 0, 0.0
+
+    def remove(self, job_id: str) -> None:
+        """ a job finishes before its end time
+        """
+        with self.lock:
+            self._remove(job_id)
+
+    def get(self) -> float:
+        """ remaining cpu seconds of running jobs
+        """
+        now = (get_clock().utcnow() - self.origin).total_seconds()
+        with self.lock:
+            while self.end_heap and self.end_heap[0][0] <= now:
+                end, job_id = heapq.heappop(self.end_heap)
+                # skip the entries of finished or tracked again jobs
+                if self.unended_jobs.get(job_id, (None,))[0] == end:
+                    self._remove(job_id)
+            if not self.unended_jobs:
+                # entries of finished jobs are not kept until their end times
+                self.end_heap = []
+            return max(self.cpu_end_sum - self.cpu_sum * now, 0.0)
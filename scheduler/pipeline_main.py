@@ -0,0 +1,287 @@
+"""
+Pipelined Entry Process of Job scheduling, an alternative of main.py
+ - decode stage (main thread): polls kafka, decodes msgs and builds Job objects
+ - scheduling stage (one thread): the only owner of staging lists and JobMonitor state
+ - dispatch stage (thread pool): sends picked jobs to the job trigger
+Stages are connected by bounded queues, a full queue blocks the stage before it (backpressure)
+"""
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from config import (
+    ASYNC_RUNTIME_CONFIG,
+    ETA_CONFIG,
+    KAFKA_TOPIC_CONFIG,
+    PIPELINE_CONFIG,
+    SCHEDULER_CONFIG,
+    init_config,
+)
+from utils.metrics import MetricsReporter, StageMetrics
+from operators.job_consumer.plugins import SEND_JOB, SEND_JOBS
+from operators.job_consumer.resources.base_job import Job
+from runtime import SchedulerRuntime
+
+
+class PipelineMainProcess(SchedulerRuntime):
+    """ Entry Process of Job scheduling based on pipelined threads
+    """
+
+    def __init__(self) -> None:
+        # the consumer is only touched by the decode stage,
+        # and the operator only by the scheduling stage
+        super().__init__(send_job=self._dispatch_job, send_jobs=self._dispatch_jobs)
+        self.config = PIPELINE_CONFIG
+
+        # a full queue blocks the stage before it
+        self.queues: Dict[str, queue.Queue] = {
+            # decoded Job objects, other msgs or handoff callbacks, None for stopping
+            "decode": queue.Queue(maxsize=self.config["DECODE_QUEUE_SIZE"]),
+            # (send function, payload, jobs), None for stopping
+            "dispatch": queue.Queue(maxsize=self.config["DISPATCH_QUEUE_SIZE"]),
+            # (jobs, is_success) reported back to the scheduling stage, never blocks dispatching
+            "result": queue.Queue(),
+        }
+
+        # the queue selector could be switched by reconfigure
+        gauges = {"level_weights": self._get_level_weights}
+
+        self.stage_metrics = {
+            name: StageMetrics(name) for name in ("decode", "schedule", "dispatch")
+        }
+        self.reporter = MetricsReporter(
+            self.stage_metrics,
+            self.queues,
+            lambda metrics: logger.info(f"Pipeline Metrics: {metrics}"),
+            self.config["METRICS_INTERVAL"],
+            gauges,
+        )
+
+        self.stop_event = threading.Event()
+        self.schedule_thread = threading.Thread(
+            target=self._schedule, name="scheduler-schedule"
+        )
+        self.dispatch_threads = [
+            threading.Thread(target=self._dispatch, name=f"scheduler-dispatch-{i}")
+            for i in range(self.config["DISPATCH_WORKERS"])
+        ]
+
+    # decode stage
+
+    @staticmethod
+    def _decode_msg(msg):
+        if msg.topic == KAFKA_TOPIC_CONFIG["TOPIC_NEW_JOB_NOTIFY"]:
+            return Job(job_msg=msg, sort_key=SCHEDULER_CONFIG["JOB_SORT_KEY"])
+        return msg
+
+    def _decode(self) -> None:
+        metrics = self.stage_metrics["decode"]
+        while not self.stop_event.is_set():
+            # msgs are polled here, and their values are decoded lazily by the generator
+            msgs = self.consumer.get_info_gen_from_queue()
+
+            start = time.perf_counter()
+            items = [self._decode_msg(msg) for msg in msgs]
+            metrics.record(len(items), time.perf_counter() - start)
+
+            for item in items:
+                # wait here if scheduling falls behind, so kafka is not polled
+                self.queues["decode"].put(item)
+
+    def _run_handoff(self, handoff_func: Callable) -> Callable:
+        """ rebalance callbacks run in the decode stage, hand them to the scheduling stage
+            behind the decoded msgs, and block the rebalance until staging jobs are handed over
+        """
+
+        def callback(partitions):
+            if not self.schedule_thread.is_alive():
+                # consumer is closed after the scheduling stage stopped
+                handoff_func(partitions)
+                return
+
+            future: Future = Future()
+
+            def run_in_schedule():
+                try:
+                    handoff_func(partitions)
+                    future.set_result(None)
+                except Exception as error:  # pylint: disable=W0703
+                    future.set_exception(error)
+
+            self.queues["decode"].put(run_in_schedule)
+            future.result()
+
+        return callback
+
+    # scheduling stage
+
+    def _dispatch_job(self, job: Job) -> None:
+        """ called by the scheduling stage, the result is reported later
+        """
+        self.queues["dispatch"].put((SEND_JOB, job, [job]))
+
+    def _dispatch_jobs(self, jobs: List[Job]) -> None:
+        """ called by the scheduling stage, send a round of jobs by a bulk request
+        """
+        self.queues["dispatch"].put((SEND_JOBS, jobs, jobs))
+
+    def _handle_dispatch_results(self) -> None:
+        while True:
+            try:
+                jobs, result = self.queues["result"].get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.operator.on_dispatch_result(jobs, result)
+            except Exception as error:  # pylint: disable=W0703
+                logger.error(f"Dispatch Result Error: {error}")
+
+    def _get_housekeeping(self) -> List[Tuple[float, Callable]]:
+        """ (interval, func) run periodically by the scheduling stage
+        """
+        housekeeping = [
+            (
+                ASYNC_RUNTIME_CONFIG["DEADLINE_CHECK_INTERVAL"],
+                self.operator.check_overdue_jobs,
+            ),
+            (
+                ASYNC_RUNTIME_CONFIG["RETRY_CHECK_INTERVAL"],
+                self.operator.process_retries,
+            ),
+        ]
+        if ETA_CONFIG["INTERVAL"]:
+            housekeeping.append((ETA_CONFIG["INTERVAL"], self.operator.publish_etas))
+        if SCHEDULER_CONFIG["IS_REALLOCATE"]:
+            housekeeping.append(
+                (ASYNC_RUNTIME_CONFIG["REALLOCATE_INTERVAL"], self.operator.reallocate)
+            )
+        return housekeeping
+
+    def _schedule_item(self, item) -> None:
+        if callable(item):
+            # a handoff callback, buffered msgs are staged before it
+            item()
+        elif isinstance(item, Job):
+            logger.info(f"{'='*60}\n\nGet Job {item.job_id}")
+            self.operator.consume_new_job(item)
+        else:
+            logger.info(
+                f"{'='*60}\n\n"
+                + f"Get MSG \n - Topic: {item.topic}, \n - Key: {item.msg_key}\n - Value: {item.msg_value}\n"
+            )
+            self.operator.consume_msg(item)
+
+    def _schedule(self) -> None:
+        metrics = self.stage_metrics["schedule"]
+        housekeeping = self._get_housekeeping()
+        last_times = [time.monotonic()] * len(housekeeping)
+        while True:
+            self._handle_dispatch_results()
+
+            now = time.monotonic()
+            for i, (interval, func) in enumerate(housekeeping):
+                if now - last_times[i] >= interval:
+                    # an error ends neither the scheduling stage nor the stages waiting on it
+                    try:
+                        func()
+                    except Exception as error:  # pylint: disable=W0703
+                        logger.error(f"Housekeeping {func.__name__} Error: {error}")
+                    last_times[i] = now
+
+            try:
+                item = self.queues["decode"].get(
+                    timeout=ASYNC_RUNTIME_CONFIG["RETRY_CHECK_INTERVAL"]
+                )
+            except queue.Empty:
+                continue
+
+            if item is None:
+                break
+
+            start = time.perf_counter()
+            try:
+                self._schedule_item(item)
+            except Exception as error:  # pylint: disable=W0703
+                logger.error(f"Scheduling Error: {error}")
+            metrics.record(1, time.perf_counter() - start)
+
+        self._handle_dispatch_results()
+
+    # dispatch stage
+
+    def _dispatch(self) -> None:
+        metrics = self.stage_metrics["dispatch"]
+        while True:
+            item = self.queues["dispatch"].get()
+            if item is None:
+                break
+
+            send_func, payload, jobs = item
+            start = time.perf_counter()
+            try:
+                # a bool, or the failed jobs of a batch trigger
+                result = send_func(payload)
+            except Exception as error:  # pylint: disable=W0703
+                logger.error(f"Dispatch Error: {error}")
+                result = False
+            metrics.record(len(jobs), time.perf_counter() - start)
+
+            self.queues["result"].put((jobs, result))
+
+    def _stop(self) -> None:
+        # stop in the order of stages, so buffered items are processed
+        self.stop_event.set()
+        self.queues["decode"].put(None)
+        self.schedule_thread.join()
+
+        for _ in self.dispatch_threads:
+            self.queues["dispatch"].put(None)
+        for dispatch_thread in self.dispatch_threads:
+            dispatch_thread.join()
+
+        # the scheduling stage is stopped, results of the last dispatches are handled here
+        self._handle_dispatch_results()
+        self.reporter.stop()
+
+    def _get_level_weights(self) -> Optional[List[float]]:
+        get_level_weights = getattr(
+            self.operator.plugins.queue_selector, "get_level_weights", None
+        )
+        return get_level_weights() if get_level_weights is not None else None
+
+    def run(self) -> None:
+        """ start stages, then decode msgs in the main thread until aborted
+        """
+        signal.signal(signal.SIGHUP, self._reload_policy)
+        for dispatch_thread in self.dispatch_threads:
+            dispatch_thread.start()
+        self.schedule_thread.start()
+        self.reporter.start()
+
+        try:
+            self._start_services()
+            self._decode()
+
+        except KeyboardInterrupt:
+            logger.warning("Aborted by user")
+        finally:
+            self._stop()
+            self._stop_services()
+
+
+def main():
+    """ define main function for cython usage
+    """
+    init_config()
+    logger.warning("ReStart Scheduler Process (pipeline)")
+    app = PipelineMainProcess()
+    app.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Module for the wiring shared by the runtime entry points (main.py, async_main.py, pipeline_main.py)
+ - kafka consumer, and the producer of admission / ETA notifications
+ - JobConsumer with the live capacity poller
+ - partition handoff, admin server, poll metrics and SIGHUP policy reloading
+Each runtime decides which thread schedules, how jobs are dispatched and where handoff callbacks run
+"""
+import functools
+from typing import Callable, List, Optional
+
+from loguru import logger
+
+from config import (
+    ADAPTIVE_POLL_CONFIG,
+    ADMIN_CONFIG,
+    ADMISSION_CONFIG,
+    ETA_CONFIG,
+    HANDOFF_CONFIG,
+    KAFKA_TOPIC_CONFIG,
+)
+from connector.admin.server import AdminServer
+from connector.msg_queue.kafka import KafkaConsumer, KafkaProducer
+from connector.state_store.local import LocalStagingStore
+from operators.job_consumer.main import JobConsumer
+from operators.job_consumer.handoff import PartitionHandoff
+from operators.job_consumer.introspection import get_admin_routes
+from operators.job_consumer.policy import read_env_policy
+from operators.job_consumer.plugins import SEND_JOB, SEND_JOBS
+from operators.job_consumer.resources.base_job import Job
+from operators.job_monitor.main import JobMonitor
+from operators.job_monitor.capacity import get_capacity_poller
+from utils.metrics import MetricsReporter
+
+
+class SchedulerRuntime:
+    """ services around JobConsumer shared by the runtime entry points
+
+    Args:
+        send_job: how a picked job leaves the scheduler, e.g. queued to a dispatch task
+        send_jobs: how a round of jobs leaves the scheduler
+    """
+
+    def __init__(
+        self,
+        send_job: Callable[[Job], Optional[bool]] = SEND_JOB,
+        send_jobs: Callable[[List[Job]], Optional[List[Job]]] = SEND_JOBS,
+    ) -> None:
+        # for getting msg
+        self.consumer = KafkaConsumer()
+
+        # for notifying jobs failing the admission test and estimated start times
+        self.producer = None
+        notify_admission = None
+        notify_eta = None
+        if ADMISSION_CONFIG["MODE"] != "off" or ETA_CONFIG["INTERVAL"]:
+            self.producer = KafkaProducer()
+        if ADMISSION_CONFIG["MODE"] != "off":
+            notify_admission = functools.partial(
+                self.producer.produce, KAFKA_TOPIC_CONFIG["TOPIC_JOB_ADMISSION_NOTIFY"]
+            )
+        if ETA_CONFIG["INTERVAL"]:
+            notify_eta = functools.partial(
+                self.producer.produce, KAFKA_TOPIC_CONFIG["TOPIC_JOB_ETA_NOTIFY"]
+            )
+
+        # for processing msg
+        self.operator = JobConsumer(
+            JobMonitor(get_capacity_poller()),
+            send_job=send_job,
+            send_jobs=send_jobs,
+            notify_admission=notify_admission,
+            notify_eta=notify_eta,
+        )
+
+        # for handing over staging jobs when partitions move to another instance
+        self.handoff = None
+        if HANDOFF_CONFIG["STORE_DIR"]:
+            self.handoff = PartitionHandoff(
+                self.operator,
+                LocalStagingStore(HANDOFF_CONFIG["STORE_DIR"]),
+                self.consumer.commit,
+            )
+
+        # for looking up jobs from outside, served by its own threads
+        self.admin_server = None
+        if ADMIN_CONFIG["PORT"]:
+            self.admin_server = AdminServer(get_admin_routes(self.operator))
+
+        # for logging the decisions of adaptive polling
+        self.poll_reporter = MetricsReporter(
+            {},
+            {},
+            lambda metrics: logger.info(f"Poll Metrics: {metrics['gauges']}"),
+            ADAPTIVE_POLL_CONFIG["METRICS_INTERVAL"]
+            if self.consumer.poll_controller is not None
+            else 0,
+            {"poll": self.consumer.get_poll_metrics},
+        )
+
+    def _run_handoff(self, handoff_func: Callable) -> Callable:  # pylint: disable=R0201
+        """ rebalance callbacks run in the poll thread, which schedules by default,
+            runtimes scheduling in another thread hand them over
+        """
+        return handoff_func
+
+    def _reload_policy(self, *_) -> None:
+        """ SIGHUP: switch to the policy options of .env, applied by the scheduling thread
+        """
+        policy = read_env_policy()
+        logger.warning(f"Reload Policy: {policy}")
+        self.operator.request_policy(policy)
+
+    def _start_services(self) -> None:
+        """ start the reporter, the admin server and the consumer
+        """
+        self.poll_reporter.start()
+        if self.admin_server is not None:
+            self.admin_server.start()
+        if self.handoff is not None:
+            self.consumer.start(
+                self._run_handoff(self.handoff.on_assign),
+                self._run_handoff(self.handoff.on_revoke),
+            )
+        else:
+            self.consumer.start()
+
+    def _stop_services(self) -> None:
+        """ stop the services, after scheduling stops
+        """
+        self.poll_reporter.stop()
+        if self.admin_server is not None:
+            self.admin_server.stop()
+        self.consumer.close()
+        if self.producer is not None:
+            self.producer.close()
@@ -0,0 +1,195 @@
+"""
+Sharded Entry Process of Job scheduling, an alternative of main.py
+ - the router process consumes kafka and routes new jobs to workers by SHARD_KEY (username / job_type),
+   which is peeked from the encoded msg value, so only complete msgs are decoded by the router
+ - each worker process owns the staging lists of its shard, decodes msgs, builds Job objects and schedules them
+ - resources are reserved through a shared ledger, so workers never overcommit the cluster
+ - type caps are counted by the shared ledger too, other dispatch limits are kept by each worker,
+   so they hold across workers only for the shard key, a user cap sharded by job_type is refused
+"""
+import queue
+import zlib
+from multiprocessing import Process, Queue
+from typing import Any, List
+
+from loguru import logger
+
+from config import (
+    DISPATCH_LIMIT_CONFIG,
+    KAFKA_TOPIC_CONFIG,
+    SHARD_CONFIG,
+    SPILL_CONFIG,
+    SPARK_MASTER_CONFIG,
+    init_config,
+)
+from connector.msg_queue.codec import decode_msg_value, peek_msg_field
+from connector.msg_queue.kafka import KafkaConsumer
+from operators.job_consumer.main import JobConsumer
+from operators.job_monitor.ledger import (
+    SharedResourceLedger,
+    SharedJobMonitor,
+    create_ledger,
+)
+
+
+def get_shard(shard_value: Any, worker_num: int) -> int:
+    """ stable shard of a job, the same user / job type always goes to the same worker
+    """
+    return zlib.crc32(str(shard_value).encode("utf-8")) % worker_num
+
+
+def get_per_worker_limits() -> List[str]:
+    """ configured dispatch limits which are counted by each worker,
+        e.g. user caps when jobs are sharded by job_type, so N workers allow N times the cap;
+        limits of the shard key hold across workers, since one worker owns each key,
+        and type caps are counted by the shared ledger
+    """
+    per_worker_limits = []
+    if SHARD_CONFIG["SHARD_KEY"] != "job_type" and DISPATCH_LIMIT_CONFIG["TYPE_RATES"]:
+        per_worker_limits.append("TYPE_RATE_LIMITS")
+    if SHARD_CONFIG["SHARD_KEY"] != "username":
+        if DISPATCH_LIMIT_CONFIG["USER_CAP"]:
+            per_worker_limits.append("USER_CONCURRENCY_CAP")
+        if DISPATCH_LIMIT_CONFIG["USER_RATE"]:
+            per_worker_limits.append("USER_RATE_LIMIT")
+    return per_worker_limits
+
+
+def run_worker(shard: int, msg_queue: Queue, ledger: SharedResourceLedger) -> None:
+    """ scheduling loop of a worker process
+
+    Arguments:
+        shard {int} -- id of this worker
+        msg_queue {Queue} -- msgs routed to this worker, None for stopping,
+                             values of new job and cancel msgs are still encoded
+        ledger {SharedResourceLedger} -- resources shared by all workers
+    """
+    # a spill store per worker, since each store is cleared when opened
+    spill_path = f"{SPILL_CONFIG['PATH']}.{shard}" if SPILL_CONFIG["PATH"] else ""
+    operator = JobConsumer(SharedJobMonitor(ledger), spill_path=spill_path)
+    logger.info(f"Worker {shard} started")
+
+    while True:
+        try:
+            msg = msg_queue.get(timeout=1.0)
+        except queue.Empty:
+            operator.process_retries()
+            continue
+        except KeyboardInterrupt:
+            continue
+
+        if msg is None:
+            break
+
+        if msg.topic == KAFKA_TOPIC_CONFIG["TOPIC_JOB_COMPLETE_NOTIFY"]:
+            # resources are released by the router, try to schedule
+            operator.finish_job(msg.msg_key)
+            operator.run_scheduling_round()
+        else:
+            operator.consume_msg(
+                msg._replace(msg_value=decode_msg_value(msg.msg_value))
+            )
+
+    logger.warning(f"Worker {shard} stopped")
+
+
+class ShardedMainProcess:
+    """ Router process of sharded job scheduling
+    """
+
+    def __init__(self, worker_num: int = SHARD_CONFIG["WORKER_NUM"]) -> None:
+        # for getting msg
+        self.consumer = KafkaConsumer()
+
+        if SPARK_MASTER_CONFIG["URL"]:
+            logger.warning(
+                "SPARK_MASTER_STATUS_URL is not supported in sharded mode, "
+                + "resources are counted by the shared ledger only"
+            )
+
+        per_worker_limits = get_per_worker_limits()
+        if "USER_CONCURRENCY_CAP" in per_worker_limits and worker_num > 1:
+            # a cap is a promise to the cluster, so it is refused instead of multiplied
+            raise ValueError(
+                f"USER_CONCURRENCY_CAP can not hold across {worker_num} workers "
+                + f"sharded by {SHARD_CONFIG['SHARD_KEY']}, shard by username instead"
+            )
+        if per_worker_limits and worker_num > 1:
+            logger.warning(
+                f"{per_worker_limits} are applied per worker, up to {worker_num} times "
+                + f"across workers sharded by {SHARD_CONFIG['SHARD_KEY']}"
+            )
+
+        self.ledger = create_ledger()
+        self.msg_queues: List[Queue] = [
+            Queue(maxsize=SHARD_CONFIG["QUEUE_SIZE"]) for _ in range(worker_num)
+        ]
+        self.workers = [
+            Process(
+                target=run_worker,
+                args=(shard, msg_queue, self.ledger),
+                name=f"scheduler-worker-{shard}",
+            )
+            for shard, msg_queue in enumerate(self.msg_queues)
+        ]
+
+    def _route_msg(self, msg) -> None:
+        if msg.topic == KAFKA_TOPIC_CONFIG["TOPIC_JOB_COMPLETE_NOTIFY"]:
+            # release once here, then every worker may use the freed resources,
+            # and the worker owning the job or its dependent jobs finishes it
+            msg = msg._replace(msg_value=decode_msg_value(msg.msg_value))
+            logger.info(f"Get MSG - Topic: {msg.topic}, Key: {msg.msg_key}")
+            self.ledger.release(msg.msg_value["cpu"], msg.msg_value["mem"])
+            for msg_queue in self.msg_queues:
+                msg_queue.put(msg)
+        elif msg.topic == KAFKA_TOPIC_CONFIG["TOPIC_JOB_CANCEL_NOTIFY"]:
+            # the worker owning the job is unknown, other workers keep it as a bounded pending cancel
+            logger.info(f"Get MSG - Topic: {msg.topic}, Key: {msg.msg_key}")
+            for msg_queue in self.msg_queues:
+                msg_queue.put(msg)
+        else:
+            shard_value = peek_msg_field(msg.msg_value, SHARD_CONFIG["SHARD_KEY"])
+            logger.info(
+                f"Get MSG - Topic: {msg.topic}, Key: {msg.msg_key}, Shard Value: {shard_value}"
+            )
+            self.msg_queues[get_shard(shard_value, len(self.msg_queues))].put(msg)
+
+    def _handle_msgs(self) -> None:
+        while True:
+            # values are decoded by the workers, in parallel
+            for msg in self.consumer.get_info_gen_from_queue(is_raw_value=True):
+                self._route_msg(msg)
+
+    def run(self) -> None:
+        """ start workers and kafka consumer, then route msgs
+        """
+        for worker in self.workers:
+            worker.start()
+
+        try:
+            self.consumer.start()
+            self._handle_msgs()
+
+        except KeyboardInterrupt:
+            logger.warning("Aborted by user")
+        finally:
+            for msg_queue in self.msg_queues:
+                msg_queue.put(None)
+            for worker in self.workers:
+                worker.join()
+            self.consumer.close()
+
+
+def main():
+    """ define main function for cython usage
+    """
+    init_config()
+    logger.warning(
+        f"ReStart Scheduler Process with {SHARD_CONFIG['WORKER_NUM']} workers"
+    )
+    app = ShardedMainProcess()
+    app.run()
+
+
+if __name__ == "__main__":
+    main()
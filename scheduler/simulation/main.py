@@ -0,0 +1,299 @@
+"""
+Discrete-event simulator of job scheduling
+JobConsumer is driven by a virtual clock and a simulated cluster, which completes a job
+after its computing_time, so a day of traffic could be replayed in seconds
+
+Usage (in scheduler/):
+    LEVEL_LIMIT=300,900 SYSTEM_CPU=8 SYSTEM_MEM=16 python -m simulation.main --trace trace.jsonl
+    python -m simulation.main --jobs 5000 --interval 10
+"""
+import argparse
+import heapq
+import itertools
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import (
+    KAFKA_TOPIC_CONFIG,
+    SCHEDULER_CONFIG,
+    ASYNC_RUNTIME_CONFIG,
+    DATE_FORMAT,
+    SPILL_CONFIG,
+    SYSTEM_CONFIG,
+    init_config,
+)
+from connector.msg_queue.msg_info import MsgInfo
+from utils.clock import VirtualClock, get_clock, set_clock
+from operators.job_consumer.main import JobConsumer
+from operators.job_consumer.resources.base_job import Job
+from operators.job_monitor.main import JobMonitor
+
+
+# event kinds, completion first when events happen at the same time
+COMPLETE_EVENT, ARRIVAL_EVENT, REALLOCATE_EVENT = 0, 1, 2
+
+
+class SimulatedCluster:
+    """ Stand-in of job trigger and spark, a dispatched job completes after its computing_time
+    """
+
+    def __init__(self, simulator) -> None:
+        self.simulator = simulator
+
+        # job_id: (dispatch time, job)
+        self.dispatched_jobs: Dict[str, Tuple[datetime, Job]] = {}
+        self.busy_cpu_seconds = 0.0
+        # cpu of the cluster, the total of JobMonitor before any dispatch
+        self.capacity_cpu: int = SYSTEM_CONFIG["SYSTEM_CPU"]
+
+    def submit(self, job: Job) -> bool:
+        """ accept a job and schedule its completion event
+        """
+        now = get_clock().utcnow()
+        computing_time = job.job_resources["computing_time"]
+        self.dispatched_jobs[job.job_id] = (now, job)
+        self.busy_cpu_seconds += job.job_resources["cpu"] * computing_time
+
+        self.simulator.push_event(
+            now + timedelta(seconds=computing_time),
+            COMPLETE_EVENT,
+            MsgInfo(
+                KAFKA_TOPIC_CONFIG["TOPIC_JOB_COMPLETE_NOTIFY"],
+                job.job_id,
+                {
+                    "job_id": job.job_id,
+                    "cpu": job.job_resources["cpu"],
+                    "mem": job.job_resources["mem"],
+                },
+                None,
+            ),
+        )
+        return True
+
+    def submit_all(self, jobs: List[Job]) -> List[Job]:
+        """ accept a batch of jobs, the not accepted ones are returned
+        """
+        return [job for job in jobs if not self.submit(job)]
+
+
+class Simulator:
+    """ pop events in time order, move the virtual clock and feed msgs to JobConsumer
+    """
+
+    def __init__(self, start_time: datetime) -> None:
+        self.clock = VirtualClock(start_time)
+        set_clock(self.clock)
+
+        self.events: List[Tuple[datetime, int, int, MsgInfo]] = []
+        self._counter = itertools.count()
+
+        self.cluster = SimulatedCluster(self)
+        self.operator = JobConsumer(
+            JobMonitor(),
+            send_job=self.cluster.submit,
+            send_jobs=self.cluster.submit_all,
+            # spilled jobs are kept in memory, the spill file belongs to the live scheduler
+            spill_path=":memory:" if SPILL_CONFIG["PATH"] else "",
+        )
+
+        # job_id: (request_time, deadline, complete time)
+        self.completed_jobs: Dict[str, Tuple[datetime, datetime, datetime]] = {}
+        self.arrival_num = 0
+
+    def push_event(self, event_time: datetime, kind: int, msg) -> None:
+        """ add an event into the event heap
+        """
+        heapq.heappush(self.events, (event_time, kind, next(self._counter), msg))
+
+    def load_msgs(self, msgs: Iterator[MsgInfo]) -> None:
+        """ arrival time of a msg is the request_time of its job
+        """
+        for msg in msgs:
+            request_time = datetime.strptime(
+                msg.msg_value["job_config"]["request_time"], DATE_FORMAT
+            )
+            self.push_event(request_time, ARRIVAL_EVENT, msg)
+            self.arrival_num += 1
+
+    def _handle_event(self, kind: int, msg) -> None:
+        if kind == REALLOCATE_EVENT:
+            self.operator.reallocate()
+            if self.events:
+                self.push_event(
+                    self.clock.utcnow()
+                    + timedelta(seconds=ASYNC_RUNTIME_CONFIG["REALLOCATE_INTERVAL"]),
+                    REALLOCATE_EVENT,
+                    None,
+                )
+            return
+
+        if kind == COMPLETE_EVENT:
+            _, job = self.cluster.dispatched_jobs[msg.msg_key]
+            self.completed_jobs[msg.msg_key] = (
+                job.job_times["request_time"],
+                job.job_times["deadline"],
+                self.clock.utcnow(),
+            )
+
+        self.operator.consume_msg(msg)
+        self.operator.process_retries()
+
+    def run(self) -> Dict:
+        """ run until no more event
+
+        Returns:
+            Dict -- simulation report
+        """
+        if SCHEDULER_CONFIG["IS_REALLOCATE"] and self.events:
+            self.push_event(self.events[0][0], REALLOCATE_EVENT, None)
+
+        while self.events:
+            event_time, kind, _, msg = heapq.heappop(self.events)
+            self.clock.advance_to(event_time)
+            self._handle_event(kind, msg)
+
+        return self.get_report()
+
+    def get_report(self) -> Dict:
+        """ deadline-hit rate, utilization and queueing delay
+        """
+        queue_delays = sorted(
+            (dispatch_time - job.job_times["request_time"]).total_seconds()
+            for dispatch_time, job in self.cluster.dispatched_jobs.values()
+        )
+        hit_num = sum(
+            1
+            for _, deadline, complete_time in self.completed_jobs.values()
+            if complete_time <= deadline
+        )
+        makespan = self.clock.monotonic()
+
+        def percentile(ratio):
+            if not queue_delays:
+                return None
+            return queue_delays[
+                min(int(len(queue_delays) * ratio), len(queue_delays) - 1)
+            ]
+
+        return {
+            self.operator.get_exp_id(): {
+                "jobs": self.arrival_num,
+                "completed_jobs": len(self.completed_jobs),
+                "deadline_hit_rate": hit_num / self.arrival_num
+                if self.arrival_num
+                else None,
+                "utilization": self.cluster.busy_cpu_seconds
+                / (self.cluster.capacity_cpu * makespan)
+                if makespan and self.cluster.capacity_cpu
+                else None,
+                "queue_delay": {
+                    "mean": sum(queue_delays) / len(queue_delays)
+                    if queue_delays
+                    else None,
+                    "p50": percentile(0.5),
+                    "p95": percentile(0.95),
+                    "max": queue_delays[-1] if queue_delays else None,
+                },
+                "simulated_seconds": makespan,
+            }
+        }
+
+
+def read_trace(path: str) -> Iterator[MsgInfo]:
+    """ trace file: one msg value per line, the same schema as TOPIC_NEW_JOB_NOTIFY
+    """
+    with open(path) as trace_file:
+        for line in trace_file:
+            if not line.strip():
+                continue
+            msg_value = json.loads(line)
+            yield MsgInfo(
+                KAFKA_TOPIC_CONFIG["TOPIC_NEW_JOB_NOTIFY"],
+                msg_value["job_id"],
+                msg_value,
+                None,
+            )
+
+
+def generate_trace(
+    job_num: int, mean_interval: float, start_time: datetime, seed: int = 0
+) -> Iterator[MsgInfo]:
+    """ synthetic poisson arrivals with random deadlines and computing time
+    """
+    rand = random.Random(seed)
+    request_time = start_time
+    for i in range(job_num):
+        request_time += timedelta(seconds=rand.expovariate(1 / mean_interval))
+        computing_time = rand.randint(30, 300)
+        deadline = request_time + timedelta(
+            seconds=computing_time + rand.randint(0, 3600)
+        )
+        job_id = f"sim-{i}"
+        yield MsgInfo(
+            KAFKA_TOPIC_CONFIG["TOPIC_NEW_JOB_NOTIFY"],
+            job_id,
+            {
+                "username": f"user-{rand.randint(0, 9)}",
+                "job_type": "demand_forecasting_1hr",
+                "job_id": job_id,
+                "job_config": {
+                    "request_time": request_time.strftime(DATE_FORMAT),
+                    "deadline": deadline.strftime(DATE_FORMAT),
+                },
+                "job_parameters": {
+                    "resources": {
+                        "executors": 1,
+                        "cpu": 1,
+                        "mem": 1,
+                        "computing_time": computing_time,
+                    }
+                },
+            },
+            None,
+        )
+
+
+def write_report(report: Dict, output: Optional[str]) -> None:
+    """ print the report, and append it to the output file as a json line
+    """
+    line = json.dumps(report)
+    print(line)
+    if output:
+        with open(output, "a") as output_file:
+            output_file.write(line + "\n")
+
+
+def main():
+    """ run a simulation and print the report of its experiment id
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trace", help="msg values in json lines")
+    parser.add_argument("--jobs", type=int, default=1000, help="synthetic job num")
+    parser.add_argument(
+        "--interval", type=float, default=10, help="synthetic mean arrival interval"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="append report to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    init_config(args.log_level)
+
+    if args.trace:
+        msgs = list(read_trace(args.trace))
+    else:
+        msgs = list(generate_trace(args.jobs, args.interval, datetime(2020, 1, 1)))
+
+    start_time = min(
+        datetime.strptime(msg.msg_value["job_config"]["request_time"], DATE_FORMAT)
+        for msg in msgs
+    )
+    simulator = Simulator(start_time)
+    simulator.load_msgs(msgs)
+    write_report(simulator.run(), args.output)
+
+
+if __name__ == "__main__":
+    main()
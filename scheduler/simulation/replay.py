@@ -0,0 +1,144 @@
+"""
+Replay a msg capture through JobConsumer, for reproducing production issues and as a regression benchmark
+The virtual clock follows the recorded msg timestamps, so scheduling decisions match the original run
+
+Usage (in scheduler/):
+    python -m simulation.replay capture.bin --speed max
+    python -m simulation.replay capture.bin --speed 10          # 10 times faster
+    python -m simulation.replay capture.bin --speed original --use-trigger
+"""
+import argparse
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import SPILL_CONFIG, init_config
+from connector.msg_queue.capture import MsgCaptureReader
+from utils.clock import VirtualClock, set_clock
+from operators.job_consumer.main import JobConsumer
+from operators.job_consumer.plugins import SEND_JOB, SEND_JOBS
+from operators.job_consumer.resources.base_job import Job
+from operators.job_monitor.main import JobMonitor
+from simulation.main import write_report
+
+
+class MsgReplayer:
+    """ feed the msgs of a capture to JobConsumer
+
+    Args:
+        capture_path: capture file recorded by KafkaConsumer
+        speed: None for maximum speed, 1 for original speed, 10 for 10 times faster
+        use_trigger: send picked jobs to the configured trigger instead of counting them
+    """
+
+    def __init__(
+        self, capture_path: str, speed: Optional[float] = None, use_trigger=False
+    ) -> None:
+        self.reader = MsgCaptureReader(capture_path)
+        self.speed = speed
+
+        self.clock: Optional[VirtualClock] = None
+        self.dispatched_num = 0
+
+        # spilled jobs are kept in memory, the spill file belongs to the live scheduler
+        spill_path = ":memory:" if SPILL_CONFIG["PATH"] else ""
+        if use_trigger:
+            self.operator = JobConsumer(
+                JobMonitor(), SEND_JOB, SEND_JOBS, spill_path=spill_path
+            )
+        else:
+            self.operator = JobConsumer(
+                JobMonitor(), self._count_job, self._count_jobs, spill_path=spill_path
+            )
+
+    def _count_job(self, _: Job) -> bool:
+        self.dispatched_num += 1
+        return True
+
+    def _count_jobs(self, jobs: List[Job]) -> bool:
+        self.dispatched_num += len(jobs)
+        return True
+
+    def _wait_until(self, wall_start: float, first_timestamp: int, timestamp: int):
+        delay = (timestamp - first_timestamp) / 1000 / self.speed
+        sleep_time = wall_start + delay - time.perf_counter()
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+
+    def _advance_clock(self, timestamp: int) -> None:
+        if not timestamp:
+            return
+
+        msg_time = datetime.utcfromtimestamp(timestamp / 1000)
+        if self.clock is None:
+            self.clock = VirtualClock(msg_time)
+            set_clock(self.clock)
+        self.clock.advance_to(msg_time)
+
+    def run(self) -> Dict:
+        """ replay all msgs
+
+        Returns:
+            Dict -- throughput and processing latency of the experiment id
+        """
+        process_times = []
+        first_timestamp = None
+        wall_start = time.perf_counter()
+
+        for msg in self.reader:
+            timestamp = msg.timestamp[1]
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            if self.speed:
+                self._wait_until(wall_start, first_timestamp, timestamp)
+            self._advance_clock(timestamp)
+
+            process_start = time.perf_counter()
+            self.operator.consume_msg(msg)
+            self.operator.process_retries()
+            process_times.append(time.perf_counter() - process_start)
+
+        wall_time = time.perf_counter() - wall_start
+        process_times.sort()
+        msg_num = len(process_times)
+
+        return {
+            self.operator.get_exp_id(): {
+                "msgs": msg_num,
+                "dispatched_jobs": self.dispatched_num,
+                "wall_seconds": wall_time,
+                "msgs_per_second": msg_num / wall_time if wall_time else None,
+                "process_seconds": sum(process_times),
+                "process_latency_ms": {
+                    "p50": process_times[msg_num // 2] * 1000 if msg_num else None,
+                    "p99": process_times[min(int(msg_num * 0.99), msg_num - 1)] * 1000
+                    if msg_num
+                    else None,
+                },
+            }
+        }
+
+
+def main():
+    """ replay a capture and print the report of its experiment id
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("capture", help="capture file recorded with CAPTURE_PATH")
+    parser.add_argument(
+        "--speed", default="max", help="'max', 'original' or a speed-up factor"
+    )
+    parser.add_argument("--use-trigger", action="store_true")
+    parser.add_argument("--output", help="append report to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    init_config(args.log_level)
+
+    speed_map = {"max": None, "original": 1.0}
+    speed = speed_map[args.speed] if args.speed in speed_map else float(args.speed)
+
+    write_report(MsgReplayer(args.capture, speed, args.use_trigger).run(), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Module for the injectable clock
+Scheduling code reads time from get_clock(), so a simulation could drive it with virtual time
+"""
+import time
+from datetime import datetime, timedelta
+
+
+class SystemClock:
+    """ real time clock
+    """
+
+    @staticmethod
+    def utcnow() -> datetime:
+        """ current utc time """
+        return datetime.utcnow()
+
+    @staticmethod
+    def monotonic() -> float:
+        """ seconds for measuring intervals """
+        return time.monotonic()
+
+
+class VirtualClock:
+    """ clock which only moves when it is advanced, for simulation
+    """
+
+    def __init__(self, start_time: datetime) -> None:
+        self.start_time = start_time
+        self.current_time = start_time
+
+    def utcnow(self) -> datetime:
+        """ current virtual utc time """
+        return self.current_time
+
+    def monotonic(self) -> float:
+        """ virtual seconds since the clock start """
+        return (self.current_time - self.start_time).total_seconds()
+
+    def advance_to(self, new_time: datetime) -> None:
+        """ move the clock forward, virtual time never goes back
+        """
+        if new_time > self.current_time:
+            self.current_time = new_time
+
+    def advance(self, seconds: float) -> None:
+        """ move the clock forward by seconds
+        """
+        self.current_time += timedelta(seconds=seconds)
+
+
+_CLOCK = SystemClock()
+
+
+def get_clock():
+    """ the clock used by scheduling """
+    return _CLOCK
+
+
+def set_clock(clock) -> None:
+    """ replace the clock, e.g. set_clock(VirtualClock(start_time)) for simulation
+    """
+    global _CLOCK  # pylint: disable=W0603
+    _CLOCK = clock
@@ -3,12 +3,32 @@ Module for utility functions
 Author: Po-Chun, Lu
 """
 
+import threading
 import traceback
-from typing import Optional
+from typing import Optional, Tuple, Union
 
 import requests
 from loguru import logger
 
+from config import REQUEST_CONFIG
+
+
+# keep-alive connections for the frequent requests to the same host,
+# a session is not thread-safe, so every dispatching thread has its own
+_LOCAL = threading.local()
+
+# (connect, read) seconds, a request never blocks the scheduling forever
+DEFAULT_TIMEOUT = (REQUEST_CONFIG["CONNECT_TIMEOUT"], REQUEST_CONFIG["READ_TIMEOUT"])
+
+
+def get_session() -> requests.Session:
+    """ the keep-alive session of the current thread
+    """
+    session = getattr(_LOCAL, "session", None)
+    if session is None:
+        session = _LOCAL.session = requests.Session()
+    return session
+
 
 def send_request(request_func):
     """A Decorator for requests module to prevent some exceptions
@@ -17,9 +37,11 @@ def send_request(request_func):
         request_func {callable} -- function with requests.get, requests.post
     """
 
-    def wrapper(url, headers=None, data=None):
+    def wrapper(
+        url, headers=None, data=None, timeout: Union[float, Tuple[float, float]] = None
+    ):
         try:
-            res = request_func(url, headers, data)
+            res = request_func(url, headers, data, timeout or DEFAULT_TIMEOUT)
             status = res.status_code
 
             if status != 200:
@@ -36,19 +58,25 @@ def send_request(request_func):
             logger.warning(f"UNAVAILABLE: Connection Refused Error {error}")
         except requests.exceptions.MissingSchema:
             logger.warning(f"UNAVAILABLE: URL Schema Error {traceback.format_exc()}")
+        except requests.exceptions.RequestException as error:
+            logger.warning(f"UNAVAILABLE: Request Error {error!r}")
 
     return wrapper
 
 
 @send_request
-def send_post_request(url, headers=None, data=None) -> Optional[requests.Response]:
+def send_post_request(
+    url, headers=None, data=None, timeout=None
+) -> Optional[requests.Response]:
     """ send post requests with error checking
     """
-    return requests.post(url, headers=headers, data=data)
+    return get_session().post(url, headers=headers, data=data, timeout=timeout)
 
 
 @send_request
-def send_get_request(url, headers=None, data=None) -> Optional[requests.Response]:
+def send_get_request(
+    url, headers=None, data=None, timeout=None
+) -> Optional[requests.Response]:
     """ send get requests with error checking
     """
-    return requests.get(url, headers=headers, data=data)
+    return get_session().get(url, headers=headers, data=data, timeout=timeout)
@@ -0,0 +1,110 @@
+"""
+Module for the throughput metrics of processing stages
+Each stage counts processed items and busy time, a reporter logs the rates and queue depths periodically
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class StageMetrics:
+    """ processed items and busy seconds of a stage, could be shared by the threads of the stage
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.lock = threading.Lock()
+
+        # for rates since the last snapshot
+        self.last_processed = 0
+        self.last_busy_seconds = 0.0
+
+    def record(self, num: int, seconds: float) -> None:
+        """ num items are processed in seconds
+        """
+        with self.lock:
+            self.processed += num
+            self.busy_seconds += seconds
+
+    def snapshot(self, interval: float) -> Dict[str, float]:
+        """ rates since the last snapshot
+
+        Returns:
+            Dict[str, float] -- items per second and ratio of busy time
+        """
+        with self.lock:
+            processed, busy_seconds = self.processed, self.busy_seconds
+
+        rates = {
+            "total": processed,
+            "per_second": round((processed - self.last_processed) / interval, 2),
+            "busy_ratio": round((busy_seconds - self.last_busy_seconds) / interval, 3),
+        }
+        self.last_processed, self.last_busy_seconds = processed, busy_seconds
+        return rates
+
+
+class MetricsReporter:
+    """ report stage metrics and queue depths by a daemon thread
+
+    Args:
+        stages: metrics of each stage
+        queues: name and queue (with qsize) between stages
+        report: called with the metrics dict, e.g. logger.info
+        interval: seconds between reports, 0: disable
+        gauges: name and function of other values to report, e.g. level weights
+    """
+
+    # each runtime picks its own stages, queues and gauges to report
+    def __init__(  # pylint: disable=R0913
+        self,
+        stages: Dict[str, StageMetrics],
+        queues: Dict,
+        report,
+        interval: float,
+        gauges: Optional[Dict[str, Callable[[], Any]]] = None,
+    ) -> None:
+        self.stages = stages
+        self.queues = queues
+        self.report = report
+        self.interval = interval
+        self.gauges = gauges or {}
+
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def get_metrics(self, interval: float) -> Dict[str, Dict]:
+        """ current rates of stages, depths of queues and gauges
+        """
+        return {
+            "stages": {
+                name: stage.snapshot(interval) for name, stage in self.stages.items()
+            },
+            "queue_depth": {name: queue.qsize() for name, queue in self.queues.items()},
+            "gauges": {name: gauge() for name, gauge in self.gauges.items()},
+        }
+
+    def _run(self) -> None:
+        last_time = time.monotonic()
+        while not self.stop_event.wait(self.interval):
+            now = time.monotonic()
+            self.report(self.get_metrics(now - last_time))
+            last_time = now
+
+    def start(self) -> None:
+        """ start reporting
+        """
+        if self.interval > 0:
+            self.thread = threading.Thread(
+                target=self._run, name="metrics-reporter", daemon=True
+            )
+            self.thread.start()
+
+    def stop(self) -> None:
+        """ stop reporting
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,166 @@
+"""
+Module for an order statistic tree
+A treap keeps items sorted by key, and each node keeps the size and the weight sum of its subtree,
+so insert / remove / rank / prefix weight are O(log n) on average
+"""
+import random
+from typing import Any, Iterator, Optional, Tuple
+
+
+# a slotted treap node, with its subtree size and weight sum
+class _Node:  # pylint: disable=R0902
+    __slots__ = ("key", "value", "weight", "priority", "left", "right", "size", "total")
+
+    def __init__(self, key, value, weight: float) -> None:
+        self.key = key
+        self.value = value
+        self.weight = weight
+        self.priority = random.random()
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+        self.size = 1
+        self.total = weight
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node else 0
+
+
+def _total(node: Optional[_Node]) -> float:
+    return node.total if node else 0
+
+
+def _update(node: _Node) -> _Node:
+    node.size = 1 + _size(node.left) + _size(node.right)
+    node.total = node.weight + _total(node.left) + _total(node.right)
+    return node
+
+
+def _split(node: Optional[_Node], key) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """ split into keys < key and keys >= key
+    """
+    if node is None:
+        return None, None
+
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        return _update(node), right
+
+    left, node.left = _split(node.left, key)
+    return left, _update(node)
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    """ merge two treaps, all keys of left are smaller
+    """
+    if left is None:
+        return right
+    if right is None:
+        return left
+
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+def _split_first(node: Optional[_Node]) -> Tuple[Optional[_Node], Optional[_Node]]:
+    """ detach the node of the smallest key
+    """
+    if node is None:
+        return None, None
+
+    if node.left is None:
+        right, node.right = node.right, None
+        return _update(node), right
+
+    first, node.left = _split_first(node.left)
+    return first, _update(node)
+
+
+class OrderStatisticTree:
+    """ sorted items with subtree size and weight sum, keys should be unique
+        e.g. key: (deadline, seq), value: job, weight: computing time of the job
+    """
+
+    def __init__(self) -> None:
+        self.root: Optional[_Node] = None
+
+    def __len__(self) -> int:
+        return _size(self.root)
+
+    @property
+    def total_weight(self) -> float:
+        """ weight sum of all items
+        """
+        return _total(self.root)
+
+    def insert(self, key, value: Any = None, weight: float = 0) -> None:
+        """ insert an item, O(log n)
+        """
+        left, right = _split(self.root, key)
+        self.root = _merge(_merge(left, _Node(key, value, weight)), right)
+
+    def remove(self, key) -> Any:
+        """ remove the item of key, O(log n)
+
+        Returns:
+            Any -- value of the removed item, None if the key is not found
+        """
+        left, right = _split(self.root, key)
+        node, right = _split_first(right)
+
+        if node is not None and node.key != key:
+            right = _merge(node, right)
+            node = None
+
+        self.root = _merge(left, right)
+        return node.value if node else None
+
+    def rank(self, key) -> int:
+        """ number of items whose key < key
+        """
+        rank, node = 0, self.root
+        while node:
+            if node.key < key:
+                rank += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return rank
+
+    def prefix_weight(self, key) -> float:
+        """ weight sum of items whose key < key
+        """
+        weight, node = 0, self.root
+        while node:
+            if node.key < key:
+                weight += _total(node.left) + node.weight
+                node = node.right
+            else:
+                node = node.left
+        return weight
+
+    def first(self) -> Optional[Tuple[Any, Any]]:
+        """ (key, value) of the smallest key
+        """
+        node = self.root
+        if node is None:
+            return None
+        while node.left:
+            node = node.left
+        return node.key, node.value
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        """ (key, value) in key order, the tree should not be changed while iterating
+        """
+        stack, node = [], self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.key, node.value
+            node = node.right
@@ -0,0 +1,44 @@
+"""
+Module for requests from other threads to the scheduling thread
+Staging lists, selectors and other scheduling state are not thread-safe, so the admin server
+or a signal handler queues a request, and the scheduling thread resolves it between msgs
+"""
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Tuple
+
+from loguru import logger
+
+
+class RequestQueue:
+    """ requests of other threads or signal handlers, taken by the scheduling thread;
+        deque append / popleft are atomic, so no lock is taken
+    """
+
+    def __init__(self) -> None:
+        self.pending: Deque[Tuple[Callable[[Any], Any], Any, Future]] = deque()
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def request(self, handle: Callable[[Any], Any], value: Any) -> Future:
+        """ queue a request, handled by the scheduling thread
+
+        Returns:
+            Future -- resolved with the result of handle(value), or its error
+        """
+        future: Future = Future()
+        self.pending.append((handle, value, future))
+        return future
+
+    def resolve(self) -> None:
+        """ handle all pending requests in request order, called by the scheduling thread
+        """
+        # every future is resolved, a failed request does not stop the others or scheduling
+        while self.pending:
+            handle, value, future = self.pending.popleft()
+            try:
+                future.set_result(handle(value))
+            except Exception as error:  # pylint: disable=W0703
+                logger.error(f"Reject {handle.__name__} {value}: {error!r}")
+                future.set_exception(error)